@@ -0,0 +1,332 @@
+from typing import NamedTuple
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import db_to_float
+from audio_stream import PCMStream, WINDOW_MS
+from pcm_cache import shared_cache
+from silence_detection import (
+    max_possible_amplitude,
+    rms_to_dbfs,
+    samples_from_buffer,
+    window_rms,
+)
+from silence_splitter import (
+    SilenceRangeTracker,
+    StreamingSilenceSplitter,
+    MIN_SILENCE_LEN,
+    KEEP_SILENCE,
+)
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Thresholds in dBFS whose chunk ranges are collected during the analysis.
+CANDIDATE_THRESHOLDS = tuple(range(-80, -9))
+
+# Lower edge of the loudness histogram in dBFS. Digital silence and
+# anything quieter is counted in the first bin.
+HISTOGRAM_FLOOR_DB = -100
+
+# Percentiles of the window levels taken as the noise floor and as the
+# level of the content.
+NOISE_PERCENTILE = 10
+LOUDNESS_PERCENTILE = 90
+
+# Distance above the noise floor the automatic threshold is placed at, unless
+# that is more than half way up to the level of the content.
+NOISE_MARGIN_DB = 10
+
+
+class SilenceAnalysis(NamedTuple):
+    """The outcome of analyzing the loudness of an audio file.
+
+    Attributes:
+        length_ms (int): The length of the input in milliseconds.
+        frame_rate (int): The sample rate of the input in Hz.
+        channels (int): The number of audio channels of the input.
+        histogram (np.ndarray): The number of silence windows per 1 dB level,
+            starting at HISTOGRAM_FLOOR_DB.
+        noise_floor_db (float): The estimated level of the background noise in dBFS.
+        loudness_db (float): The estimated level of the content in dBFS.
+        threshold (int): The candidate threshold picked automatically.
+        ranges (dict): Maps every candidate threshold to the chunk ranges
+            ``[start_ms, end_ms]`` splitting on it gives.
+    """
+
+    length_ms: int
+    frame_rate: int
+    channels: int
+    histogram: np.ndarray
+    noise_floor_db: float
+    loudness_db: float
+    threshold: int
+    ranges: dict
+
+
+def histogram_percentile(histogram, percentile) -> float:
+    """Returns the level below which a percentage of the windows lie.
+
+    Args:
+        histogram (np.ndarray): The window counts per 1 dB bin.
+        percentile (float): The percentage of windows, from 0 to 100.
+
+    Returns:
+        float: The upper edge of the bin the percentile falls in, in dBFS.
+    """
+    total = histogram.sum()
+    if not total:
+        return float(HISTOGRAM_FLOOR_DB)
+
+    position = int(np.searchsorted(np.cumsum(histogram), total * percentile / 100))
+    return float(HISTOGRAM_FLOOR_DB + position + 1)
+
+
+def pick_threshold(noise_floor_db, loudness_db, candidates=CANDIDATE_THRESHOLDS) -> int:
+    """Places the silence threshold between the noise floor and the content.
+
+    Args:
+        noise_floor_db (float): The level of the background noise in dBFS.
+        loudness_db (float): The level of the content in dBFS.
+        candidates (tuple, optional): The thresholds that may be picked.
+
+    Returns:
+        int: The closest candidate to the ideal threshold.
+    """
+    ideal = min(noise_floor_db + NOISE_MARGIN_DB, (noise_floor_db + loudness_db) / 2)
+    return min(candidates, key=lambda candidate: abs(candidate - ideal))
+
+
+class SilenceAnalyzer:
+    """Finds the chunk ranges of several silence thresholds in one decode.
+
+    The window RMS values are computed once per decoded window, the same way
+    StreamingSilenceSplitter does, and then compared against every candidate
+    threshold. Each threshold has its own SilenceRangeTracker, so the ranges
+    of every candidate are identical to ``split_on_silence`` with that
+    threshold. The levels are also counted into a histogram, which gives the
+    noise floor the threshold is picked from.
+
+    Attributes:
+        audio_file (str): The path to the input audio file.
+        min_silence_len (int): The minimum length of a silence in milliseconds.
+        keep_silence (int): The silence kept on both sides of a chunk in milliseconds.
+        candidates (tuple): The thresholds in dBFS the ranges are collected for.
+        window_ms (int): The length of each decoded window in milliseconds.
+    """
+
+    def __init__(
+        self,
+        audio_file,
+        min_silence_len=MIN_SILENCE_LEN,
+        keep_silence=KEEP_SILENCE,
+        candidates=CANDIDATE_THRESHOLDS,
+        window_ms=WINDOW_MS,
+    ) -> None:
+        """Initializes the SilenceAnalyzer.
+
+        Args:
+            audio_file (str): The path to the input audio file.
+            min_silence_len (int, optional): The minimum length of a silence in milliseconds.
+            keep_silence (int, optional): The silence kept around each chunk in milliseconds.
+            candidates (tuple, optional): The thresholds in dBFS to collect ranges for.
+            window_ms (int, optional): The length of each decoded window in milliseconds.
+        """
+        self.audio_file = audio_file
+        self.min_silence_len = min_silence_len
+        self.keep_silence = keep_silence
+        self.candidates = tuple(sorted(candidates))
+        self.window_ms = window_ms
+
+    def analyze(self) -> SilenceAnalysis:
+        """Decodes the input once and collects the ranges of every candidate.
+
+        Returns:
+            SilenceAnalysis: The histogram, the picked threshold and the ranges.
+        """
+        trackers = {
+            candidate: SilenceRangeTracker(self.min_silence_len, self.keep_silence)
+            for candidate in self.candidates
+        }
+        ranges = {candidate: [] for candidate in self.candidates}
+        histogram = np.zeros(-HISTOGRAM_FLOOR_DB + 1, dtype=np.int64)
+
+        with PCMStream(self.audio_file, self.window_ms, shared_cache()) as stream:
+            frame_rate = stream.frame_rate
+            frame_width = stream.frame_width
+            amplitudes = {
+                candidate: db_to_float(candidate) * max_possible_amplitude(stream.sample_width)
+                for candidate in self.candidates
+            }
+
+            def to_frame(ms):
+                # Same rounding as AudioSegment slicing.
+                return int(ms * (frame_rate / 1000.0))
+
+            def add_block(start_ms, stop_ms, total=None) -> None:
+                rms = self._block_rms(
+                    stream, buffer, buffer_start, start_ms, stop_ms, total
+                )
+                levels = rms_to_dbfs(rms, stream.sample_width)
+                bins = np.clip(np.floor(levels) - HISTOGRAM_FLOOR_DB, 0, len(histogram) - 1)
+                histogram[:] += np.bincount(bins.astype(np.int64), minlength=len(histogram))
+
+                for candidate in self.candidates:
+                    silent = (rms <= amplitudes[candidate]).astype(np.int8)
+                    edges = np.diff(silent, prepend=0, append=0)
+                    firsts = np.flatnonzero(edges == 1) + start_ms
+                    lasts = np.flatnonzero(edges == -1) - 1 + start_ms
+                    tracker = trackers[candidate]
+                    for first, last in zip(firsts.tolist(), lasts.tolist()):
+                        ranges[candidate].extend(tracker.add_silent_run(first, last))
+
+            buffer = bytearray()
+            buffer_start = 0
+            total_frames = 0
+            window_start = 0
+
+            for window in stream.windows():
+                buffer += window
+                total_frames += len(window) // frame_width
+
+                # The same hold back as StreamingSilenceSplitter.
+                window_stop = int(total_frames * 1000 / frame_rate) - self.min_silence_len
+                while to_frame(window_stop + self.min_silence_len + 1) > total_frames:
+                    window_stop -= 1
+
+                if window_stop >= window_start:
+                    add_block(window_start, window_stop + 1)
+                    window_start = window_stop + 1
+
+                # Only the samples of the windows not tested yet are needed.
+                keep_from = to_frame(window_start)
+                if keep_from > buffer_start:
+                    del buffer[: (keep_from - buffer_start) * frame_width]
+                    buffer_start = keep_from
+
+            length_ms = round(1000 * (total_frames / frame_rate))
+            window_stop = length_ms - self.min_silence_len + 1
+            if window_stop > window_start:
+                add_block(window_start, window_stop, total_frames)
+
+        for candidate, tracker in trackers.items():
+            ranges[candidate].extend(tracker.finish(length_ms))
+            ranges[candidate] = [
+                [max(start, 0), min(end, length_ms)] for start, end in ranges[candidate]
+            ]
+
+        noise_floor_db = histogram_percentile(histogram, NOISE_PERCENTILE)
+        loudness_db = histogram_percentile(histogram, LOUDNESS_PERCENTILE)
+        threshold = pick_threshold(noise_floor_db, loudness_db, self.candidates)
+
+        logging.info(
+            f"Analyzed {self.audio_file}: noise floor {noise_floor_db:.0f} dBFS, "
+            f"content {loudness_db:.0f} dBFS, threshold {threshold} dBFS gives "
+            f"{len(ranges[threshold])} chunks"
+        )
+        return SilenceAnalysis(
+            length_ms,
+            frame_rate,
+            stream.channels,
+            histogram,
+            noise_floor_db,
+            loudness_db,
+            threshold,
+            ranges,
+        )
+
+    def _block_rms(
+        self, stream, buffer, buffer_start, start_ms, stop_ms, total_frames=None
+    ) -> np.ndarray:
+        """Computes the RMS of a range of silence windows from the buffer.
+
+        Args:
+            stream (PCMStream): The stream the buffer was filled from.
+            buffer (bytearray): The buffered PCM data.
+            buffer_start (int): The frame index of the first buffered frame.
+            start_ms (int): The first window start in milliseconds.
+            stop_ms (int): The window start to stop before in milliseconds.
+            total_frames (int, optional): The number of frames in the whole audio,
+                once it is known.
+
+        Returns:
+            np.ndarray: The truncated RMS of each window.
+        """
+        frames_per_ms = stream.frame_rate / 1000.0
+        first_frame = int(start_ms * frames_per_ms)
+        last_frame = int((stop_ms - 1 + self.min_silence_len) * frames_per_ms)
+        if total_frames is not None:
+            last_frame = min(last_frame, total_frames)
+
+        data = bytes(
+            buffer[
+                (first_frame - buffer_start) * stream.frame_width : (last_frame - buffer_start)
+                * stream.frame_width
+            ]
+        )
+
+        return window_rms(
+            samples_from_buffer(data, stream.sample_width),
+            stream.channels,
+            stream.frame_rate,
+            np.arange(start_ms, stop_ms, dtype=np.int64),
+            self.min_silence_len,
+            first_frame=first_frame,
+            total_frames=total_frames,
+        )
+
+
+def iter_range_chunks(audio_file, ranges, window_ms=WINDOW_MS):
+    """Streams an audio file and yields the chunks of precomputed ranges.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        ranges (list): The chunk ranges ``[start_ms, end_ms]`` in increasing order.
+        window_ms (int, optional): The length of each decoded window in milliseconds.
+
+    Yields:
+        AudioSegment: The next chunk, without padding.
+    """
+    with PCMStream(audio_file, window_ms, shared_cache()) as stream:
+        frame_rate = stream.frame_rate
+        frame_width = stream.frame_width
+
+        def to_frame(ms):
+            return int(ms * (frame_rate / 1000.0))
+
+        def chunk(start_ms, end_ms) -> AudioSegment:
+            data = StreamingSilenceSplitter._frames(
+                stream, buffer, buffer_start, to_frame(start_ms), to_frame(end_ms)
+            )
+            return AudioSegment(
+                data=data,
+                sample_width=stream.sample_width,
+                frame_rate=frame_rate,
+                channels=stream.channels,
+            )
+
+        position = 0
+        buffer = bytearray()
+        buffer_start = 0
+        total_frames = 0
+
+        for window in stream.windows():
+            buffer += window
+            total_frames += len(window) // frame_width
+
+            while position < len(ranges) and to_frame(ranges[position][1]) <= total_frames:
+                yield chunk(*ranges[position])
+                position += 1
+
+            if position < len(ranges):
+                keep_from = min(to_frame(ranges[position][0]), total_frames)
+                if keep_from > buffer_start:
+                    del buffer[: (keep_from - buffer_start) * frame_width]
+                    buffer_start = keep_from
+
+        # Ranges reaching past the last whole frame are padded with silence.
+        for start_ms, end_ms in ranges[position:]:
+            yield chunk(start_ms, end_ms)
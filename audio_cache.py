@@ -0,0 +1,193 @@
+import threading
+from collections import OrderedDict
+import instrumentation
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+class AudioCache:
+    """LRU cache of decoded audio with background prefetching.
+
+    Segments are keyed by file path and evicted least recently used first
+    once their PCM data exceeds ``max_bytes``. A single background thread
+    decodes the files passed to ``prefetch`` so that ``get`` usually finds
+    them ready.
+
+    Attributes:
+        max_bytes (int): The largest amount of PCM data kept in memory.
+        hits (int): The number of ``get`` calls served from memory.
+        misses (int): The number of ``get`` calls that had to wait for a decode.
+        prefetched (int): The number of files decoded by the background thread.
+        evictions (int): The number of segments dropped to stay within budget.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024) -> None:
+        """Initializes the AudioCache and starts its prefetch thread.
+
+        Args:
+            max_bytes (int, optional): The largest amount of PCM data kept in memory.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.evictions = 0
+
+        self._segments = OrderedDict()
+        self._size = 0
+        self._loading = {}
+        self._queue = []
+        self._closed = False
+        self._condition = threading.Condition()
+
+        self._thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+        self._thread.start()
+
+    @property
+    def size(self) -> int:
+        """int: The amount of PCM data currently cached, in bytes."""
+        return self._size
+
+    def stats(self) -> dict:
+        """Returns the cache counters.
+
+        Returns:
+            dict: The hit, miss, prefetch and eviction counts and the cached bytes.
+        """
+        with self._condition:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "prefetched": self.prefetched,
+                "evictions": self.evictions,
+                "bytes": self._size,
+                "entries": len(self._segments),
+            }
+
+    def get(self, file_controller):
+        """Returns the decoded audio of a file, decoding it if it is not cached.
+
+        If the prefetch thread is already decoding the file, this waits for
+        it instead of decoding the file a second time.
+
+        Args:
+            file_controller (FileController): The file to return the audio of.
+
+        Returns:
+            AudioSegment: The decoded audio.
+        """
+        key = file_controller.file_path
+        with self._condition:
+            if key in self._segments:
+                self.hits += 1
+                instrumentation.count("cache.hits")
+                self._segments.move_to_end(key)
+                return self._segments[key]
+
+            self.misses += 1
+            instrumentation.count("cache.misses")
+            while key in self._loading:
+                self._condition.wait()
+
+            if key in self._segments:
+                self._segments.move_to_end(key)
+                return self._segments[key]
+
+            self._loading[key] = True
+
+        return self._load(file_controller)
+
+    def prefetch(self, file_controllers) -> None:
+        """Replaces the prefetch queue with the given files, in priority order.
+
+        Args:
+            file_controllers (list): The files to decode in the background.
+        """
+        with self._condition:
+            self._queue = [
+                file_controller
+                for file_controller in file_controllers
+                if file_controller.file_path not in self._segments
+            ]
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Stops the prefetch thread and drops every cached segment."""
+        with self._condition:
+            self._closed = True
+            self._queue = []
+            self._segments.clear()
+            self._size = 0
+            self._condition.notify_all()
+
+    def _load(self, file_controller):
+        """Decodes a file and adds it to the cache.
+
+        The caller must have marked the file as loading.
+
+        Args:
+            file_controller (FileController): The file to decode.
+
+        Returns:
+            AudioSegment: The decoded audio.
+        """
+        key = file_controller.file_path
+        try:
+            segment = file_controller.load_audio()
+        finally:
+            with self._condition:
+                del self._loading[key]
+                self._condition.notify_all()
+
+        with self._condition:
+            self._insert(key, segment)
+
+        return segment
+
+    def _insert(self, key, segment) -> None:
+        """Adds a segment and evicts the least recently used ones over budget.
+
+        Args:
+            key (str): The path of the decoded file.
+            segment (AudioSegment): The decoded audio.
+        """
+        size = len(segment.raw_data)
+        if size > self.max_bytes or key in self._segments:
+            return
+
+        self._segments[key] = segment
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, evicted = self._segments.popitem(last=False)
+            self._size -= len(evicted.raw_data)
+            self.evictions += 1
+
+    def _prefetch_worker(self) -> None:
+        """Decodes queued files until the cache is closed."""
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                file_controller = self._queue.pop(0)
+                key = file_controller.file_path
+                if key in self._segments or key in self._loading:
+                    continue
+                self._loading[key] = True
+
+            try:
+                self._load(file_controller)
+            except Exception as error:
+                logging.warning(f"Could not prefetch {key}: {error!r}")
+                continue
+
+            with self._condition:
+                self.prefetched += 1
@@ -1,8 +1,9 @@
 from tkinter import Frame, ttk, StringVar, filedialog
-import pathlib
-import threading
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
+import os
+import queue
+from audio_splitter import output_folder_for, split_file
+from chunk_exporter import EXPORT_FORMATS
+import job_scheduler
 import logging
 
 logging.basicConfig(
@@ -11,6 +12,9 @@ logging.basicConfig(
     handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
 )
 
+# The scheduler group of the split jobs queued from the GUI.
+SPLIT_GROUP = "split"
+
 
 class AudioChunkGenerator(Frame):
     """GUI application for splitting audio files into chunks.
@@ -19,8 +23,10 @@ class AudioChunkGenerator(Frame):
         audio_file (str): The path to the input audio file.
         output_folder (str): The path to the output folder for the generated audio chunks.
         string_output_path (StringVar): String variable for displaying the output folder path.
-        split_audio_thread (threading.Thread): Thread for splitting the audio file.
-        split_audio_button (ttk.Button): Button for initiating the audio splitting process.
+        scheduler (JobScheduler): The scheduler the splits are queued on.
+        split_audio_button (ttk.Button): Button for queueing the audio splitting process.
+        cancel_button (ttk.Button): Button for cancelling the queued and running splits.
+        split_status (StringVar): The progress of the splits.
     """
 
     def __init__(self, parent, controller=None) -> None:
@@ -36,7 +42,9 @@ class AudioChunkGenerator(Frame):
         self.output_folder = None
         self.string_output_path = StringVar()
 
-        self.split_audio_thread = None
+        self.scheduler = job_scheduler.shared_scheduler()
+        self._split_events = self.scheduler.listen(SPLIT_GROUP)
+        self._polling = False
 
         # Set up the main grid
         self.columnconfigure(0, weight=1)
@@ -50,11 +58,11 @@ class AudioChunkGenerator(Frame):
         ##################
         info_frame = Frame(self)
 
-        checkbox_options = []
+        checkbox_options = ["Streaming split", "Adaptive threshold", "Cut list only"]
         self.checkbox_values = {}
 
         for option in checkbox_options:
-            var = StringVar()
+            var = StringVar(value="off")
             checkbox = ttk.Checkbutton(
                 info_frame, text=option, variable=var, onvalue="on", offvalue="off"
             )
@@ -62,12 +70,41 @@ class AudioChunkGenerator(Frame):
             checkbox.pack()
             self.checkbox_values[option] = var
 
+        label_export_workers = ttk.Label(info_frame, text="Export workers:")
+        label_export_workers.pack()
+
+        self.export_workers = StringVar(value=str(os.cpu_count() or 1))
+        spinbox_export_workers = ttk.Spinbox(
+            info_frame,
+            from_=1,
+            to=64,
+            textvariable=self.export_workers,
+            state="readonly",
+            width=5,
+        )
+        spinbox_export_workers.pack()
+
+        label_export_format = ttk.Label(info_frame, text="Export format:")
+        label_export_format.pack()
+
+        self.export_format = StringVar(value="mp3")
+        combobox_export_format = ttk.Combobox(
+            info_frame,
+            values=EXPORT_FORMATS,
+            textvariable=self.export_format,
+            state="readonly",
+            width=5,
+        )
+        combobox_export_format.pack()
+
         info_frame.columnconfigure(0, weight=1)
         info_frame.columnconfigure(1, weight=1)
 
         info_frame.rowconfigure(0, weight=1)
         info_frame.rowconfigure(1, weight=1)
 
+        info_frame.grid(row=0, column=0)
+
         ##################
         # FILE I/O FRAME #
         ##################
@@ -115,15 +152,31 @@ class AudioChunkGenerator(Frame):
         )
         self.entry_input_path.grid(row=0, column=1, padx=10, pady=10)
 
+        ##################
+        #  SPLIT FRAME   #
+        ##################
+        split_frame = Frame(self)
+        split_frame.columnconfigure(2, weight=1)
+        split_frame.grid(row=2, column=0, sticky="ew")
+
         # Add a split audio button
         self.split_audio_button = ttk.Button(
-            self,
+            split_frame,
             text="Split Audio",
-            command=self._start_split_audio_thread,
+            command=self.queue_split,
             state="disabled",
-            width=150,
+            width=30,
+        )
+        self.split_audio_button.grid(row=0, column=0, padx=10, pady=10)
+
+        self.cancel_button = ttk.Button(
+            split_frame, text="Cancel", command=self.cancel_splits, state="disabled"
         )
-        self.split_audio_button.grid(row=2, column=0, padx=10, pady=10)
+        self.cancel_button.grid(row=0, column=1, padx=10, pady=10)
+
+        self.split_status = StringVar()
+        label_split_status = ttk.Label(split_frame, textvariable=self.split_status)
+        label_split_status.grid(row=0, column=2, padx=10, pady=10, sticky="w")
         logging.info("AudioChunkGenerator initialized.")
 
     def open_file(self) -> str:
@@ -134,6 +187,7 @@ class AudioChunkGenerator(Frame):
             filetypes=(
                 ("mp3 files", "*.mp3"),
                 ("wav files", "*.wav"),
+                ("flac files", "*.flac"),
                 ("all files", "*.*"),
             ),
         )
@@ -156,43 +210,96 @@ class AudioChunkGenerator(Frame):
         else:
             self.split_audio_button.config(state="disabled")
 
-    def _start_split_audio_thread(self) -> None:
-        threading.Thread(target=self._split_audio).start()
-
-    def _split_audio(self) -> None:
-        folder_name = self.audio_file.split("/")[-1].split(".")[0]
+    def queue_split(self) -> None:
+        """Queues a split of the selected file with the selected options.
 
-        pathlib.Path(self.string_output_path.get() + "/" + folder_name).mkdir(
-            parents=True, exist_ok=True
+        The split runs on the job scheduler. Queueing the same file for the
+        same output folder again while it is queued or running does nothing.
+        """
+        audio_file = self.audio_file
+        output_root = self.string_output_path.get()
+        options = {
+            "streaming": self.checkbox_values["Streaming split"].get() == "on",
+            "workers": int(self.export_workers.get()),
+            "export_format": self.export_format.get(),
+            "adaptive": self.checkbox_values["Adaptive threshold"].get() == "on",
+            "cut_list": self.checkbox_values["Cut list only"].get() == "on",
+        }
+
+        self.scheduler.submit(
+            f"Split {os.path.basename(audio_file)}",
+            self._split_audio,
+            audio_file,
+            output_root,
+            options,
+            group=SPLIT_GROUP,
+            key=output_folder_for(audio_file, output_root),
         )
+        self.cancel_button.config(state="normal")
 
-        self.split_audio_button.config(text="Loading file...", state="disabled")
-        self.update()
+        if not self._polling:
+            self._polling = True
+            self.after(200, self._poll_split_events)
 
-        audio = AudioSegment.from_file(self.audio_file)
+    def cancel_splits(self) -> None:
+        """Cancels the queued splits and stops the running ones."""
+        self.scheduler.cancel_all(SPLIT_GROUP)
 
-        logging.info(f"Splitting {self.audio_file} into {folder_name}...")
-        self.split_audio_button.config(text="Splitting...", state="disabled")
-        self.update()
+    @staticmethod
+    def _split_audio(job, audio_file, output_root, options):
+        """Splits a file on a scheduler thread, reporting progress through its job.
 
-        chunks = split_on_silence(audio, min_silence_len=500, silence_thresh=-48)
+        Tk widgets may only be touched from the main thread, so nothing here
+        changes the GUI; the events are shown by ``_poll_split_events``.
 
-        logging.info(f"Exporting {len(chunks)} chunks...")
-        self.split_audio_button.config(
-            text=f"Exporting {len(chunks)} chunks...", state="disabled"
-        )
-        self.update()
+        Args:
+            job (Job): The job the split runs as.
+            audio_file (str): The path to the input audio file.
+            output_root (str): The folder holding one sub-folder per input file.
+            options (dict): The keyword arguments for split_file.
 
-        for i, chunk in enumerate(chunks):
-            silent_chunk = AudioSegment.silent(duration=500)
+        Returns:
+            SplitResult: The outcome of the split.
+        """
+        results = []
 
-            audio_chunk = silent_chunk + chunk + silent_chunk
+        def on_result(result) -> None:
+            results.append(result)
+            job.report(f"Exporting... {len(results)} chunks", done=len(results))
 
-            audio_chunk.export(
-                f"{self.string_output_path.get()}/{folder_name}/{str(i).zfill(4)}.mp3"
-            )
-            logging.info(f"Exported {str(i).zfill(4)}.mp3 to {folder_name}...")
+        result = split_file(
+            audio_file, output_root, on_status=job.report, on_result=on_result, **options
+        )
 
-        logging.info(f"Finished exporting {len(chunks)} chunks...")
-        self.split_audio_button.config(text="Split Audio", state="normal")
-        self.update()
+        for failure in result.failures:
+            logging.error(f"Chunk {failure.index} was not exported: {failure.error}")
+        return result
+
+    def _poll_split_events(self) -> None:
+        """Shows the progress of the splits until none is left."""
+        # Taken before the queue is drained: a job leaves the list and posts
+        # its last event at once, so that event is drained below.
+        pending = self.scheduler.jobs(SPLIT_GROUP)
+        text = None
+        while True:
+            try:
+                event = self._split_events.get_nowait()
+            except queue.Empty:
+                break
+
+            if event.state == job_scheduler.PROGRESS and event.text:
+                text = event.text
+            elif event.state == job_scheduler.FINISHED:
+                text = f"{event.name}: {event.result.chunk_count} chunks"
+            elif event.state in (job_scheduler.FAILED, job_scheduler.CANCELLED):
+                text = f"{event.name} {event.state}"
+
+        queued = sum(job.state == job_scheduler.QUEUED for job in pending)
+        if text is not None:
+            self.split_status.set(text + (f" ({queued} queued)" if queued else ""))
+
+        if pending:
+            self.after(200, self._poll_split_events)
+        else:
+            self._polling = False
+            self.cancel_button.config(state="disabled")
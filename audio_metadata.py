@@ -0,0 +1,165 @@
+import os
+import struct
+from typing import NamedTuple
+from audio_stream import read_wav_header
+from mpeg_audio import id3v2_size, info_tag, parse_frame_header, side_info_size
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# How far into a file to look for the first MP3 frame.
+_MAX_SYNC_SEARCH = 64 * 1024
+
+
+class AudioInfo(NamedTuple):
+    """Header metadata of an audio file.
+
+    Attributes:
+        duration_seconds (float): The duration of the audio in seconds.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+    """
+
+    duration_seconds: float
+    frame_rate: int
+    channels: int
+
+
+def probe_mp3(file_path):
+    """Reads the duration of an MP3 file from its frame headers.
+
+    VBR files are measured from their Xing/Info or VBRI frame count, minus
+    the encoder delay and padding of a LAME tag. CBR files without such a
+    header are measured from their size and bitrate.
+
+    Args:
+        file_path (str): The path to the MP3 file.
+
+    Returns:
+        AudioInfo: The metadata, or None if no MPEG audio frame was found.
+    """
+    file_size = os.path.getsize(file_path)
+
+    with open(file_path, "rb") as mp3_file:
+        offset = id3v2_size(mp3_file.read(10))
+        mp3_file.seek(offset)
+        data = mp3_file.read(_MAX_SYNC_SEARCH)
+
+        mp3_file.seek(max(file_size - 128, 0))
+        has_id3v1 = mp3_file.read(3) == b"TAG"
+
+    frame = None
+    position = data.find(b"\xff")
+    while 0 <= position < len(data) - 4:
+        frame = parse_frame_header(data[position : position + 4])
+        if frame is not None:
+            # Require a second frame right after the first to rule out false syncs.
+            following = data[position + frame.size : position + frame.size + 4]
+            if len(following) < 4 or parse_frame_header(following) is not None:
+                break
+        frame = None
+        position = data.find(b"\xff", position + 1)
+
+    if frame is None:
+        return None
+
+    first_frame = data[position : position + frame.size]
+    frame_count = None
+    delay_and_padding = 0
+
+    tag = info_tag(frame, first_frame)
+    xing_offset = 4 + side_info_size(frame)
+    xing = first_frame[xing_offset : xing_offset + 120]
+    if tag in (b"Xing", b"Info") and len(xing) >= 8:
+        flags = struct.unpack(">I", xing[4:8])[0]
+        field = 8
+        if flags & 0x01:
+            frame_count = struct.unpack(">I", xing[field : field + 4])[0]
+            field += 4
+        if flags & 0x02:
+            field += 4
+        if flags & 0x04:
+            field += 100
+        if flags & 0x08:
+            field += 4
+
+        lame = xing[field : field + 24]
+        if len(lame) == 24 and lame[:4] in (b"LAME", b"Lavf", b"Lavc"):
+            delay = (lame[21] << 4) | (lame[22] >> 4)
+            padding = ((lame[22] & 0x0F) << 8) | lame[23]
+            delay_and_padding = delay + padding
+    elif tag == b"VBRI" and len(first_frame) >= 54:
+        frame_count = struct.unpack(">I", first_frame[50:54])[0]
+
+    if frame_count is not None:
+        samples = frame_count * frame.samples - delay_and_padding
+        duration = max(samples, 0) / frame.frame_rate
+    else:
+        audio_bytes = file_size - offset - position - (128 if has_id3v1 else 0)
+        duration = audio_bytes * 8 / frame.bitrate
+
+    return AudioInfo(duration, frame.frame_rate, frame.channels)
+
+
+def probe_flac(file_path):
+    """Reads the duration of a FLAC file from its STREAMINFO block.
+
+    Args:
+        file_path (str): The path to the FLAC file.
+
+    Returns:
+        AudioInfo: The metadata, or None if the file does not start with a
+            STREAMINFO block or does not record its length.
+    """
+    with open(file_path, "rb") as flac_file:
+        offset = id3v2_size(flac_file.read(10))
+        flac_file.seek(offset)
+        data = flac_file.read(4 + 4 + 18)
+
+    # "fLaC", then the STREAMINFO block header, which must be the first block.
+    if len(data) < 26 or data[:4] != b"fLaC" or data[4] & 0x7F != 0:
+        return None
+
+    # 20 bits of sample rate, 3 of channels - 1, 5 of bits per sample - 1
+    # and 36 of total samples, starting 10 bytes into the block.
+    (fields,) = struct.unpack(">Q", data[18:26])
+    frame_rate = fields >> 44
+    channels = ((fields >> 41) & 0x07) + 1
+    samples = fields & 0xFFFFFFFFF
+    if frame_rate == 0 or samples == 0:
+        return None
+
+    return AudioInfo(samples / frame_rate, frame_rate, channels)
+
+
+def probe_audio(file_path):
+    """Reads the duration and layout of an audio file without decoding it.
+
+    Args:
+        file_path (str): The path to a WAV, MP3 or FLAC file.
+
+    Returns:
+        AudioInfo: The metadata, or None if the header could not be parsed.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+
+    try:
+        if extension == ".wav":
+            header = read_wav_header(file_path)
+            if header is None:
+                return None
+            return AudioInfo(header.duration_seconds, header.frame_rate, header.channels)
+
+        if extension == ".mp3":
+            return probe_mp3(file_path)
+
+        if extension == ".flac":
+            return probe_flac(file_path)
+    except OSError as error:
+        logging.warning(f"Could not read the header of {file_path}: {error}")
+
+    return None
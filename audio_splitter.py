@@ -0,0 +1,570 @@
+import json
+import os
+import pathlib
+import time
+from typing import NamedTuple
+from pcm_cache import shared_cache
+from silence_detection import chunk_ranges, detect_nonsilent
+from silence_splitter import (
+    MIN_SILENCE_LEN,
+    SILENCE_THRESH,
+    KEEP_SILENCE,
+    PADDING_MS,
+    StreamingSilenceSplitter,
+)
+from chunk_exporter import ChunkExporter, chunk_file_name, STREAM_COPY
+from adaptive_silence import (
+    CANDIDATE_THRESHOLDS,
+    SilenceAnalysis,
+    SilenceAnalyzer,
+    iter_range_chunks,
+)
+from cut_list import CUT_LIST, read_cut_list, write_cut_list
+from digest_memo import folder_memo
+from split_checkpoint import ExportLog
+import instrumentation
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Written to an output folder once every chunk of its source has been exported.
+COMPLETE_MARKER = ".split_complete"
+
+# How often a streaming split writes the ranges it has found so far, in seconds.
+CHECKPOINT_SECONDS = 1.0
+
+
+class SplitResult(NamedTuple):
+    """The outcome of splitting a single audio file.
+
+    Attributes:
+        audio_file (str): The path to the input audio file.
+        output_folder (str): The folder the chunks were written to.
+        chunk_count (int): The number of chunks the file was split into.
+        failures (list): The ExportResult of every chunk that failed to export.
+        audio_seconds (float): The length of the input in seconds.
+        seconds (float): The wall time spent on the file.
+        skipped (bool): True if the output folder was already complete.
+        silence_thresh (int): The silence threshold in dBFS the file was split on.
+        throughput (dict): The export cost, as returned by ``ChunkExporter.throughput``.
+    """
+
+    audio_file: str
+    output_folder: str
+    chunk_count: int
+    failures: list
+    audio_seconds: float
+    seconds: float
+    skipped: bool = False
+    silence_thresh: int = SILENCE_THRESH
+    throughput: dict = None
+
+
+def output_folder_for(audio_file, output_root) -> str:
+    """Returns the folder the chunks of an audio file are written to.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_root (str): The folder holding one sub-folder per input file.
+
+    Returns:
+        str: The path of the output folder.
+    """
+    folder_name = os.path.basename(audio_file).split(".")[0]
+    return f"{output_root}/{folder_name}"
+
+
+def _source_stamp(audio_file) -> dict:
+    """Returns the size and modification time that identify an input file.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+
+    Returns:
+        dict: The size and mtime of the file.
+    """
+    stat = os.stat(audio_file)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def is_split_complete(audio_file, output_folder) -> bool:
+    """Checks whether an output folder already holds every chunk of its input.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_folder (str): The folder the chunks are written to.
+
+    Returns:
+        bool: True if the folder was completed from the current version of the file.
+    """
+    try:
+        with open(f"{output_folder}/{COMPLETE_MARKER}", "r", encoding="utf8") as marker:
+            manifest = json.load(marker)
+    except (OSError, ValueError):
+        return False
+
+    if manifest.get("source") != _source_stamp(audio_file):
+        return False
+
+    return all(
+        os.path.exists(f"{output_folder}/{chunk_file_name(i, manifest['format'])}")
+        for i in range(manifest["chunks"])
+    )
+
+
+def _mark_complete(audio_file, output_folder, chunk_count, audio_seconds, export_format) -> None:
+    """Writes the completion marker of an output folder.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_folder (str): The folder the chunks were written to.
+        chunk_count (int): The number of chunks written.
+        audio_seconds (float): The length of the input in seconds.
+        export_format (str): The format the chunks were encoded in.
+    """
+    manifest = {
+        "source": _source_stamp(audio_file),
+        "chunks": chunk_count,
+        "format": export_format,
+        "audio_seconds": audio_seconds,
+    }
+    with open(f"{output_folder}/{COMPLETE_MARKER}", "w", encoding="utf8") as marker:
+        json.dump(manifest, marker)
+
+
+def split_file(
+    audio_file,
+    output_root,
+    streaming=False,
+    workers=None,
+    export_format="mp3",
+    skip_complete=False,
+    adaptive=False,
+    cut_list=False,
+    on_status=None,
+    on_result=None,
+) -> SplitResult:
+    """Splits an audio file on silence and exports the chunks.
+
+    In cut list mode only the chunk ranges are written, to a manifest in the
+    output folder, and nothing is encoded. Splitting the same file again
+    without cut list mode exports the chunks of that manifest, in its format,
+    without analyzing the file again, and then removes it.
+
+    Every split writes that manifest before exporting and logs each chunk
+    it exports next to it, so a split that was stopped or crashed continues
+    with the chunks that are missing, or whose file no longer matches the
+    size and hash it was logged with, without analyzing the file again.
+    A streaming split exports every chunk as soon as its range is final and
+    keeps the manifest up to date as it goes; when it was stopped, it
+    exports what is missing of the ranges it recorded and continues from
+    the silence after the last of them, without analyzing what comes before
+    it again.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_root (str): The folder holding one sub-folder per input file.
+        streaming (bool, optional): Decode the input window by window instead of all at once.
+        workers (int, optional): The number of export processes, one per core by default.
+        export_format (str, optional): The format the chunks are encoded in.
+        skip_complete (bool, optional): Do nothing if the output folder is already complete.
+        adaptive (bool, optional): Pick the silence threshold from the noise floor of the
+            file instead of using SILENCE_THRESH.
+        cut_list (bool, optional): Write the chunk ranges instead of the chunks.
+        on_status (callable, optional): Called with a short status text as the split progresses.
+        on_result (callable, optional): Called with each ExportResult as it finishes.
+
+    Returns:
+        SplitResult: The outcome of the split.
+    """
+    start = time.perf_counter()
+    output_folder = output_folder_for(audio_file, output_root)
+
+    def status(text) -> None:
+        logging.info(text)
+        if on_status is not None:
+            on_status(text)
+
+    if export_format == STREAM_COPY and not audio_file.lower().endswith(".mp3"):
+        raise ValueError(f"Stream copy needs an MP3 source, not {audio_file}")
+
+    if skip_complete and is_split_complete(audio_file, output_folder):
+        logging.info(f"Skipping {audio_file}, {output_folder} is complete")
+        with open(f"{output_folder}/{COMPLETE_MARKER}", "r", encoding="utf8") as marker:
+            manifest = json.load(marker)
+        return SplitResult(
+            audio_file,
+            output_folder,
+            manifest["chunks"],
+            [],
+            manifest["audio_seconds"],
+            time.perf_counter() - start,
+            skipped=True,
+        )
+
+    cuts = read_cut_list(output_folder)
+    if cuts is not None and cuts["stamp"] != _source_stamp(audio_file):
+        cuts = None
+
+    partial = None
+    if cuts is not None and cuts.get("partial"):
+        # A streaming split stopped before it found every range. The split
+        # goes on from there, but the chunk names must not change.
+        partial, cuts = cuts, None
+        export_format = partial["format"]
+
+    if cut_list:
+        if skip_complete and cuts is not None:
+            logging.info(f"Skipping {audio_file}, {output_folder} has a cut list")
+            return SplitResult(
+                audio_file,
+                output_folder,
+                len(cuts["chunks"]),
+                [],
+                cuts["length_ms"] / 1000,
+                time.perf_counter() - start,
+                skipped=True,
+                silence_thresh=cuts["silence_thresh"],
+            )
+        return _write_cut_list(audio_file, output_folder, export_format, adaptive, start, status)
+
+    pathlib.Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+    # A streaming split finds the ranges while it exports the chunks, the
+    # others find them all first.
+    single_pass = cuts is None and streaming and not adaptive and export_format != STREAM_COPY
+    audio = None
+    if cuts is None and not single_pass:
+        if adaptive or export_format == STREAM_COPY:
+            # Stream copy cuts ranges of the source, so it needs them up front.
+            analysis = _analyze(audio_file, adaptive, status)
+            cuts = _write_checkpoint(
+                audio_file,
+                output_folder,
+                export_format,
+                analysis.length_ms,
+                analysis.frame_rate,
+                analysis.channels,
+                analysis.threshold,
+                analysis.ranges[analysis.threshold],
+                keep_log=_resumes(partial, analysis.threshold),
+            )
+        else:
+            status(f"Loading {audio_file}...")
+            with instrumentation.span("split.load"):
+                audio = shared_cache().segment(audio_file)
+
+            status(f"Splitting {audio_file} into {output_folder}...")
+            with instrumentation.span("split.detect"):
+                nonsilent = detect_nonsilent(audio, MIN_SILENCE_LEN, SILENCE_THRESH)
+                ranges = chunk_ranges(nonsilent, KEEP_SILENCE, len(audio))
+            cuts = _write_checkpoint(
+                audio_file,
+                output_folder,
+                export_format,
+                len(audio),
+                audio.frame_rate,
+                audio.channels,
+                SILENCE_THRESH,
+                ranges,
+                keep_log=_resumes(partial, SILENCE_THRESH),
+            )
+    elif single_pass and not _resumes(partial, SILENCE_THRESH):
+        partial = None
+        ExportLog(output_folder).reset()
+
+    export_log = ExportLog(output_folder)
+    exported = export_log.verified()
+    memo = folder_memo(output_folder)
+    if single_pass:
+        silence_thresh = SILENCE_THRESH
+        if partial is not None and partial.get("resume"):
+            status(f"Resuming after the first {partial['resume']['chunks']} chunks...")
+        elif exported:
+            status(f"{len(exported)} chunks were already exported, resuming...")
+        status(f"Splitting {audio_file} at {silence_thresh} dBFS and exporting its chunks...")
+    else:
+        # The chunk names must not change, classifications may refer to them.
+        export_format = cuts["format"]
+        silence_thresh = cuts["silence_thresh"]
+        ranges = cuts["chunks"]
+        remaining = [index for index in range(len(ranges)) if index not in exported]
+        remaining_ranges = [ranges[index] for index in remaining]
+        if exported:
+            status(f"{len(exported)} of {len(ranges)} chunks were already exported, resuming...")
+        status(f"Exporting {len(remaining)} chunks split at {silence_thresh} dBFS...")
+
+    def record(result) -> None:
+        if result.error is None:
+            export_log.append(result)
+            # Classifying the chunks needs their digests, they were just computed.
+            memo.remember(os.path.basename(result.path), result.digest)
+        if on_result is not None:
+            on_result(result)
+
+    exporter = ChunkExporter(
+        output_folder, workers=workers, export_format=export_format, on_result=record
+    )
+    with exporter, export_log, instrumentation.span(
+        "split.file", file=audio_file, format=export_format
+    ):
+        if export_format == STREAM_COPY:
+            with instrumentation.span("split.export"):
+                exporter.copy_all(audio_file, remaining_ranges, remaining)
+        elif single_pass:
+            with instrumentation.span("split.export", streaming=True):
+                cuts = _export_streaming(
+                    audio_file, output_folder, export_format, exporter, exported, partial
+                )
+        elif streaming and audio is None:
+            with instrumentation.span("split.export", streaming=True):
+                exporter.export_all(iter_range_chunks(audio_file, remaining_ranges), remaining)
+        else:
+            if audio is None:
+                with instrumentation.span("split.load"):
+                    audio = shared_cache().segment(audio_file)
+            with instrumentation.span("split.export"):
+                exporter.export_all(
+                    (audio[start:end] for start, end in remaining_ranges), remaining
+                )
+        del audio
+
+    audio_seconds = cuts["length_ms"] / 1000
+    failures = exporter.failures
+    chunk_count = len(cuts["chunks"])
+    if not failures:
+        _mark_complete(audio_file, output_folder, chunk_count, audio_seconds, export_format)
+        os.remove(f"{output_folder}/{CUT_LIST}")
+        export_log.reset()
+
+    throughput = exporter.throughput()
+    instrumentation.count("split.chunks", len(exporter.results))
+    instrumentation.count("split.audio_seconds", audio_seconds)
+    status(
+        f"Finished exporting {len(exporter.results) - len(failures)} chunks, "
+        f"{len(failures)} failed..."
+    )
+    logging.info(
+        f"Exported {throughput['audio_seconds']:.1f} s of audio as {export_format} in "
+        f"{throughput['seconds']:.2f} s of work, {throughput['realtime_factor']:.1f}x "
+        f"realtime, {throughput['bytes'] / 2**20:.1f} MB"
+    )
+    return SplitResult(
+        audio_file,
+        output_folder,
+        chunk_count,
+        failures,
+        audio_seconds,
+        time.perf_counter() - start,
+        silence_thresh=silence_thresh,
+        throughput=throughput,
+    )
+
+
+def _analyze(audio_file, adaptive, status) -> SilenceAnalysis:
+    """Finds the chunk ranges of an audio file in one streaming pass.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        adaptive (bool): Pick the silence threshold from the noise floor of the file.
+        status (callable): Called with a short status text.
+
+    Returns:
+        SilenceAnalysis: The analysis, whose threshold is SILENCE_THRESH unless adaptive.
+    """
+    status(f"Analyzing {audio_file}...")
+    candidates = CANDIDATE_THRESHOLDS if adaptive else (SILENCE_THRESH,)
+    with instrumentation.span("split.analyze", file=audio_file):
+        return SilenceAnalyzer(audio_file, candidates=candidates).analyze()
+
+
+def _resumes(partial, silence_thresh) -> bool:
+    """Checks whether the chunks a stopped streaming split exported can be kept.
+
+    Args:
+        partial (dict): The partial cut list the split left, or None.
+        silence_thresh (int): The silence threshold in dBFS the file is split on now.
+
+    Returns:
+        bool: True if the split used the same threshold, so the ranges found
+            again are the same.
+    """
+    return partial is not None and partial["silence_thresh"] == silence_thresh
+
+
+def _export_streaming(
+    audio_file, output_folder, export_format, exporter, exported, partial=None
+) -> dict:
+    """Splits an audio file in one pass, exporting each chunk once its range is final.
+
+    The ranges found so far are written as a partial cut list at most every
+    CHECKPOINT_SECONDS, and all of them once the end of the file is reached.
+    The partial cut list also records the last range the split can continue
+    after, with the start of the silence that follows it.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_folder (str): The folder the chunks are written to.
+        export_format (str): The format the chunks are encoded in.
+        exporter (ChunkExporter): The exporter to submit the chunks to.
+        exported (set): The indexes of the chunks that were already exported.
+        partial (dict, optional): The partial cut list of a stopped split of the
+            file at the same threshold, to continue from.
+
+    Returns:
+        dict: The manifest of the complete cut list.
+    """
+    splitter = StreamingSilenceSplitter(audio_file)
+    ranges = []
+    resume = None
+    if partial is not None and partial.get("resume"):
+        resume = partial["resume"]
+        ranges = partial["chunks"][: resume["chunks"]]
+        missing = [index for index in range(len(ranges)) if index not in exported]
+        if missing:
+            chunks = iter_range_chunks(audio_file, [ranges[index] for index in missing])
+            for index, chunk in zip(missing, chunks):
+                exporter.submit(index, chunk)
+
+    written = None
+    resume_ms = None if resume is None else resume["silence_ms"]
+    for start_ms, end_ms, chunk in splitter.iter_cuts(resume_ms):
+        index = len(ranges)
+        ranges.append([start_ms, end_ms])
+        if index not in exported:
+            exporter.submit(index, chunk)
+        if splitter.resume_ms is not None:
+            resume = {"chunks": len(ranges), "silence_ms": splitter.resume_ms}
+
+        if written is None or time.perf_counter() - written >= CHECKPOINT_SECONDS:
+            _write_checkpoint(
+                audio_file,
+                output_folder,
+                export_format,
+                None,
+                splitter.frame_rate,
+                splitter.channels,
+                SILENCE_THRESH,
+                ranges,
+                keep_log=True,
+                resume=resume,
+                partial=True,
+            )
+            written = time.perf_counter()
+
+    exporter.wait()
+    return _write_checkpoint(
+        audio_file,
+        output_folder,
+        export_format,
+        splitter.length_ms,
+        splitter.frame_rate,
+        splitter.channels,
+        SILENCE_THRESH,
+        ranges,
+        keep_log=True,
+    )
+
+
+def _write_checkpoint(
+    audio_file,
+    output_folder,
+    export_format,
+    length_ms,
+    frame_rate,
+    channels,
+    silence_thresh,
+    ranges,
+    keep_log=False,
+    resume=None,
+    partial=False,
+) -> dict:
+    """Writes the chunk ranges of an audio file as the cut list of its output folder.
+
+    The cut list is the checkpoint of the split until every chunk has been
+    exported. Unless told otherwise, the export log of earlier ranges no
+    longer applies and is removed.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_folder (str): The folder the chunks are written to.
+        export_format (str): The format the chunks are encoded in.
+        length_ms (int): The length of the input in milliseconds.
+        frame_rate (int): The sample rate of the input in Hz.
+        channels (int): The number of audio channels of the input.
+        silence_thresh (int): The silence threshold in dBFS the ranges were found with.
+        ranges (list): The chunk ranges ``[start_ms, end_ms]``.
+        keep_log (bool, optional): Keep the export log, because the ranges it
+            refers to are the same.
+        resume (dict, optional): The number of ranges a stopped streaming split
+            can continue after, and the start of the silence that follows them.
+        partial (bool, optional): The ranges are those a streaming split has
+            found so far, and the length is not known yet.
+
+    Returns:
+        dict: The manifest that was written.
+    """
+    manifest = {
+        "source": os.path.abspath(audio_file),
+        "stamp": _source_stamp(audio_file),
+        "length_ms": length_ms,
+        "frame_rate": frame_rate,
+        "channels": channels,
+        "silence_thresh": silence_thresh,
+        # Stream copied chunks are cut from the source as they are, unpadded.
+        "padding_ms": 0 if export_format == STREAM_COPY else PADDING_MS,
+        "format": export_format,
+        "chunks": ranges,
+    }
+    if partial:
+        manifest["partial"] = True
+        manifest["resume"] = resume
+    if not keep_log:
+        ExportLog(output_folder).reset()
+    write_cut_list(output_folder, manifest)
+    return manifest
+
+
+def _write_cut_list(audio_file, output_folder, export_format, adaptive, start, status) -> SplitResult:
+    """Finds the chunk ranges of an audio file and writes them as its cut list.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        output_folder (str): The folder the chunks would be written to.
+        export_format (str): The format the chunks will be encoded in when exported.
+        adaptive (bool): Pick the silence threshold from the noise floor of the file.
+        start (float): The ``time.perf_counter()`` value the split started at.
+        status (callable): Called with a short status text.
+
+    Returns:
+        SplitResult: The outcome of the split, with the number of ranges as chunk count.
+    """
+    pathlib.Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+    analysis = _analyze(audio_file, adaptive, status)
+    ranges = analysis.ranges[analysis.threshold]
+    _write_checkpoint(
+        audio_file,
+        output_folder,
+        export_format,
+        analysis.length_ms,
+        analysis.frame_rate,
+        analysis.channels,
+        analysis.threshold,
+        ranges,
+    )
+
+    status(f"Wrote a cut list of {len(ranges)} chunks to {output_folder}...")
+    return SplitResult(
+        audio_file,
+        output_folder,
+        len(ranges),
+        [],
+        analysis.length_ms / 1000,
+        time.perf_counter() - start,
+        silence_thresh=analysis.threshold,
+    )
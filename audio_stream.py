@@ -0,0 +1,444 @@
+import os
+import struct
+import subprocess
+import audioop
+from pydub import AudioSegment
+from pydub.utils import mediainfo_json
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Default size of a decoded PCM window, in milliseconds.
+WINDOW_MS = 10000
+
+# Maps the most significant byte of a 24-bit sample to the padding byte pydub
+# prepends when it widens 24-bit audio to 32-bit.
+_SIGN_PADDING = bytes(0xFF if b > 0x7F else 0x00 for b in range(256))
+
+
+class WavHeader:
+    """Describes the PCM layout of a WAV file without reading its samples.
+
+    Attributes:
+        channels (int): The number of audio channels.
+        frame_rate (int): The sample rate in Hz.
+        sample_width (int): The number of bytes per sample, as stored in the file.
+        data_offset (int): The byte offset of the first sample.
+        data_size (int): The size of the sample data in bytes.
+    """
+
+    def __init__(self, channels, frame_rate, sample_width, data_offset, data_size):
+        """Initializes the WavHeader.
+
+        Args:
+            channels (int): The number of audio channels.
+            frame_rate (int): The sample rate in Hz.
+            sample_width (int): The number of bytes per sample.
+            data_offset (int): The byte offset of the first sample.
+            data_size (int): The size of the sample data in bytes.
+        """
+        self.channels = channels
+        self.frame_rate = frame_rate
+        self.sample_width = sample_width
+        self.data_offset = data_offset
+        self.data_size = data_size
+
+    @property
+    def frame_count(self) -> int:
+        """int: The number of frames in the data chunk."""
+        return self.data_size // (self.channels * self.sample_width)
+
+    @property
+    def duration_seconds(self) -> float:
+        """float: The duration of the audio in seconds."""
+        return self.frame_count / float(self.frame_rate)
+
+
+def read_wav_header(file_path):
+    """Parses the RIFF chunks of a PCM WAV file.
+
+    The chunks are walked the same way pydub does, so a file this accepts
+    decodes to the same samples as ``AudioSegment.from_file``.
+
+    Args:
+        file_path (str): The path to the WAV file.
+
+    Returns:
+        WavHeader: The parsed header, or None if the file is not a PCM WAV file.
+    """
+    file_size = os.path.getsize(file_path)
+
+    with open(file_path, "rb") as wav_file:
+        riff = wav_file.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+
+        fmt = None
+        position = 12
+        for _ in range(10):
+            wav_file.seek(position)
+            chunk_header = wav_file.read(8)
+            if len(chunk_header) < 8:
+                return None
+
+            chunk_id = chunk_header[:4]
+            chunk_size = struct.unpack("<I", chunk_header[4:])[0]
+
+            if chunk_id == b"fmt ":
+                fmt = wav_file.read(16)
+                if len(fmt) < 16:
+                    return None
+            elif chunk_id == b"data":
+                break
+
+            position += chunk_size + 8
+        else:
+            return None
+
+    if fmt is None:
+        return None
+
+    audio_format, channels, frame_rate = struct.unpack("<HHI", fmt[:8])
+    bits_per_sample = struct.unpack("<H", fmt[14:16])[0]
+
+    if audio_format not in (1, 0xFFFE) or channels == 0 or bits_per_sample % 8:
+        return None
+
+    data_offset = position + 8
+    data_size = min(chunk_size, file_size - data_offset)
+
+    return WavHeader(channels, frame_rate, bits_per_sample // 8, data_offset, data_size)
+
+
+class PCMStream:
+    """Decodes an audio file into fixed-size windows of raw PCM.
+
+    WAV files are read straight from disk, everything else is decoded by a
+    single ffmpeg process whose output is consumed as it is produced. The
+    samples match what ``AudioSegment.from_file`` would return for the same
+    file, but only one window is held in memory at a time.
+
+    Given a PCMCache, a file the cache already holds is read from its entry
+    instead of being decoded, and a file it does not hold is written to it
+    as it is decoded, once the whole file has been read.
+
+    Attributes:
+        file_path (str): The path to the audio file.
+        window_ms (int): The length of each window in milliseconds.
+        sample_width (int): The number of bytes per sample of the decoded audio.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+    """
+
+    def __init__(self, file_path, window_ms=WINDOW_MS, cache=None) -> None:
+        """Initializes the PCMStream and opens the underlying decoder.
+
+        Args:
+            file_path (str): The path to the audio file.
+            window_ms (int, optional): The length of each window in milliseconds.
+            cache (PCMCache, optional): The cache to read the decoded audio from
+                and to add it to.
+        """
+        self.file_path = file_path
+        self.window_ms = window_ms
+
+        self._file = None
+        self._process = None
+        self._remaining = None
+        self._input_width = None
+        self._header = None
+        self._cached = None
+        self._offset = 0
+        self._writer = None
+
+        header = None
+        if file_path.lower().endswith(".wav"):
+            header = read_wav_header(file_path)
+
+        cached = None
+        if header is None and cache is not None:
+            cached = cache.lookup(file_path)
+
+        if header is not None:
+            self._open_wav(header)
+        elif cached is not None:
+            self._open_cached(cached)
+        else:
+            self._open_ffmpeg()
+
+        # pydub widens 24-bit audio to 32-bit when it loads it.
+        self.sample_width = 4 if self._input_width == 3 else self._input_width
+
+        if self._process is not None and cache is not None:
+            self._writer = cache.writer(
+                file_path, self.sample_width, self.frame_rate, self.channels
+            )
+
+    @property
+    def frame_width(self) -> int:
+        """int: The number of bytes per frame of the decoded audio."""
+        return self.sample_width * self.channels
+
+    @property
+    def max_possible_amplitude(self) -> float:
+        """float: The largest absolute sample value, as pydub defines it."""
+        return (2 ** (self.sample_width * 8)) / 2
+
+    @property
+    def seekable(self) -> bool:
+        """bool: Whether ranges can be read without decoding what comes before them."""
+        return self._header is not None or self._cached is not None
+
+    def read_range(self, start_ms, end_ms) -> bytes:
+        """Reads a range of a WAV file by seeking to it.
+
+        The frame boundaries match ``AudioSegment[start_ms:end_ms]``, including
+        the silence it pads past the end of the audio.
+
+        Args:
+            start_ms (int): The start of the range in milliseconds.
+            end_ms (int): The end of the range in milliseconds.
+
+        Returns:
+            bytes: The raw PCM data of the range.
+        """
+        if not self.seekable:
+            raise ValueError(f"{self.file_path} is decoded by ffmpeg and cannot seek")
+
+        input_frame_width = self._input_width * self.channels
+        start_frame = int(start_ms * (self.frame_rate / 1000.0))
+        end_frame = int(end_ms * (self.frame_rate / 1000.0))
+
+        if self._cached is not None:
+            frame_count = len(self._cached) // input_frame_width
+            self._offset = start_frame * input_frame_width
+        else:
+            frame_count = self._header.frame_count
+            self._file.seek(self._header.data_offset + start_frame * input_frame_width)
+
+        present = max(min(end_frame, frame_count) - start_frame, 0)
+        data = self._convert(self._read(present * input_frame_width))
+        return data + b"\x00" * ((end_frame - start_frame - present) * self.frame_width)
+
+    def seek(self, start_ms) -> int:
+        """Moves a stream that has not been read yet to a position.
+
+        ``windows`` continues from there. WAV files and cache entries jump
+        to it, a decoder is read up to it, still adding what it decodes to
+        the cache.
+
+        Args:
+            start_ms (int): The position in milliseconds.
+
+        Returns:
+            int: The frame the stream was moved to, less past the end of the audio.
+        """
+        input_frame_width = self._input_width * self.channels
+        size = int(start_ms * (self.frame_rate / 1000.0)) * input_frame_width
+
+        if self.seekable:
+            size = min(size, self._remaining - self._remaining % input_frame_width)
+            if self._cached is not None:
+                self._offset = size
+            else:
+                self._file.seek(self._header.data_offset + size)
+            self._remaining -= size
+            return size // input_frame_width
+
+        skipped = 0
+        block = input_frame_width * 65536
+        while skipped < size:
+            data = self._file.read(min(block, size - skipped))
+            data = data[: len(data) - len(data) % input_frame_width]
+            if not data:
+                break
+            skipped += len(data)
+            if self._writer is not None:
+                self._writer.write(self._convert(data))
+        return skipped // input_frame_width
+
+    def _open_wav(self, header) -> None:
+        """Opens a WAV file for direct reading.
+
+        Args:
+            header (WavHeader): The parsed header of the file.
+        """
+        self.frame_rate = header.frame_rate
+        self.channels = header.channels
+        self._input_width = header.sample_width
+        self._unsigned = header.sample_width == 1
+
+        self._file = open(self.file_path, "rb")
+        self._file.seek(header.data_offset)
+        self._remaining = header.data_size
+        self._header = header
+
+    def _open_cached(self, audio) -> None:
+        """Reads the decoded audio from a cache entry.
+
+        Args:
+            audio (PCMAudio): The memory-mapped samples of the entry.
+        """
+        self.frame_rate = audio.frame_rate
+        self.channels = audio.channels
+        self._input_width = audio.sample_width
+        self._unsigned = False
+
+        self._cached = audio.data
+        self._remaining = len(audio.data)
+
+    def _read(self, size) -> bytes:
+        """Reads the next bytes from the file, decoder or cache entry.
+
+        Args:
+            size (int): The number of bytes to read.
+
+        Returns:
+            bytes: The bytes, fewer at the end of the audio.
+        """
+        if self._cached is None:
+            return self._file.read(size)
+
+        data = bytes(self._cached[self._offset : self._offset + size])
+        self._offset += len(data)
+        return data
+
+    def _open_ffmpeg(self) -> None:
+        """Starts an ffmpeg process that writes raw PCM to a pipe."""
+        info = mediainfo_json(self.file_path)
+        audio_streams = [x for x in info["streams"] if x["codec_type"] == "audio"]
+        if not audio_streams:
+            raise ValueError(f"No audio stream found in {self.file_path}")
+        stream = audio_streams[0]
+
+        # Same codec selection as AudioSegment.from_file.
+        if stream.get("sample_fmt") == "fltp" and stream.get("codec_name") in [
+            "mp3",
+            "mp4",
+            "aac",
+            "webm",
+            "ogg",
+        ]:
+            bits_per_sample = 16
+        else:
+            bits_per_sample = int(stream["bits_per_sample"])
+
+        if bits_per_sample == 8:
+            output_format = "u8"
+        else:
+            output_format = f"s{bits_per_sample}le"
+
+        self.frame_rate = int(stream["sample_rate"])
+        self.channels = int(stream["channels"])
+        self._input_width = bits_per_sample // 8
+        self._unsigned = bits_per_sample == 8
+
+        conversion_command = [
+            AudioSegment.converter,
+            "-nostdin",
+            "-i",
+            self.file_path,
+            "-vn",
+            "-acodec",
+            f"pcm_{output_format}",
+            "-f",
+            output_format,
+            "-",
+        ]
+        logging.info(f"Streaming {self.file_path} through {AudioSegment.converter}")
+        self._process = subprocess.Popen(
+            conversion_command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._file = self._process.stdout
+
+    def _convert(self, data) -> bytes:
+        """Converts raw input samples to the layout pydub uses in memory.
+
+        Args:
+            data (bytes): Samples as read from the file or decoder.
+
+        Returns:
+            bytes: The converted samples.
+        """
+        if self._unsigned:
+            return audioop.bias(data, 1, -128)
+
+        if self._input_width == 3:
+            widened = bytearray(len(data) // 3 * 4)
+            widened[0::4] = data[2::3].translate(_SIGN_PADDING)
+            widened[1::4] = data[0::3]
+            widened[2::4] = data[1::3]
+            widened[3::4] = data[2::3]
+            return bytes(widened)
+
+        return data
+
+    def windows(self):
+        """Yields the decoded audio one window at a time.
+
+        Every window holds a whole number of frames. All windows except the
+        last one are exactly ``window_ms`` long.
+
+        Yields:
+            bytes: The raw PCM data of the next window.
+        """
+        input_frame_width = self._input_width * self.channels
+        window_frames = max(1, int(self.window_ms * (self.frame_rate / 1000.0)))
+        window_bytes = window_frames * input_frame_width
+
+        while True:
+            to_read = window_bytes
+            if self._remaining is not None:
+                to_read = min(to_read, self._remaining)
+                if to_read <= 0:
+                    break
+
+            data = self._read(to_read)
+            if self._remaining is not None:
+                self._remaining -= len(data)
+
+            data = data[: len(data) - len(data) % input_frame_width]
+            if not data:
+                break
+
+            data = self._convert(data)
+            if self._writer is not None:
+                self._writer.write(data)
+            yield data
+
+        if self._writer is not None:
+            # Only a decode that got through the whole file is worth keeping.
+            if self._process.wait() == 0:
+                self._writer.commit()
+            else:
+                self._writer.discard()
+            self._writer = None
+
+    def close(self) -> None:
+        """Closes the file and stops the decoder if one is running."""
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
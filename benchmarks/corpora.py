@@ -0,0 +1,127 @@
+"""Deterministic synthetic audio for the benchmarks.
+
+Everything is generated from a seed, so two runs on different commits
+measure the same input without any recordings being shipped.
+"""
+import os
+import wave
+import numpy as np
+from chunk_exporter import chunk_file_name
+
+
+def tone_bursts(seconds, frame_rate, noise_rms=20, seed=0) -> np.ndarray:
+    """Builds mono tone bursts of random pitch and length separated by gaps.
+
+    Args:
+        seconds (float): The length of the recording in seconds.
+        frame_rate (int): The sample rate in Hz.
+        noise_rms (float, optional): The RMS of the white noise under the bursts
+            and in the gaps, in sample units. The default is about -64 dBFS.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        np.ndarray: The 16-bit samples.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * frame_rate)
+    samples = rng.normal(0, noise_rms, total)
+
+    position = 0
+    while position < total:
+        position += int(rng.uniform(0.2, 3.0) * frame_rate)
+        length = int(rng.uniform(0.1, 4.0) * frame_rate)
+        end = min(position + length, total)
+
+        t = np.arange(end - position) / frame_rate
+        samples[position:end] += 8000 * np.sin(2 * np.pi * rng.uniform(200, 2000) * t)
+        position = end
+
+    return np.clip(samples, -32768, 32767).astype("<i2")
+
+
+def noise_bed(seconds, frame_rate, seed=0) -> np.ndarray:
+    """Builds tone bursts over a noise bed of about -40 dBFS, above SILENCE_THRESH.
+
+    With the default threshold nothing in it is silent, so the whole file
+    is one chunk unless the threshold is picked from the noise floor.
+
+    Args:
+        seconds (float): The length of the recording in seconds.
+        frame_rate (int): The sample rate in Hz.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        np.ndarray: The 16-bit samples.
+    """
+    return tone_bursts(seconds, frame_rate, noise_rms=330, seed=seed)
+
+
+# Builders of the recordings the split benchmark runs on, by name.
+RECORDINGS = {"tone_bursts": tone_bursts, "noise_bed": noise_bed}
+
+
+def write_wav(path, samples, frame_rate) -> None:
+    """Writes mono 16-bit samples to a WAV file.
+
+    Args:
+        path (str): The path of the file to write.
+        samples (np.ndarray): The 16-bit samples.
+        frame_rate (int): The sample rate in Hz.
+    """
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(frame_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def recording_file(folder, name, seconds, frame_rate) -> str:
+    """Writes a synthetic recording unless the folder already has it.
+
+    Args:
+        folder (str): The folder to write the recording to.
+        name (str): The key of the recording in RECORDINGS.
+        seconds (float): The length of the recording in seconds.
+        frame_rate (int): The sample rate in Hz.
+
+    Returns:
+        str: The path of the WAV file.
+    """
+    path = f"{folder}/{name}_{seconds:g}s_{frame_rate}.wav"
+    if not os.path.exists(path):
+        write_wav(f"{path}.tmp", RECORDINGS[name](seconds, frame_rate), frame_rate)
+        os.replace(f"{path}.tmp", path)
+    return path
+
+
+def chunk_folder(folder, count, chunk_ms=100, frame_rate=8000, seed=0) -> str:
+    """Writes a folder of short WAV chunks named the way the splitter names them.
+
+    The chunks are cut from one tone burst recording, so they differ from
+    each other but the folder is the same on every run.
+
+    Args:
+        folder (str): The folder to create the chunk folder in.
+        count (int): The number of chunks.
+        chunk_ms (int, optional): The length of each chunk in milliseconds.
+        frame_rate (int, optional): The sample rate in Hz.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        str: The path of the chunk folder.
+    """
+    path = f"{folder}/chunks_{count}"
+    os.makedirs(path, exist_ok=True)
+
+    chunk_frames = chunk_ms * frame_rate // 1000
+    # A few hundred distinct chunks are enough; larger folders repeat them.
+    variants = min(count, 256)
+    source = tone_bursts(variants * chunk_ms / 1000, frame_rate, seed=seed)
+    for index in range(count):
+        variant = index % variants
+        write_wav(
+            f"{path}/{chunk_file_name(index, 'wav')}",
+            source[variant * chunk_frames : (variant + 1) * chunk_frames],
+            frame_rate,
+        )
+    return path
@@ -0,0 +1,92 @@
+"""Compares the NumPy silence detector with pydub's on a synthetic recording.
+
+Run from the repository root:
+
+    python -m benchmarks.silence_benchmark --hours 2 --pydub-minutes 10
+"""
+import argparse
+import time
+from pydub import AudioSegment
+from pydub import silence as pydub_silence
+from benchmarks import corpora
+import silence_detection
+from silence_splitter import MIN_SILENCE_LEN, SILENCE_THRESH
+
+
+def synthetic_recording(hours, frame_rate, seed=0) -> AudioSegment:
+    """Builds a mono 16-bit recording of tone bursts separated by quiet gaps.
+
+    Args:
+        hours (float): The length of the recording in hours.
+        frame_rate (int): The sample rate in Hz.
+        seed (int, optional): The seed of the random generator.
+
+    Returns:
+        AudioSegment: The recording.
+    """
+    data = corpora.tone_bursts(hours * 3600, frame_rate, seed=seed).tobytes()
+    return AudioSegment(data=data, sample_width=2, frame_rate=frame_rate, channels=1)
+
+
+def time_call(function, *args):
+    """Runs a function once and measures it.
+
+    Args:
+        function: The function to run.
+        *args: The arguments to pass to it.
+
+    Returns:
+        tuple: The result and the elapsed wall time in seconds.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    """Runs the benchmark and prints the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--frame-rate", type=int, default=16000)
+    parser.add_argument(
+        "--pydub-minutes",
+        type=float,
+        default=None,
+        help="Only run pydub on the first N minutes and extrapolate its time.",
+    )
+    args = parser.parse_args()
+
+    audio = synthetic_recording(args.hours, args.frame_rate)
+    audio_seconds = len(audio) / 1000
+    print(f"Synthetic recording: {audio_seconds / 3600:.2f} h at {args.frame_rate} Hz")
+
+    ranges, numpy_time = time_call(
+        silence_detection.detect_nonsilent, audio, MIN_SILENCE_LEN, SILENCE_THRESH
+    )
+    print(
+        f"numpy: {numpy_time:.2f} s, {len(ranges)} ranges, "
+        f"{audio_seconds / numpy_time:.0f}x realtime"
+    )
+
+    compared = audio
+    if args.pydub_minutes is not None:
+        compared = audio[: int(args.pydub_minutes * 60000)]
+        ranges = silence_detection.detect_nonsilent(
+            compared, MIN_SILENCE_LEN, SILENCE_THRESH
+        )
+
+    pydub_ranges, pydub_time = time_call(
+        pydub_silence.detect_nonsilent, compared, MIN_SILENCE_LEN, SILENCE_THRESH
+    )
+    pydub_time *= len(audio) / len(compared)
+    print(
+        f"pydub: {pydub_time:.2f} s{' (extrapolated)' if compared is not audio else ''}, "
+        f"{audio_seconds / pydub_time:.0f}x realtime"
+    )
+
+    print(f"Speedup: {pydub_time / numpy_time:.1f}x")
+    print(f"Identical ranges: {pydub_ranges == ranges}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Measures splitting, folder opening and labelling on synthetic corpora.
+
+Every case runs in a fresh process, so its peak RSS is its own. The
+results are written as JSON and can be compared with an earlier run:
+
+    python -m benchmarks.suite -o after.json --baseline before.json
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from benchmarks import corpora
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+# Modes of split_file the split benchmark runs, by name.
+SPLIT_MODES = {
+    "in_memory": {},
+    "streaming": {"streaming": True},
+    "adaptive": {"adaptive": True},
+}
+
+# Measurements that describe the input rather than the code, not compared.
+INPUTS = ("audio_seconds",)
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of the current process.
+
+    Returns:
+        float: The peak RSS in MiB, or None where it cannot be measured.
+    """
+    # ru_maxrss is inherited from the parent across fork and exec on Linux,
+    # so it would report the corpus generation. VmHWM is per process image.
+    try:
+        with open("/proc/self/status", "r", encoding="utf8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 1024 ** (2 if sys.platform == "darwin" else 1)
+
+
+def percentiles_ms(latencies) -> dict:
+    """Summarizes latencies measured in seconds.
+
+    Args:
+        latencies (list): The latencies in seconds.
+
+    Returns:
+        dict: The median, 95th percentile and maximum in milliseconds.
+    """
+    values = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max()),
+    }
+
+
+def bench_split(audio_file, output_root, mode, export_format, workers) -> dict:
+    """Splits a recording into an empty output folder.
+
+    Args:
+        audio_file (str): The path to the recording.
+        output_root (str): The folder the output folder is created in.
+        mode (str): The key of the split mode in SPLIT_MODES.
+        export_format (str): The format the chunks are encoded in.
+        workers (int): The number of export processes.
+
+    Returns:
+        dict: The wall time, audio length, realtime factor and chunk count.
+    """
+    from audio_splitter import split_file
+
+    result = split_file(
+        audio_file,
+        output_root,
+        workers=workers,
+        export_format=export_format,
+        **SPLIT_MODES[mode],
+    )
+    return {
+        "seconds": result.seconds,
+        "audio_seconds": result.audio_seconds,
+        "realtime_factor": result.audio_seconds / result.seconds,
+        "chunks": result.chunk_count,
+    }
+
+
+def bench_folder_open(folder) -> dict:
+    """Opens a folder for labelling twice.
+
+    The first open probes every file and creates the CSV file and the folder
+    index; the second finds both, as when a session is resumed.
+
+    Args:
+        folder (str): The path to a chunk folder without CSV file or index.
+
+    Returns:
+        dict: The wall time of both opens and the number of files found.
+    """
+    from csv_controller import CSVController
+
+    timings = {}
+    for name in ("cold_seconds", "warm_seconds"):
+        controller = CSVController()
+        start = time.perf_counter()
+        controller.open_folder(folder)
+        timings[name] = time.perf_counter() - start
+        controller.close()
+
+    timings["files"] = len(controller.folder_files)
+    return timings
+
+
+def bench_label_save(folder, labels) -> dict:
+    """Labels random rows of an opened folder and saves them.
+
+    Args:
+        folder (str): The path to a chunk folder.
+        labels (int): The number of labels to set.
+
+    Returns:
+        dict: The latency percentiles of a single label and the wall time of
+            writing them all to the CSV file.
+    """
+    from csv_controller import CSVController
+
+    controller = CSVController(flush_interval=3600)
+    controller.open_folder(folder)
+
+    rng = np.random.default_rng(0)
+    rows = rng.integers(1, len(controller._rows), labels)
+    latencies = []
+    for number, row in enumerate(rows.tolist()):
+        start = time.perf_counter()
+        controller.set_classification(row, f"label{number % 2}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    controller.flush()
+    flush_seconds = time.perf_counter() - start
+    controller.close()
+
+    return {**percentiles_ms(latencies), "labels": labels, "flush_seconds": flush_seconds}
+
+
+def run_case(function, *args) -> dict:
+    """Runs one benchmark in the current process and adds its peak RSS.
+
+    Args:
+        function: The benchmark function.
+        *args: The arguments to pass to it.
+
+    Returns:
+        dict: The measurements of the benchmark.
+    """
+    # The per-file log lines would dominate the folder benchmarks.
+    logging.disable(logging.INFO)
+    result = function(*args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(function, *args) -> dict:
+    """Runs one benchmark in a fresh process.
+
+    Args:
+        function: The benchmark function.
+        *args: The arguments to pass to it.
+
+    Returns:
+        dict: The measurements of the benchmark.
+    """
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(run_case, function, *args).result()
+
+
+def git_commit():
+    """Returns the commit the working tree is on.
+
+    Returns:
+        str: The commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, report) -> None:
+    """Prints how every measurement changed since a baseline run.
+
+    Args:
+        baseline (dict): The report of the earlier run.
+        report (dict): The report of this run.
+    """
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    if baseline.get("parameters") != report["parameters"]:
+        print("  The baseline was run with different parameters.")
+
+    for case, measurements in report["results"].items():
+        before = baseline["results"].get(case)
+        if before is None:
+            continue
+        for name, value in measurements.items():
+            old = before.get(name)
+            if name in INPUTS or not isinstance(value, float) or not old:
+                continue
+            print(f"  {case} {name}: {old:.4g} -> {value:.4g} ({value / old:.2f}x)")
+
+
+def main() -> None:
+    """Generates the corpora, runs every case and writes the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", required=True, help="The JSON file to write.")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with.")
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--frame-rate", type=int, default=16000)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--labels", type=int, default=500)
+    parser.add_argument("--format", default="wav", help="The export format of the split.")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--work-dir", help="Where corpora are generated, a temporary folder by default."
+    )
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="audioclassifier-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    seconds = args.minutes * 60
+    results = {}
+
+    try:
+        for recording in corpora.RECORDINGS:
+            audio_file = corpora.recording_file(work_dir, recording, seconds, args.frame_rate)
+            for mode in SPLIT_MODES:
+                output_root = f"{work_dir}/split"
+                shutil.rmtree(output_root, ignore_errors=True)
+                case = f"split.{recording}.{mode}"
+                results[case] = run_isolated(
+                    bench_split, audio_file, output_root, mode, args.format, args.workers
+                )
+                print(f"{case}: {results[case]}")
+
+        for count in args.chunks:
+            shutil.rmtree(f"{work_dir}/chunks_{count}", ignore_errors=True)
+            folder = corpora.chunk_folder(work_dir, count)
+            for case, function, extra in (
+                (f"folder_open.{count}", bench_folder_open, ()),
+                (f"label_save.{count}", bench_label_save, (args.labels,)),
+            ):
+                results[case] = run_isolated(function, folder, *extra)
+                print(f"{case}: {results[case]}")
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("output", "baseline", "work_dir")
+        },
+        "results": results,
+    }
+    with open(f"{args.output}.tmp", "w", encoding="utf8") as file:
+        json.dump(report, file, indent=2)
+    os.replace(f"{args.output}.tmp", args.output)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf8") as file:
+            compare(json.load(file), report)
+
+
+if __name__ == "__main__":
+    main()
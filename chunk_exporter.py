@@ -0,0 +1,363 @@
+import os
+import time
+import wave
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import NamedTuple, Optional
+from pydub import AudioSegment
+from silence_splitter import pad_chunk, PADDING_MS
+from mp3_frames import Mp3FrameIndex
+from split_checkpoint import file_digest
+import instrumentation
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+class ExportResult(NamedTuple):
+    """The outcome of exporting a single chunk.
+
+    Attributes:
+        index (int): The position of the chunk in the source file.
+        path (str): The path the chunk was written to.
+        seconds (float): The time spent padding and encoding the chunk.
+        error (str): The error message if the export failed, None otherwise.
+        size (int): The size of the written file in bytes.
+        audio_seconds (float): The length of the chunk without padding in seconds.
+        digest (str): The SHA-256 of the written file.
+    """
+
+    index: int
+    path: str
+    seconds: float
+    error: Optional[str] = None
+    size: int = 0
+    audio_seconds: float = 0.0
+    digest: Optional[str] = None
+
+
+# Cuts MP3 sources at frame boundaries instead of decoding and encoding them.
+STREAM_COPY = "copy"
+
+# The formats chunks can be exported in. WAV is written directly, FLAC and
+# MP3 are encoded by ffmpeg.
+EXPORT_FORMATS = ("mp3", "wav", "flac", STREAM_COPY)
+
+
+def chunk_file_name(index, export_format="mp3") -> str:
+    """Returns the file name of a chunk, e.g. ``0003.mp3``.
+
+    Args:
+        index (int): The position of the chunk in the source file.
+        export_format (str, optional): The file extension.
+
+    Returns:
+        str: The file name.
+    """
+    extension = "mp3" if export_format == STREAM_COPY else export_format
+    return f"{str(index).zfill(4)}.{extension}"
+
+
+@lru_cache(maxsize=None)
+def _padding(sample_width, frame_rate, channels) -> bytes:
+    """Returns the PCM data of the silence pad_chunk surrounds chunks with.
+
+    Args:
+        sample_width (int): The number of bytes per sample.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+
+    Returns:
+        bytes: The raw PCM data of PADDING_MS of silence.
+    """
+    silence = AudioSegment.silent(duration=PADDING_MS)
+    silence = silence.set_frame_rate(frame_rate).set_channels(channels)
+    return silence.set_sample_width(sample_width).raw_data
+
+
+def write_wav(path, raw_data, sample_width, frame_rate, channels) -> None:
+    """Writes a padded chunk as a WAV file straight from its PCM data.
+
+    The file is the same as ``pad_chunk(chunk).export(path, format="wav")``
+    writes, without building the padded segment in memory first. That only
+    holds for chunks of at least 16 bits and 11025 Hz, which the padding does
+    not widen or resample.
+
+    Args:
+        path (str): The path to write the chunk to.
+        raw_data (bytes): The PCM data of the chunk.
+        sample_width (int): The number of bytes per sample.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+    """
+    padding = _padding(sample_width, frame_rate, channels)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(frame_rate)
+        for data in (padding, raw_data, padding):
+            wav_file.writeframesraw(data)
+
+
+def export_chunk(index, raw_data, sample_width, frame_rate, channels, path, export_format):
+    """Pads and encodes a single chunk. Runs inside a worker process.
+
+    The chunk is passed as raw PCM so that only plain bytes cross the
+    process boundary.
+
+    Args:
+        index (int): The position of the chunk in the source file.
+        raw_data (bytes): The PCM data of the chunk.
+        sample_width (int): The number of bytes per sample.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+        path (str): The path to write the chunk to.
+        export_format (str): The format to encode the chunk in.
+
+    Returns:
+        ExportResult: The outcome of the export.
+    """
+    start = time.perf_counter()
+    audio_seconds = len(raw_data) / (sample_width * channels * frame_rate)
+    try:
+        if export_format == "wav" and sample_width >= 2 and frame_rate >= 11025:
+            write_wav(path, raw_data, sample_width, frame_rate, channels)
+        else:
+            chunk = AudioSegment(
+                data=raw_data,
+                sample_width=sample_width,
+                frame_rate=frame_rate,
+                channels=channels,
+            )
+            pad_chunk(chunk).export(path, format=export_format)
+    except Exception as error:
+        # Do not leave a truncated file behind that looks like a finished chunk.
+        if os.path.exists(path):
+            os.remove(path)
+        return ExportResult(
+            index, path, time.perf_counter() - start, repr(error), audio_seconds=audio_seconds
+        )
+
+    return ExportResult(
+        index,
+        path,
+        time.perf_counter() - start,
+        size=os.path.getsize(path),
+        audio_seconds=audio_seconds,
+        digest=file_digest(path),
+    )
+
+
+class ChunkExporter:
+    """Exports chunks on a pool of worker processes.
+
+    Every chunk is encoded by its own ffmpeg process, so running one export
+    per core scales with the number of cores. At most ``2 * workers`` chunks
+    are queued at a time, which keeps memory bounded when chunks come from
+    the streaming splitter. With a single worker the chunks are exported in
+    the calling process, which lets an exporter run inside another pool.
+
+    Attributes:
+        output_folder (str): The folder the chunks are written to.
+        workers (int): The number of worker processes.
+        export_format (str): The format the chunks are encoded in.
+        results (list): The ExportResult of every finished chunk, in submission order.
+    """
+
+    def __init__(self, output_folder, workers=None, export_format="mp3", on_result=None) -> None:
+        """Initializes the ChunkExporter and starts its worker processes.
+
+        Args:
+            output_folder (str): The folder the chunks are written to.
+            workers (int, optional): The number of worker processes, one per core by default.
+            export_format (str, optional): The format the chunks are encoded in.
+            on_result (callable, optional): Called with each ExportResult as it finishes.
+        """
+        self.output_folder = output_folder
+        self.workers = workers or os.cpu_count() or 1
+        self.export_format = export_format
+        self.results = []
+
+        self._on_result = on_result
+        self._pending = deque()
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def submit(self, index, chunk) -> None:
+        """Queues a chunk for export, waiting if too many chunks are in flight.
+
+        Args:
+            index (int): The position of the chunk in the source file.
+            chunk (AudioSegment): The chunk, without padding.
+        """
+        if self.export_format == STREAM_COPY:
+            raise ValueError("Stream copy cuts ranges of the source, use copy_all")
+
+        path = f"{self.output_folder}/{chunk_file_name(index, self.export_format)}"
+        arguments = (
+            index,
+            chunk.raw_data,
+            chunk.sample_width,
+            chunk.frame_rate,
+            chunk.channels,
+            path,
+            self.export_format,
+        )
+
+        if self._executor is None:
+            future = Future()
+            future.set_result(export_chunk(*arguments))
+        else:
+            # Chunks of memory-mapped audio are views, which cannot be pickled.
+            arguments = (index, bytes(chunk.raw_data), *arguments[2:])
+            future = self._executor.submit(export_chunk, *arguments)
+        self._pending.append((index, path, future))
+
+        while len(self._pending) > 2 * self.workers:
+            self._collect(*self._pending.popleft())
+
+    def export_all(self, chunks, indexes=None) -> list:
+        """Exports every chunk of an iterable and waits for them to finish.
+
+        Args:
+            chunks (iterable): The chunks, as AudioSegments, in source order.
+            indexes (list, optional): The position of each chunk in the source file,
+                0, 1, 2 and so on by default.
+
+        Returns:
+            list: The ExportResult of every chunk.
+        """
+        for i, chunk in enumerate(chunks):
+            self.submit(i if indexes is None else indexes[i], chunk)
+        return self.wait()
+
+    def copy_all(self, source, ranges, indexes=None) -> list:
+        """Cuts every range out of an MP3 source by copying its frames.
+
+        Copying is bound by the disk rather than the CPU, so it runs in the
+        calling process.
+
+        Args:
+            source (str): The path to the MP3 source file.
+            ranges (list): The chunk ranges ``[start_ms, end_ms]`` in source order.
+            indexes (list, optional): The position of each range among all chunks of
+                the source, 0, 1, 2 and so on by default.
+
+        Returns:
+            list: The ExportResult of every chunk.
+        """
+        frames = Mp3FrameIndex(source)
+        if indexes is None:
+            indexes = range(len(ranges))
+
+        for index, (start_ms, end_ms) in zip(indexes, ranges):
+            path = f"{self.output_folder}/{chunk_file_name(index, self.export_format)}"
+            start = time.perf_counter()
+            try:
+                size = frames.write_range(path, start_ms, end_ms)
+            except Exception as error:
+                if os.path.exists(path):
+                    os.remove(path)
+                result = ExportResult(index, path, time.perf_counter() - start, repr(error))
+            else:
+                result = ExportResult(
+                    index,
+                    path,
+                    time.perf_counter() - start,
+                    size=size,
+                    audio_seconds=(end_ms - start_ms) / 1000,
+                    digest=file_digest(path),
+                )
+
+            future = Future()
+            future.set_result(result)
+            self._collect(index, path, future)
+        return self.results
+
+    def throughput(self) -> dict:
+        """Summarizes the cost of the chunks exported so far.
+
+        Returns:
+            dict: The format, the number of chunks, the seconds spent exporting them
+                summed over all workers, the seconds of audio they hold, the bytes
+                written, and the seconds of audio exported per second of work.
+        """
+        done = [result for result in self.results if result.error is None]
+        seconds = sum(result.seconds for result in done)
+        audio_seconds = sum(result.audio_seconds for result in done)
+        return {
+            "format": self.export_format,
+            "chunks": len(done),
+            "seconds": seconds,
+            "audio_seconds": audio_seconds,
+            "bytes": sum(result.size for result in done),
+            "realtime_factor": audio_seconds / seconds if seconds else 0.0,
+        }
+
+    def wait(self) -> list:
+        """Waits for every queued chunk to finish.
+
+        Returns:
+            list: The ExportResult of every chunk exported so far.
+        """
+        while self._pending:
+            self._collect(*self._pending.popleft())
+        return self.results
+
+    @property
+    def failures(self) -> list:
+        """list: The ExportResult of every chunk that failed to export."""
+        return [result for result in self.results if result.error is not None]
+
+    def _collect(self, index, path, future) -> None:
+        """Records the result of a finished export.
+
+        Args:
+            index (int): The position of the chunk in the source file.
+            path (str): The path the chunk is written to.
+            future (concurrent.futures.Future): The export to wait for.
+        """
+        try:
+            result = future.result()
+        except Exception as error:
+            # The worker itself died, e.g. it was killed by the OS.
+            result = ExportResult(index, path, 0.0, repr(error))
+
+        if result.error is None:
+            logging.info(f"Exported {os.path.basename(result.path)}...")
+            instrumentation.count("export.chunks")
+            instrumentation.count("export.seconds", result.seconds)
+            instrumentation.count("export.bytes", result.size)
+        else:
+            logging.error(f"Failed to export chunk {result.index}: {result.error}")
+
+        self.results.append(result)
+        if self._on_result is not None:
+            self._on_result(result)
+
+    def close(self) -> None:
+        """Waits for the queued chunks and stops the worker processes."""
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+            return
+
+        # The split was abandoned, e.g. cancelled, so drop the queued chunks.
+        for _, _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
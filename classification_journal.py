@@ -0,0 +1,97 @@
+import csv
+import io
+import os
+import threading
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+class ClassificationJournal:
+    """Append-only log of classification edits.
+
+    Every edit is appended as one CSV record ``file_name,classification``,
+    so saving a label costs a few bytes regardless of the size of the folder.
+    Records are flushed to the operating system as they are written, which
+    keeps them safe if the process dies. A record that was cut off by a crash
+    is ignored on replay.
+
+    Attributes:
+        journal_path (str): The path to the journal file.
+    """
+
+    def __init__(self, journal_path) -> None:
+        """Initializes the ClassificationJournal.
+
+        Args:
+            journal_path (str): The path to the journal file.
+        """
+        self.journal_path = journal_path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, file_name, classification) -> None:
+        """Records an edit.
+
+        Args:
+            file_name (str): The full name of the classified file.
+            classification (str): The new classification value.
+        """
+        line = io.StringIO()
+        csv.writer(line, lineterminator="\n").writerow((file_name, classification))
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, "a", encoding="utf8", newline="")
+            self._file.write(line.getvalue())
+            self._file.flush()
+
+    def replay(self) -> list:
+        """Reads back every complete record, oldest first.
+
+        Returns:
+            list: The recorded edits as ``(file_name, classification)`` tuples.
+        """
+        try:
+            with open(self.journal_path, "r", encoding="utf8", newline="") as journal:
+                content = journal.read()
+        except FileNotFoundError:
+            return []
+
+        # Anything after the last newline is a record the writer never finished.
+        content = content[: content.rfind("\n") + 1]
+
+        edits = []
+        try:
+            for row in csv.reader(io.StringIO(content), strict=True):
+                if len(row) != 2:
+                    logging.warning(f"Skipping malformed record in {self.journal_path}: {row}")
+                    continue
+                edits.append((row[0], row[1]))
+        except csv.Error:
+            # The last newline was inside the quoted label of an unfinished record.
+            logging.warning(f"Skipping an unfinished record in {self.journal_path}")
+
+        logging.info(f"Replayed {len(edits)} edits from {self.journal_path}")
+        return edits
+
+    def truncate(self) -> None:
+        """Discards all records, once they have been written to the CSV file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+
+    def close(self) -> None:
+        """Closes the journal file. Records are kept on disk."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -1,9 +1,17 @@
-import os
-import threading
-from tkinter import Frame, ttk, filedialog, StringVar
-import simpleaudio
+import time
+import numpy as np
+from tkinter import Frame, Canvas, ttk, filedialog, simpledialog, StringVar
 from file_controller import FileController
+from folder_index import FolderIndex
 from csv_controller import CSVController
+from audio_cache import AudioCache
+from playback_engine import PlaybackEngine
+from peak_index import PeakIndex, PeakIndexBuilder
+from prelabel import PreLabeler
+from duplicate_finder import DuplicateFinder, label_group
+from label_sessions import read_plan
+import instrumentation
+import job_scheduler
 import logging
 
 logging.basicConfig(
@@ -16,62 +24,271 @@ logging.basicConfig(
 class AudioQueue:
     """Represents a queue of audio files.
 
+    The files are kept in a QueueModel, so a FileController is only built
+    for the file that is played and the ones prefetched around it. With a
+    label filter set, moving through the queue skips the files with other
+    labels.
+
     Attributes:
         folder_path (str): The path to the folder containing audio files.
-        current_index (int): The index of the currently playing audio file.
-        audio_list (list): A list of FileController instances representing audio files.
-        _playback (simpleaudio.PlayObject): The current audio playback object.
+        current_index (int): The 1-based queue position of the current audio file.
+        model (QueueModel): The audio files, their labels and their queue order.
+        label_filter (str): The label navigation is restricted to, "" for the
+            unlabelled files, or None for all files.
+        cache (AudioCache): The cache of decoded audio the queue plays from.
+        prefetch_next (int): The number of following files decoded ahead of time.
+        prefetch_prev (int): The number of preceding files decoded ahead of time.
+        engine (PlaybackEngine): The engine the audio is played on.
     """
 
-    def __init__(self, folder_path=None) -> None:
+    def __init__(
+        self,
+        folder_path=None,
+        cache_bytes=256 * 1024 * 1024,
+        prefetch_next=4,
+        prefetch_prev=1,
+        engine=None,
+        folder_files=None,
+    ) -> None:
         """Initializes the AudioQueue with a folder path and sets up the audio list.
 
         Args:
             folder_path (str, optional): The path to the folder containing audio files.
+            cache_bytes (int, optional): The most decoded audio kept in memory, in bytes.
+            prefetch_next (int, optional): The number of following files to decode ahead.
+            prefetch_prev (int, optional): The number of preceding files to decode ahead.
+            engine (PlaybackEngine, optional): The engine to play on, a new one by default.
+            folder_files (QueueModel, optional): The audio files of the folder, e.g.
+                ``CSVController.folder_files``. The folder is scanned when omitted.
         """
         self.folder_path = folder_path
         self.current_index = 1
-        self.audio_list = []
-        self._playback = None
+        self.label_filter = None
+        self.cache = AudioCache(cache_bytes)
+        self.prefetch_next = prefetch_next
+        self.prefetch_prev = prefetch_prev
+        self.engine = engine or PlaybackEngine(on_first_sample=self._log_latency)
+
+        if folder_files is None:
+            folder_files = FolderIndex(self.folder_path).scan()
+        self.model = folder_files
+
+        self.prefetch()
+
+    def __len__(self) -> int:
+        """Returns the number of audio files in the queue.
+
+        Returns:
+            int: The number of files, whatever the label filter.
+        """
+        return len(self.model)
+
+    @property
+    def current_file(self) -> FileController:
+        """FileController: The currently selected audio file."""
+        return self.model.file(self.model.item_at(self.current_index - 1))
+
+    def order_by(self, keys=None) -> None:
+        """Reorders the queue and moves back to its first file.
+
+        Args:
+            keys (np.ndarray, optional): A sort key per item of the model; files
+                with equal keys stay in name order. Orders by name when omitted.
+        """
+        self.model.order_by(keys)
+        self.current_index = 1
+        if self.label_filter is not None:
+            self._move_to(self.model.next_position(-1, self.label_filter))
+        self.prefetch()
+
+    def set_filter(self, label) -> None:
+        """Restricts navigation to the files with a label.
+
+        If the current file has another label, the queue moves to the next
+        file that has it, or the previous one at the end of the queue.
+
+        Args:
+            label (str): The label, "" for the unlabelled files, or None for all files.
+        """
+        self.label_filter = label
+        if label is None or not len(self):
+            return
+
+        position = self.current_index - 1
+        if self.model.label(self.model.item_at(position)) != label:
+            following = self.model.next_position(position, label)
+            if following is None:
+                following = self.model.previous_position(position, label)
+            self._move_to(following)
+        self.prefetch()
+
+    def filter_count(self) -> int:
+        """Returns the number of files that pass the label filter.
+
+        Returns:
+            int: The number of files.
+        """
+        return self.model.count(self.label_filter)
 
-        for file in os.listdir(self.folder_path):
-            if file.endswith(".csv"):
-                continue
-            self.audio_list.append(FileController(f"{self.folder_path}\\{file}"))
+    def filter_rank(self) -> int:
+        """Returns the 1-based rank of the current file among those that pass the filter.
 
-    def play_current(self) -> None:
-        """Plays the currently selected audio file."""
-        segment = self.audio_list[self.current_index - 1].audio_file
+        Returns:
+            int: The rank.
+        """
+        return self.model.rank(self.current_index - 1, self.label_filter)
+
+    def has_next(self) -> bool:
+        """Returns whether a following file passes the label filter.
+
+        Returns:
+            bool: True if there is a next file.
+        """
+        position = self.model.next_position(self.current_index - 1, self.label_filter)
+        return position is not None
+
+    def has_prev(self) -> bool:
+        """Returns whether a preceding file passes the label filter.
+
+        Returns:
+            bool: True if there is a previous file.
+        """
+        position = self.model.previous_position(self.current_index - 1, self.label_filter)
+        return position is not None
+
+    def _move_to(self, position) -> bool:
+        """Makes a queue position the current one.
+
+        Args:
+            position (int): The 0-based queue position, or None to stay.
+
+        Returns:
+            bool: Whether the queue moved.
+        """
+        if position is None:
+            return False
+        self.current_index = position + 1
+        return True
+
+    def play_current(self, request_time=None) -> None:
+        """Plays the currently selected audio file.
+
+        The audio is fetched from the cache on the playback thread, so this
+        returns immediately.
 
-        self._playback = simpleaudio.play_buffer(
-            segment.raw_data,
-            bytes_per_sample=segment.sample_width,
-            sample_rate=segment.frame_rate,
-            num_channels=segment.channels,
+        Args:
+            request_time (float, optional): The ``time.perf_counter()`` value of the
+                key press that asked for playback.
+        """
+        audio = self.current_file
+
+        with instrumentation.span("queue.play_current", file=audio.file_name_full):
+            self.engine.play(lambda: self.cache.get(audio), request_time)
+            self.prefetch()
+
+    @staticmethod
+    def _log_latency(latency) -> None:
+        """Logs the time from a key press to the first sample being played.
+
+        Args:
+            latency (float): The latency in seconds.
+        """
+        logging.info(f"Playback started {latency * 1000:.1f} ms after the request")
+        now = time.perf_counter()
+        instrumentation.interval("playback.latency", now - latency, now)
+
+    def prefetch(self) -> None:
+        """Decodes the files around the current one in the background.
+
+        The following files come first since labelers mostly move forward.
+        Only files that pass the label filter are prefetched.
+        """
+        if not len(self):
+            return
+
+        positions = [self.current_index - 1]
+        for count, step in (
+            (self.prefetch_next, self.model.next_position),
+            (self.prefetch_prev, self.model.previous_position),
+        ):
+            position = positions[0]
+            for _ in range(count):
+                position = step(position, self.label_filter)
+                if position is None:
+                    break
+                positions.append(position)
+
+        self.cache.prefetch(
+            [self.model.file(self.model.item_at(position)) for position in positions]
         )
 
     def stop_current(self) -> None:
         """Stops the playback of the current audio file."""
-        if self._playback:
-            self._playback.stop()
+        self.engine.stop()
 
-    def next(self) -> None:
-        """Moves to the next audio file in the queue and plays it."""
+    def close(self) -> None:
+        """Stops playback and releases the decoded audio."""
+        self.engine.close()
+        logging.info(f"Audio cache stats: {self.cache.stats()}")
+        self.cache.close()
+
+    def next(self, request_time=None) -> None:
+        """Moves to the next audio file in the queue and plays it.
+
+        Args:
+            request_time (float, optional): The ``time.perf_counter()`` value of the
+                key press that asked for playback.
+        """
         logging.info("Moving to next audio file")
-        self.stop_current()
-        self.current_index += 1
-        self.play_current()
+        self._move_to(self.model.next_position(self.current_index - 1, self.label_filter))
+        self.play_current(request_time)
 
-    def prev(self) -> None:
+    def prev(self, request_time=None) -> None:
         """Moves to the previous audio file in the queue and plays it.
 
-        Returns:
-            int: The index of the current audio file after moving to the previous one.
+        Args:
+            request_time (float, optional): The ``time.perf_counter()`` value of the
+                key press that asked for playback.
         """
         logging.info("Moving to previous audio file")
-        self.stop_current()
-        self.current_index -= 1
-        self.play_current()
+        self._move_to(
+            self.model.previous_position(self.current_index - 1, self.label_filter)
+        )
+        self.play_current(request_time)
+
+    def jump(self, index, request_time=None) -> None:
+        """Moves to a queue position and plays its file.
+
+        Args:
+            index (int): The 1-based queue position, clamped to the queue.
+            request_time (float, optional): The ``time.perf_counter()`` value of the
+                key press that asked for playback.
+        """
+        logging.info(f"Jumping to audio file {index}")
+        self.current_index = min(max(index, 1), len(self))
+        self.play_current(request_time)
+
+    def next_unlabeled(self, request_time=None) -> bool:
+        """Moves to the next unlabelled file and plays it.
+
+        The search wraps around to the start of the queue.
+
+        Args:
+            request_time (float, optional): The ``time.perf_counter()`` value of the
+                key press that asked for playback.
+
+        Returns:
+            bool: False if every file is labelled, in which case the queue stays.
+        """
+        position = self.model.next_position(self.current_index - 1, "")
+        if position is None:
+            position = self.model.next_position(-1, "")
+        if not self._move_to(position):
+            return False
+
+        logging.info("Moving to next unlabelled audio file")
+        self.play_current(request_time)
+        return True
 
 
 class ClassifyAudioChunks(Frame):
@@ -82,6 +299,16 @@ class ClassifyAudioChunks(Frame):
         audio_queue (AudioQueue): The audio queue for managing audio files.
         csv_controller (CSVController): The controller for handling CSV files.
         is_shift_pressed (bool): A flag indicating whether the Shift key is currently pressed.
+        peak_index (PeakIndex): The waveform envelopes of the folder, None until built.
+        scheduler (JobScheduler): The scheduler the background work runs on.
+        waveform (Canvas): The canvas the waveform of the current file is drawn on.
+        order_by_confidence (StringVar): "on" to queue the least confident predictions first.
+        prediction_var (StringVar): The prediction shown for the current file.
+        label_duplicates (StringVar): "on" to give near-duplicates of a file the same classification.
+        duplicate_groups (dict): Maps file names to the near-duplicate group they are in.
+        filter_var (StringVar): The label filter picked in the filter box.
+        jump_var (StringVar): The queue position typed into the jump box.
+        position_var (StringVar): The position of the current file among those shown.
     """
 
     def __init__(self, parent, controller=None) -> None:
@@ -97,6 +324,14 @@ class ClassifyAudioChunks(Frame):
 
         self.audio_queue = None
         self.csv_controller = None
+        self.peak_index = None
+        self.scheduler = job_scheduler.shared_scheduler()
+        self._peak_builder = None
+        self._peak_job = None
+        self._prelabel_job = None
+        self._prefilled = None
+        self._duplicates_job = None
+        self.duplicate_groups = {}
 
         self.is_shift_pressed = False
 
@@ -128,6 +363,86 @@ class ClassifyAudioChunks(Frame):
         )
         self.classification_Entry.pack(side="bottom", fill="x", padx=10, pady=10)
 
+        # Add pre-labeling controls
+        prelabel_frame = Frame(self)
+        prelabel_frame.pack(side="bottom", fill="x", padx=10)
+
+        self.button_prelabel = ttk.Button(
+            prelabel_frame, text="Pre-label", command=self.prelabel, width=10
+        )
+        self.button_prelabel.pack(side="left")
+        self.button_prelabel.config(state="disabled")
+
+        self.order_by_confidence = StringVar(value="off")
+        ttk.Checkbutton(
+            prelabel_frame,
+            text="Least confident first",
+            variable=self.order_by_confidence,
+            onvalue="on",
+            offvalue="off",
+            command=self._order_toggled,
+        ).pack(side="left", padx=10)
+
+        self.prediction_var = StringVar(value="")
+        ttk.Label(prelabel_frame, textvariable=self.prediction_var).pack(side="right")
+
+        # Add near-duplicate controls
+        duplicates_frame = Frame(self)
+        duplicates_frame.pack(side="bottom", fill="x", padx=10)
+
+        self.button_duplicates = ttk.Button(
+            duplicates_frame, text="Find duplicates", command=self.find_duplicates, width=15
+        )
+        self.button_duplicates.pack(side="left")
+        self.button_duplicates.config(state="disabled")
+
+        self.label_duplicates = StringVar(value="on")
+        ttk.Checkbutton(
+            duplicates_frame,
+            text="Label duplicates together",
+            variable=self.label_duplicates,
+            onvalue="on",
+            offvalue="off",
+        ).pack(side="left", padx=10)
+
+        self.duplicates_var = StringVar(value="")
+        ttk.Label(duplicates_frame, textvariable=self.duplicates_var).pack(side="right")
+
+        # Add navigation controls
+        navigation_frame = Frame(self)
+        navigation_frame.pack(side="bottom", fill="x", padx=10)
+
+        self.filter_var = StringVar(value="")
+        self._filter_labels = {}
+        self.filter_box = ttk.Combobox(
+            navigation_frame,
+            textvariable=self.filter_var,
+            state="disabled",
+            postcommand=self._list_filters,
+            width=20,
+        )
+        self.filter_box.bind("<<ComboboxSelected>>", self._filter_selected)
+        self.filter_box.pack(side="left")
+
+        self.button_unlabeled = ttk.Button(
+            navigation_frame, text="Next unlabeled", command=self.next_unlabeled, width=15
+        )
+        self.button_unlabeled.pack(side="left", padx=10)
+        self.button_unlabeled.config(state="disabled")
+
+        self.jump_var = StringVar(value="")
+        jump_entry = ttk.Entry(navigation_frame, textvariable=self.jump_var, width=7)
+        jump_entry.bind("<Return>", self._jump)
+        jump_entry.pack(side="left")
+
+        self.position_var = StringVar(value="")
+        ttk.Label(navigation_frame, textvariable=self.position_var).pack(side="right")
+
+        # Add waveform
+        self.waveform = Canvas(self, height=120, background="white", highlightthickness=0)
+        self.waveform.pack(side="top", fill="both", expand=True, padx=10, pady=10)
+        self.waveform.bind("<Configure>", lambda event: self.draw_waveform())
+
         self.button_prev.config(state="disabled")
         self.button_next.config(state="disabled")
 
@@ -149,18 +464,54 @@ class ClassifyAudioChunks(Frame):
 
         logging.info(f"Selected folder: {folder_path}")
 
-        self.audio_queue = AudioQueue(folder_path)
-        self.csv_controller = CSVController()
+        if self.csv_controller is not None:
+            self.csv_controller.close()
+            self.audio_queue.close()
 
+        self.csv_controller = CSVController(annotator=self._ask_annotator(folder_path))
         self.csv_controller.open_folder(folder_path)
 
+        self.audio_queue = AudioQueue(
+            folder_path, folder_files=self.csv_controller.folder_files
+        )
+
         self.button_next.config(state="enabled")
 
         self.button_replay.config(text="Play again", command=self.play_again)
+        self.button_prelabel.config(state="enabled")
+        self.button_duplicates.config(state="enabled")
+        self.button_unlabeled.config(state="enabled")
+        self.filter_box.config(state="readonly")
+        self.filter_var.set("All files")
+        self.duplicate_groups = {}
 
-        self.classification_var.set(self.csv_controller.get_classification(1))
+        self.load_peak_index(folder_path)
+        self.apply_order()
 
-        self.update_button_states()
+    def _ask_annotator(self, folder_path):
+        """Asks whose session to open if the folder is shared between annotators.
+
+        Args:
+            folder_path (str): The path to the audio folder.
+
+        Returns:
+            str: The annotator, or None to edit the CSV file directly.
+        """
+        plan = read_plan(folder_path)
+        if plan is None:
+            return None
+
+        while True:
+            annotator = simpledialog.askstring(
+                "Annotator",
+                f"This folder is shared by {', '.join(plan['annotators'])}.\n"
+                "Your name, or nothing to edit the CSV file directly:",
+                parent=self,
+            )
+            if not annotator:
+                return None
+            if annotator in plan["assignments"]:
+                return annotator
 
     def next(self, event=None) -> None:
         """Moves to the next audio file and updates the classification.
@@ -168,18 +519,16 @@ class ClassifyAudioChunks(Frame):
         Args:
             event: The event that triggered the method (default: None).
         """
+        request_time = time.perf_counter()
+
         if self.is_shift_pressed:
             self.prev()
             return
 
         if self.allow_next:
-            self.csv_controller.set_classification(
-                self.audio_queue.current_index, self.classification_var.get()
-            )
-            threading.Thread(target=self.audio_queue.next).start()
-            self.classification_var.set(
-                self.csv_controller.get_classification(self.audio_queue.current_index)
-            )
+            self.save_classification(accept=True)
+            self.audio_queue.next(request_time)
+            self.show_current()
         self.update_button_states()
 
     def prev(self, event=None) -> None:
@@ -188,30 +537,314 @@ class ClassifyAudioChunks(Frame):
         Args:
             event: The event that triggered the method (default: None).
         """
+        request_time = time.perf_counter()
+
         if self.allow_prev:
-            self.csv_controller.set_classification(
-                self.audio_queue.current_index, self.classification_var.get()
-            )
-            threading.Thread(target=self.audio_queue.prev).start()
-            self.classification_var.set(
-                self.csv_controller.get_classification(self.audio_queue.current_index)
-            )
+            self.save_classification(accept=True)
+            self.audio_queue.prev(request_time)
+            self.show_current()
+
+        self.update_button_states()
+
+    def next_unlabeled(self) -> None:
+        """Saves the classification and moves to the next unlabelled audio file."""
+        request_time = time.perf_counter()
+
+        self.save_classification(accept=True)
+        if self.audio_queue.next_unlabeled(request_time):
+            self.show_current()
+        self.update_button_states()
+
+    def _jump(self, event=None) -> str:
+        """Moves to the queue position typed into the jump box.
+
+        Args:
+            event: The event that triggered the method (default: None).
+
+        Returns:
+            str: "break", so the Return key does not also move to the next file.
+        """
+        try:
+            index = int(self.jump_var.get())
+        except ValueError:
+            return "break"
+
+        self.save_classification(accept=True)
+        self.audio_queue.jump(index, time.perf_counter())
+        self.show_current()
+        self.update_button_states()
+        return "break"
+
+    def _list_filters(self) -> None:
+        """Lists the labels of the folder and their counts in the filter box."""
+        counts = self.audio_queue.model.label_counts()
+        choices = {"All files": None, f"Unlabeled ({counts.pop('', 0)})": ""}
+        for label in sorted(counts):
+            choices[f"{label} ({counts[label]})"] = label
+
+        self._filter_labels = choices
+        self.filter_box.config(values=list(choices))
+
+    def _filter_selected(self, event=None) -> None:
+        """Restricts navigation to the label picked in the filter box.
+
+        Args:
+            event: The event that triggered the method (default: None).
+        """
+        if not len(self.audio_queue):
+            return
+
+        self.save_classification()
+        self.audio_queue.set_filter(self._filter_labels.get(self.filter_var.get()))
+        self.show_current()
+        self.update_button_states()
+
+    def save_classification(self, accept=False) -> None:
+        """Saves the text box as the classification of the current audio file.
+
+        Args:
+            accept (bool, optional): Whether an untouched prediction in the text box
+                is saved too. Only moving to another file accepts a prediction.
+        """
+        classification = self.classification_var.get()
+        if not accept and self._prefilled and classification == self._prefilled:
+            return
+
+        file_name = self.audio_queue.current_file.file_name_full
+        group = self.duplicate_groups.get(file_name)
+        if group is not None and classification and self.label_duplicates.get() == "on":
+            label_group(self.csv_controller, group, classification)
+            return
+
+        index = self.csv_controller.get_row_index(file_name)
+        if index is not None:
+            self.csv_controller.set_classification(index, classification)
+
+    def show_current(self) -> None:
+        """Shows the classification, prediction and waveform of the current audio file.
+
+        An unclassified file starts with its predicted classification in the
+        text box, so accepting a prediction only takes moving on.
+        """
+        index = self.csv_controller.get_row_index(self.audio_queue.current_file.file_name_full)
+        classification = ""
+        prediction = None
+        if index is not None:
+            classification = self.csv_controller.get_classification(index)
+            prediction = self.csv_controller.get_prediction(index)
+
+        self._prefilled = None
+        if prediction is None:
+            self.prediction_var.set("")
+        else:
+            self.prediction_var.set(f"Predicted: {prediction[0]} ({prediction[1]:.0%})")
+            if not classification:
+                classification = self._prefilled = prediction[0]
+
+        self.show_duplicates()
+        self.classification_var.set(classification)
+        self.draw_waveform()
+
+    def prelabel(self) -> None:
+        """Predicts the unclassified files from the classified ones in the background."""
+        if self._prelabel_job is not None and not self._prelabel_job.done:
+            return
+
+        self.save_classification()
+        self.button_prelabel.config(state="disabled", text="Pre-labeling...")
+
+        prelabeler = PreLabeler(self.audio_queue.folder_path)
+        csv_controller = self.csv_controller
+        self._prelabel_job = self.scheduler.submit(
+            "Pre-label",
+            lambda job: prelabeler.run(csv_controller),
+            priority=job_scheduler.HIGH,
+        )
+        self.after(200, self._poll_prelabel, self._prelabel_job)
+
+    def _poll_prelabel(self, job) -> None:
+        """Shows the predictions once the pre-labeling job is done.
+
+        Args:
+            job (Job): The pre-labeling job that was queued.
+        """
+        if job is not self._prelabel_job:
+            return
+
+        if not job.done:
+            self.after(200, self._poll_prelabel, job)
+            return
+
+        self.button_prelabel.config(state="enabled", text="Pre-label")
+        if self.order_by_confidence.get() == "on":
+            self.save_classification()
+            self.apply_order()
+        else:
+            self.show_current()
+
+    def find_duplicates(self) -> None:
+        """Groups the near-duplicate files of the folder in the background."""
+        if self._duplicates_job is not None and not self._duplicates_job.done:
+            return
+
+        self.button_duplicates.config(state="disabled", text="Searching...")
+        finder = DuplicateFinder(self.audio_queue.folder_path)
+        self._duplicates_job = self.scheduler.submit(
+            "Find duplicates", lambda job: finder.groups(), priority=job_scheduler.HIGH
+        )
+        self.after(200, self._poll_duplicates, self._duplicates_job)
+
+    def _poll_duplicates(self, job) -> None:
+        """Shows the near-duplicate groups once the search job is done.
+
+        Args:
+            job (Job): The search job that was queued.
+        """
+        if job is not self._duplicates_job:
+            return
+
+        if not job.done:
+            self.after(200, self._poll_duplicates, job)
+            return
+
+        self.button_duplicates.config(state="enabled", text="Find duplicates")
+        self.duplicate_groups = {
+            file_name: group for group in job.result or [] for file_name in group
+        }
+        self.show_duplicates()
+
+    def show_duplicates(self) -> None:
+        """Shows how many near-duplicates the current audio file has."""
+        group = self.duplicate_groups.get(self.audio_queue.current_file.file_name_full)
+        self.duplicates_var.set("" if group is None else f"{len(group) - 1} near-duplicates")
+
+    def _order_toggled(self) -> None:
+        """Saves the current classification and reorders the queue."""
+        if self.audio_queue is None:
+            return
+
+        if len(self.audio_queue):
+            self.save_classification()
+        self.apply_order()
 
+    def apply_order(self) -> None:
+        """Orders the queue by file name, or by lowest prediction confidence.
+
+        Files without a prediction, which are the classified ones, go last
+        when ordering by confidence.
+        """
+        if self.order_by_confidence.get() == "on":
+            names = self.audio_queue.model.names.tolist()
+            confidences = np.full(len(names), 2.0)
+            for item, file_name in enumerate(names):
+                index = self.csv_controller.get_row_index(file_name)
+                prediction = None if index is None else self.csv_controller.get_prediction(index)
+                if prediction is not None:
+                    confidences[item] = prediction[1]
+
+            self.audio_queue.order_by(confidences)
+        else:
+            self.audio_queue.order_by()
+
+        if len(self.audio_queue):
+            self.show_current()
         self.update_button_states()
 
+    def load_peak_index(self, folder_path) -> None:
+        """Shows the existing peak index of a folder and updates it in the background.
+
+        Args:
+            folder_path (str): The path to the audio folder.
+        """
+        if self._peak_job is not None:
+            # The index of the previous folder is not needed any more; the
+            # build stops before its next file.
+            self._peak_job.cancel()
+
+        self.peak_index = PeakIndex(folder_path)
+        builder = PeakIndexBuilder(folder_path)
+        self._peak_builder = builder
+
+        self._peak_job = self.scheduler.submit(
+            f"Index peaks of {folder_path}",
+            lambda job: builder.build(on_progress=job.report),
+            priority=job_scheduler.LOW,
+        )
+        self.after(200, self._poll_peak_builder, builder, self._peak_job)
+
+    def _poll_peak_builder(self, builder, job) -> None:
+        """Switches to the rebuilt peak index once its build job is done.
+
+        Tk widgets may only be touched from the main thread, so the build
+        job is polled instead of calling back.
+
+        Args:
+            builder (PeakIndexBuilder): The builder that was queued.
+            job (Job): The job the builder runs as.
+        """
+        if builder is not self._peak_builder:
+            return
+
+        if not job.done:
+            self.after(200, self._poll_peak_builder, builder, job)
+            return
+
+        self.peak_index = builder.index
+        self.draw_waveform()
+
+    def draw_waveform(self) -> None:
+        """Draws the waveform of the current audio file from the peak index."""
+        self.waveform.delete("all")
+        if self.audio_queue is None or self.peak_index is None:
+            return
+        if not len(self.audio_queue):
+            return
+
+        audio = self.audio_queue.current_file
+        width = self.waveform.winfo_width()
+        height = self.waveform.winfo_height()
+        envelope = self.peak_index.envelope(audio.file_name_full, width)
+        if envelope is None or not len(envelope):
+            return
+
+        middle = height / 2
+        step = width / len(envelope)
+        for column, (low, high, rms) in enumerate(envelope):
+            x = column * step
+            self.waveform.create_line(
+                x, middle - high * middle, x, middle - low * middle + 1, fill="steel blue"
+            )
+            self.waveform.create_line(
+                x, middle - rms * middle, x, middle + rms * middle + 1, fill="navy"
+            )
+
     def play_again(self) -> None:
         """Plays the current audio file again."""
-        threading.Thread(target=self.audio_queue.play_current).start()
+        self.audio_queue.play_current(time.perf_counter())
+
+    def close(self) -> None:
+        """Saves the current classification and writes pending changes to the CSV file."""
+        if self.csv_controller is None:
+            return
+
+        if len(self.audio_queue):
+            self.save_classification()
+        self.csv_controller.close()
+        self.audio_queue.close()
 
     def update_button_states(self) -> None:
         """Updates the state (enabled or disabled) of the navigation buttons."""
         logging.info(f"Current index: {self.audio_queue.current_index}")
 
-        self.allow_prev = self.audio_queue.current_index > 1
+        self.allow_prev = self.audio_queue.has_prev()
+        self.allow_next = self.audio_queue.has_next()
 
-        self.allow_next = self.audio_queue.current_index < len(
-            self.audio_queue.audio_list
-        )
+        if len(self.audio_queue):
+            self.position_var.set(
+                f"{self.audio_queue.filter_rank()} of {self.audio_queue.filter_count()}"
+            )
+        else:
+            self.position_var.set("")
 
         self.button_next.config(state="enabled" if self.allow_next else "disabled")
         self.button_prev.config(state="enabled" if self.allow_prev else "disabled")
@@ -1,7 +1,14 @@
+import atexit
 import csv
 import os
+import tempfile
+import threading
 from datetime import datetime
 from file_controller import FileController
+from folder_index import FolderIndex
+from classification_journal import ClassificationJournal
+from label_sessions import delta_path, read_plan
+import instrumentation
 import logging
 
 logging.basicConfig(
@@ -11,31 +18,92 @@ logging.basicConfig(
 )
 
 
+def read_classifications(folder_path) -> dict:
+    """Reads the classifications of a folder without opening it for editing.
+
+    Edits still waiting in the journal are applied on top of the CSV file,
+    so the result matches what the classifier shows, and nothing is written.
+
+    Args:
+        folder_path (str): The path to the classified folder.
+
+    Returns:
+        dict: Maps file names to their classification, in CSV order.
+    """
+    csv_names = sorted(
+        name for name in os.listdir(folder_path) if name.endswith(".csv")
+    )
+    if not csv_names:
+        raise FileNotFoundError(f"No csv file in {folder_path}")
+
+    csv_path = f"{folder_path}/{csv_names[0]}"
+    with open(csv_path, "r", encoding="utf8", newline="") as csvfile:
+        rows = list(csv.reader(csvfile))
+
+    classifications = {row[0]: row[1] for row in rows[1:] if len(row) > 1}
+    for file_name, classification in ClassificationJournal(f"{csv_path}.journal").replay():
+        if file_name in classifications:
+            classifications[file_name] = classification
+
+    return classifications
+
+
 class CSVController:
     """Controller class for managing CSV files and their contents.
 
+    Opened for an annotator of a folder with sessions, the controller only
+    holds the files the session plan gives them and appends every edit to
+    their own delta file instead of the journal; the CSV file is never
+    written, so any number of sessions can label the folder at once until
+    ``merge_sessions`` folds their deltas into it.
+
     Attributes:
         folder (str): The path to the folder containing the CSV files.
         csv_file (FileController): The current CSV file being operated on.
-        folder_files (list): List of FileController objects representing files in the folder.
+        folder_files (QueueModel): The audio files of the folder, labelled with the
+            classifications of the CSV file.
+        journal (ClassificationJournal): The edit journal kept next to the CSV file,
+            or the delta file of the annotator.
+        annotator (str): The annotator whose session is open, None to edit the
+            CSV file directly.
+        flush_interval (float): Seconds to wait after an edit before compacting the
+            journal into the CSV file.
         _csv_header (list): The header for the CSV file.
+        _prediction_header (list): The columns added once predictions are written.
+        _rows (list): The rows of the CSV file, including the header.
+        _row_indexes (dict): Maps file names to their row index.
+        _dirty (set): Indexes of the rows changed since the last write.
+        _csv_names (list): The names of the CSV files found in the folder.
     """
 
-    def __init__(self, folder_path=None) -> None:
+    def __init__(self, folder_path=None, flush_interval=30.0, annotator=None) -> None:
         """Initializes the CSVController.
 
         Args:
             folder_path (str, optional): The path to the folder containing the CSV files.
+            flush_interval (float, optional): Seconds to wait after an edit before
+                compacting the journal into the CSV file.
+            annotator (str, optional): The annotator whose session to open.
         """
         self.folder = folder_path
         self.csv_file = None
         self.folder_files = None
+        self.journal = None
+        self.flush_interval = flush_interval
+        self.annotator = annotator
         self._csv_header = [
             "file_name",
             "classification",
             "file_length(sec)",
             "date",
         ]
+        self._prediction_header = ["prediction", "confidence"]
+        self._rows = []
+        self._row_indexes = {}
+        self._dirty = set()
+        self._csv_names = []
+        self._lock = threading.RLock()
+        self._flush_timer = None
 
     def open_folder(self, folder_path) -> None:
         """Opens a folder and initializes the CSVController with its contents.
@@ -44,33 +112,67 @@ class CSVController:
             folder_path (str): The path to the folder.
         """
         logging.info(f"Opening folder: {folder_path}")
+        self.close()
+        # Compact whatever is still in the journal when the program exits.
+        atexit.register(self.flush)
+
         self.folder = folder_path
         self._get_folder_files()
         self._get_or_create_csv()
+        self._load_rows()
+
+        self.journal = ClassificationJournal(f"{self.csv_file.file_path}.journal")
+        self._replay_journal()
+
+        if self.annotator is not None:
+            self._open_session()
+
+        with self._lock:
+            self.folder_files.set_labels(
+                {row[0]: row[1] for row in self._rows[1:] if len(row) > 1}
+            )
+
+    def _open_session(self) -> None:
+        """Restricts the folder to the annotator's files and switches to their delta file.
+
+        Edits in the journal of a single-writer session are shown but left
+        for that session to compact.
+
+        Raises:
+            ValueError: If the session plan of the folder has no such annotator.
+        """
+        plan = read_plan(self.folder)
+        assigned = None if plan is None else plan["assignments"].get(self.annotator)
+        if assigned is None:
+            raise ValueError(f"{self.annotator} has no session in {self.folder}")
+
+        items = [item for item in map(self.folder_files.find, assigned) if item is not None]
+        self.folder_files = self.folder_files.select(items)
+
+        self.journal.close()
+        self.journal = ClassificationJournal(delta_path(self.folder, self.annotator))
+        self._replay_journal()
+        logging.info(f"Opened the session of {self.annotator}: {len(items)} files")
 
     def _get_folder_files(self) -> None:
-        """Retrieves the list of files in the folder and sorts them.
+        """Retrieves the audio files in the folder, sorted by name.
 
-        The files are represented as FileController objects.
+        Their metadata comes from the folder index, so only new or changed
+        files are probed.
         """
-        folder_files = [
-            FileController(self.folder + "/" + f) for f in os.listdir(self.folder)
-        ]
-        self.folder_files = sorted(folder_files, key=lambda x: x.file_name)
-        logging.info(f"Found {len(self.folder_files)} files in folder {self.folder}")
+        index = FolderIndex(self.folder)
+        self.folder_files = index.scan()
+        self._csv_names = [name for name in index.other_files if name.endswith(".csv")]
+        logging.info(f"Found {len(self.folder_files)} audio files in folder {self.folder}")
 
     def _get_or_create_csv(self) -> None:
         """Retrieves an existing CSV file from the folder or creates a new one."""
         try:
-            csv_file_from_list = [
-                f for f in self.folder_files if f.file_extension == "csv"
-            ][0]
+            csv_file_from_list = self._csv_names[0]
 
             # This method will create a CSV file from the list of files in folder.
             if csv_file_from_list:
-                self.csv_file = FileController(
-                    f"{self.folder}/{csv_file_from_list}.csv"
-                )
+                self.csv_file = FileController(f"{self.folder}/{csv_file_from_list}")
                 logging.info(
                     f"{self.csv_file.file_name_full} is present in folder {self.folder}"
                 )
@@ -100,7 +202,7 @@ class CSVController:
             writer.writerow(self._csv_header)
 
             # Write out the audio file names and audio length.
-            for file in self.folder_files:
+            for file in self.folder_files.files():
                 logging.info(
                     f"Writing {file.file_name_full} to {self.csv_file.file_name_full}"
                 )
@@ -113,9 +215,43 @@ class CSVController:
                     )
                 )
 
+    def _load_rows(self) -> None:
+        """Reads the CSV file into memory and indexes its rows by file name."""
+        with instrumentation.span("csv.read", file=self.csv_file.file_name_full):
+            with open(self.csv_file.file_path, "r", encoding="utf8", newline="") as csvfile:
+                reader = csv.reader(csvfile)
+                rows = list(reader)
+
+        with self._lock:
+            self._rows = rows
+            self._row_indexes = {row[0]: i for i, row in enumerate(rows) if i and row}
+            self._dirty = set()
+
+        logging.info(f"Loaded {len(rows) - 1} rows from {self.csv_file.file_name_full}")
+
+    def _replay_journal(self) -> None:
+        """Applies the edits of a previous session that were not yet compacted."""
+        with self._lock:
+            for file_name, classification in self.journal.replay():
+                index = self._row_indexes.get(file_name)
+                if index is None:
+                    logging.warning(f"Journal entry for unknown file {file_name}")
+                    continue
+
+                self._rows[index][1] = classification
+                self._dirty.add(index)
+
+            if self._dirty:
+                self._schedule_flush()
+
     def set_classification(self, index, classification) -> None:
         """Sets the classification value for a specific row in the CSV file.
 
+        The change is made in memory and appended to the journal, which makes
+        it durable. The CSV file itself is rewritten with all pending changes
+        once ``flush_interval`` has passed. The label of the file in
+        ``folder_files`` is updated along with it.
+
         Args:
             index (int): The index of the row to update.
             classification (str): The classification value to set.
@@ -126,15 +262,18 @@ class CSVController:
         logging.info(
             "Setting classification for row " + str(index) + " to " + classification
         )
-        with open(self.csv_file.file_path, "r", encoding="utf8", newline="") as csvfile:
-            reader = csv.reader(csvfile)
-            data = list(reader)
-
-        data[index][1] = classification
+        with self._lock:
+            if self._rows[index][1] == classification:
+                return
 
-        with open(self.csv_file.file_path, "w", encoding="utf8", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerows(data)
+            self._rows[index][1] = classification
+            item = self.folder_files.find(self._rows[index][0])
+            if item is not None:
+                self.folder_files.set_label(item, classification)
+            with instrumentation.span("csv.journal_append"):
+                self.journal.append(self._rows[index][0], classification)
+            self._dirty.add(index)
+            self._schedule_flush()
 
     def get_classification(self, index) -> str:
         """Retrieves the classification value for a specific row in the CSV file.
@@ -145,8 +284,157 @@ class CSVController:
         Returns:
             str: The classification value of the specified row.
         """
-        with open(self.csv_file.file_path, "r", encoding="utf8", newline="") as csvfile:
-            reader = csv.reader(csvfile)
-            data = list(reader)
+        with self._lock:
+            return self._rows[index][1]
+
+    def get_row_index(self, file_name) -> int:
+        """Retrieves the row index of a file.
+
+        Args:
+            file_name (str): The full name of the file, e.g. ``0003.mp3``.
+
+        Returns:
+            int: The index of the row, or None if the file has no row.
+        """
+        return self._row_indexes.get(file_name)
+
+    def set_classification_by_name(self, file_name, classification) -> None:
+        """Sets the classification value of the row of a file.
+
+        Args:
+            file_name (str): The full name of the file.
+            classification (str): The classification value to set.
+        """
+        self.set_classification(self._row_indexes[file_name], classification)
+
+    def get_classification_by_name(self, file_name) -> str:
+        """Retrieves the classification value of the row of a file.
+
+        Args:
+            file_name (str): The full name of the file.
+
+        Returns:
+            str: The classification value of the file.
+        """
+        return self.get_classification(self._row_indexes[file_name])
+
+    def set_predictions(self, predictions) -> None:
+        """Writes predicted classifications and their confidence to the CSV file.
+
+        The ``prediction`` and ``confidence`` columns are added to the header
+        the first time. Predictions can be recomputed at any time, so they
+        skip the journal and are written to the CSV file straight away, or
+        only kept in memory in a session.
+
+        Args:
+            predictions (dict): Maps file names to ``(classification, confidence)``.
+        """
+        with self._lock:
+            header = self._rows[0]
+            for column in self._prediction_header:
+                if column not in header:
+                    header.append(column)
+            prediction_column = header.index("prediction")
+            confidence_column = header.index("confidence")
+
+            for file_name, (classification, confidence) in predictions.items():
+                index = self._row_indexes.get(file_name)
+                if index is None:
+                    continue
+
+                row = self._rows[index]
+                row.extend([""] * (len(header) - len(row)))
+                row[prediction_column] = classification
+                row[confidence_column] = format(confidence, ".4f")
+                self._dirty.add(index)
+
+            self._dirty.add(0)
+            self.flush()
+
+    def get_prediction(self, index):
+        """Retrieves the predicted classification of a specific row in the CSV file.
+
+        Args:
+            index (int): The index of the row to retrieve.
+
+        Returns:
+            tuple: The predicted classification and its confidence, or None if the
+                row has no prediction.
+        """
+        with self._lock:
+            header = self._rows[0]
+            if "confidence" not in header:
+                return None
+
+            row = self._rows[index]
+            confidence_column = header.index("confidence")
+            if len(row) <= confidence_column or not row[confidence_column]:
+                return None
+            return row[header.index("prediction")], float(row[confidence_column])
+
+    def _schedule_flush(self) -> None:
+        """Starts the flush timer unless one is already running."""
+        if self.annotator is None and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Compacts the journal into the CSV file.
+
+        All rows changed since the last write are saved in a single write to
+        a temporary file, which then replaces the CSV file, so the CSV file is
+        never left half written. The journal is emptied afterwards; if the
+        process dies in between, replaying it again is harmless.
+
+        In a session the delta file is the only record and nothing is written.
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+            if self.annotator is not None:
+                self._dirty = set()
+                return
+
+            if not self._dirty:
+                return
+
+            logging.info(
+                f"Writing {len(self._dirty)} changed rows to {self.csv_file.file_name_full}"
+            )
+            self._write_rows(self._rows)
+            self._dirty = set()
+            self.journal.truncate()
+
+    def _write_rows(self, rows) -> None:
+        """Atomically replaces the CSV file with the given rows.
+
+        Args:
+            rows (list): The rows to write, including the header.
+        """
+        with instrumentation.span("csv.write", rows=len(rows)):
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf8",
+                newline="",
+                dir=self.folder,
+                prefix=".",
+                suffix=".csv.tmp",
+                delete=False,
+            ) as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerows(rows)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+
+            os.replace(csvfile.name, self.csv_file.file_path)
+
+    def close(self) -> None:
+        """Writes any pending changes, stops the flush timer and closes the journal."""
+        self.flush()
+        atexit.unregister(self.flush)
 
-        return data[index][1]
+        if self.journal is not None:
+            self.journal.close()
@@ -0,0 +1,149 @@
+import json
+import os
+from pydub import AudioSegment
+from audio_metadata import AudioInfo
+from audio_stream import PCMStream
+from chunk_exporter import chunk_file_name
+from file_controller import FileController
+from pcm_cache import shared_cache
+import instrumentation
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Written to an output folder instead of the chunks in cut list mode, and
+# as the checkpoint of every split until all of its chunks are exported.
+CUT_LIST = "cuts.json"
+
+
+def load_range(source, start_ms, end_ms) -> AudioSegment:
+    """Reads a range of an audio file without decoding the whole file.
+
+    WAV files and files the PCM cache holds are read by seeking straight to
+    the range. Other formats are decoded by ffmpeg from the start of the
+    range only.
+
+    Args:
+        source (str): The path to the audio file.
+        start_ms (int): The start of the range in milliseconds.
+        end_ms (int): The end of the range in milliseconds.
+
+    Returns:
+        AudioSegment: The audio of the range.
+    """
+    cache = shared_cache()
+    if source.lower().endswith(".wav") or cache.lookup(source) is not None:
+        with PCMStream(source, cache=cache) as stream:
+            if stream.seekable:
+                return AudioSegment(
+                    data=stream.read_range(start_ms, end_ms),
+                    sample_width=stream.sample_width,
+                    frame_rate=stream.frame_rate,
+                    channels=stream.channels,
+                )
+
+    return AudioSegment.from_file(
+        source, start_second=start_ms / 1000, duration=(end_ms - start_ms) / 1000
+    )
+
+
+class CutFileController(FileController):
+    """A chunk of a cut list, played from its range of the source file.
+
+    It has the name the chunk gets once it is exported, so classifications
+    made before the export still apply to the exported file.
+
+    Attributes:
+        source (str): The path to the source audio file.
+        start_ms (int): The start of the chunk in the source in milliseconds.
+        end_ms (int): The end of the chunk in the source in milliseconds.
+    """
+
+    def __init__(self, file_path, source, start_ms, end_ms, frame_rate, channels) -> None:
+        """Initializes the CutFileController.
+
+        Args:
+            file_path (str): The path the chunk would be exported to.
+            source (str): The path to the source audio file.
+            start_ms (int): The start of the chunk in milliseconds.
+            end_ms (int): The end of the chunk in milliseconds.
+            frame_rate (int): The sample rate of the source in Hz.
+            channels (int): The number of audio channels of the source.
+        """
+        super().__init__(
+            file_path, AudioInfo((end_ms - start_ms) / 1000, frame_rate, channels)
+        )
+        self.source = source
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+    def load_audio(self) -> AudioSegment:
+        """Reads the range of the chunk from the source file.
+
+        Returns:
+            AudioSegment: The audio of the chunk, without padding.
+        """
+        with instrumentation.span("file.decode", file=self.file_name_full, cut=True):
+            return load_range(self.source, self.start_ms, self.end_ms)
+
+
+def write_cut_list(output_folder, manifest) -> None:
+    """Writes the cut list of an output folder atomically.
+
+    Args:
+        output_folder (str): The folder the chunks would be written to.
+        manifest (dict): The source file, its stamp, length, sample rate, channels,
+            the padding and export format of the chunks, and their ranges.
+    """
+    path = f"{output_folder}/{CUT_LIST}"
+    with open(f"{path}.tmp", "w", encoding="utf8") as file:
+        json.dump(manifest, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_cut_list(folder):
+    """Reads the cut list of a folder.
+
+    Args:
+        folder (str): The path to the folder.
+
+    Returns:
+        dict: The manifest, or None if the folder has no readable cut list.
+    """
+    try:
+        with open(f"{folder}/{CUT_LIST}", "r", encoding="utf8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def cut_chunks(folder, existing=()) -> tuple:
+    """Returns the chunks of a folder's cut list that were not exported yet.
+
+    Args:
+        folder (str): The path to the folder.
+        existing (iterable, optional): The names of the files already in the folder.
+
+    Returns:
+        tuple: The manifest and a ``(file name, start_ms, end_ms)`` tuple per
+            chunk, or None and an empty list if the folder has no usable cut list.
+    """
+    manifest = read_cut_list(folder)
+    if manifest is None:
+        return None, []
+
+    if not os.path.exists(manifest["source"]):
+        logging.warning(f"Source {manifest['source']} of {folder}/{CUT_LIST} is missing")
+        return None, []
+
+    existing = set(existing)
+    chunks = []
+    for index, (start_ms, end_ms) in enumerate(manifest["chunks"]):
+        file_name = chunk_file_name(index, manifest["format"])
+        if file_name not in existing:
+            chunks.append((file_name, start_ms, end_ms))
+    return manifest, chunks
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+from dataset_exporter import DatasetExporter, DTYPES
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parses the command line.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Export a classified folder as sharded PCM grouped by label."
+    )
+    parser.add_argument("folder", help="The classified folder holding the clips and csv file.")
+    parser.add_argument("-o", "--output", required=True, help="Folder to write the dataset to.")
+    parser.add_argument(
+        "--rate", type=int, default=16000, help="Sample rate to resample to (default: 16000)."
+    )
+    parser.add_argument(
+        "--dtype", choices=DTYPES, default="float32", help="Sample type (default: float32)."
+    )
+    parser.add_argument(
+        "--shard-mb", type=int, default=64, help="Largest shard size in MiB (default: 64)."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of clips decoded at the same time.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Exports the dataset and prints a summary.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        int: The exit code, non-zero if any clip failed to decode.
+    """
+    args = parse_args(argv)
+    exporter = DatasetExporter(
+        args.folder,
+        args.output,
+        frame_rate=args.rate,
+        dtype=args.dtype,
+        shard_bytes=args.shard_mb * 1024 * 1024,
+        workers=args.jobs,
+    )
+    result = exporter.export()
+
+    print(
+        f"Exported {len(result.exported)} of {result.labels} labels "
+        f"({result.clips} clips, {len(result.failures)} failed) in {result.seconds:.1f} s"
+    )
+    return 1 if result.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from csv_controller import read_classifications
+from pcm_cache import shared_cache
+from silence_detection import samples_from_buffer, max_possible_amplitude
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+MANIFEST = "manifest.json"
+
+# Suffix of the folder a label is written to before it replaces the old one.
+PARTIAL_SUFFIX = ".partial"
+
+# Names in the output folder that are not label folders.
+_RESERVED_NAMES = {MANIFEST, f"{MANIFEST}.tmp"}
+
+# Sample types clips can be stored as.
+DTYPES = ("float32", "int16")
+
+
+class DatasetResult(NamedTuple):
+    """The outcome of exporting a classified folder.
+
+    Attributes:
+        labels (int): The number of labels in the dataset.
+        exported (list): The labels whose shards were (re)written.
+        clips (int): The number of clips decoded.
+        failures (list): The file names that could not be decoded.
+        seconds (float): The wall time spent.
+    """
+
+    labels: int
+    exported: list
+    clips: int
+    failures: list
+    seconds: float
+
+
+def label_folder_name(label) -> str:
+    """Returns a folder name that is safe to use for a label on any file system.
+
+    A label is not safe if it names the manifest or ends in the suffix of
+    the folder another label is written to, whatever its case.
+
+    Args:
+        label (str): The classification.
+
+    Returns:
+        str: The label itself if it is safe, otherwise a sanitized name with a
+            short hash of the label so that two labels never share a folder.
+    """
+    safe = re.sub(r"[^\w.-]+", "_", label).strip(".") or "_"
+    reserved = safe.lower() in _RESERVED_NAMES or safe.lower().endswith(PARTIAL_SUFFIX)
+    if safe == label and not reserved:
+        return label
+    return f"{safe}-{hashlib.sha1(label.encode('utf8')).hexdigest()[:8]}"
+
+
+def decode_clip(file_path, frame_rate, dtype) -> np.ndarray:
+    """Decodes a clip to mono PCM at the given rate. Runs inside a worker process.
+
+    Args:
+        file_path (str): The path to the audio file.
+        frame_rate (int): The sample rate to resample to in Hz.
+        dtype (str): ``float32`` for samples in [-1, 1) or ``int16``.
+
+    Returns:
+        np.ndarray: The samples.
+    """
+    # The converted samples are cached too, so later exports only map them.
+    audio = shared_cache().load(file_path, (frame_rate, 1, 2))
+
+    samples = samples_from_buffer(audio.data, audio.sample_width)
+    if dtype == "int16":
+        return samples.copy()
+    return samples.astype(np.float32) / max_possible_amplitude(audio.sample_width)
+
+
+def _decode_entry(args):
+    """Decodes a clip for ``ProcessPoolExecutor.map``, catching any failure.
+
+    Args:
+        args (tuple): The file path, frame rate and dtype.
+
+    Returns:
+        np.ndarray or str: The samples, or the error message.
+    """
+    try:
+        return decode_clip(*args)
+    except Exception as error:
+        return repr(error)
+
+
+class DatasetExporter:
+    """Exports a classified folder as sharded PCM grouped by label.
+
+    Every label gets a folder of shards: plain files of back-to-back samples
+    that can be memory-mapped, and an ``index.json`` with the shard, sample
+    offset and length of each clip. A clip never spans two shards.
+
+    A label is only exported again if its clips, their files or the export
+    parameters changed since the last run, so relabeling a few clips rewrites
+    just the labels they moved between.
+
+    Attributes:
+        folder (str): The path to the classified folder.
+        output_folder (str): The folder to write the dataset to.
+        frame_rate (int): The sample rate of the dataset in Hz.
+        dtype (str): The sample type, ``float32`` or ``int16``.
+        shard_bytes (int): The largest size of a shard in bytes.
+        workers (int): The number of decoding processes.
+    """
+
+    def __init__(
+        self,
+        folder,
+        output_folder,
+        frame_rate=16000,
+        dtype="float32",
+        shard_bytes=64 * 1024 * 1024,
+        workers=None,
+    ) -> None:
+        """Initializes the DatasetExporter.
+
+        Args:
+            folder (str): The path to the classified folder.
+            output_folder (str): The folder to write the dataset to.
+            frame_rate (int, optional): The sample rate of the dataset in Hz.
+            dtype (str, optional): The sample type, ``float32`` or ``int16``.
+            shard_bytes (int, optional): The largest size of a shard in bytes.
+            workers (int, optional): The number of decoding processes, one per CPU by default.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}, expected one of {DTYPES}")
+
+        self.folder = folder
+        self.output_folder = output_folder
+        self.frame_rate = frame_rate
+        self.dtype = dtype
+        self.shard_bytes = shard_bytes
+        self.workers = workers or os.cpu_count() or 1
+
+    def export(self) -> DatasetResult:
+        """Brings the dataset up to date with the classifications of the folder.
+
+        Returns:
+            DatasetResult: The outcome of the export.
+        """
+        start = time.perf_counter()
+        os.makedirs(self.output_folder, exist_ok=True)
+
+        groups = {}
+        for file_name, label in read_classifications(self.folder).items():
+            if label and os.path.isfile(f"{self.folder}/{file_name}"):
+                groups.setdefault(label, []).append(file_name)
+
+        manifest = self._read_manifest()
+        previous = manifest.get("labels", {})
+        labels = {}
+        stale = []
+        for label, file_names in sorted(groups.items()):
+            fingerprint = self._fingerprint(sorted(file_names))
+            folder = label_folder_name(label)
+            entry = previous.get(label)
+            if (
+                entry is not None
+                and entry["fingerprint"] == fingerprint
+                and entry["folder"] == folder
+            ):
+                labels[label] = entry
+            else:
+                labels[label] = {"folder": folder, "fingerprint": fingerprint}
+                stale.append(label)
+
+        clips = 0
+        failures = []
+        if stale:
+            jobs = [
+                (label, file_name)
+                for label in stale
+                for file_name in sorted(groups[label])
+            ]
+            decoded = self._decode_all([f"{self.folder}/{name}" for _, name in jobs])
+
+            writers = {label: _LabelWriter(self, labels[label]["folder"]) for label in stale}
+            for (label, file_name), samples in zip(jobs, decoded):
+                if isinstance(samples, str):
+                    logging.error(f"Could not decode {file_name}: {samples}")
+                    failures.append(file_name)
+                    continue
+                writers[label].add(file_name, samples)
+                clips += 1
+
+            failed = set(failures)
+            for label, writer in writers.items():
+                labels[label]["clips"] = writer.commit()
+                # A failed clip has to be retried next time.
+                if failed.intersection(groups[label]):
+                    labels[label]["fingerprint"] = None
+
+        for label, entry in previous.items():
+            if label not in labels or labels[label]["folder"] != entry["folder"]:
+                shutil.rmtree(f"{self.output_folder}/{entry['folder']}", ignore_errors=True)
+
+        self._write_manifest(labels)
+
+        result = DatasetResult(
+            len(labels), stale, clips, failures, time.perf_counter() - start
+        )
+        logging.info(
+            f"Exported {len(stale)} of {len(labels)} labels ({clips} clips, "
+            f"{len(failures)} failed) to {self.output_folder} in {result.seconds:.1f} s"
+        )
+        return result
+
+    def _fingerprint(self, file_names) -> str:
+        """Returns a hash of a label's clips, their files and the export parameters.
+
+        Args:
+            file_names (list): The sorted names of the clips of the label.
+
+        Returns:
+            str: The hex digest.
+        """
+        digest = hashlib.sha1()
+        digest.update(f"{self.frame_rate}:{self.dtype}:{self.shard_bytes}".encode("utf8"))
+        for file_name in file_names:
+            stat = os.stat(f"{self.folder}/{file_name}")
+            digest.update(f"\n{file_name}:{stat.st_size}:{stat.st_mtime}".encode("utf8"))
+        return digest.hexdigest()
+
+    def _decode_all(self, paths):
+        """Decodes clips in parallel, yielding them in order.
+
+        Args:
+            paths (list): The paths of the clips.
+
+        Returns:
+            iterator: The samples or error message of each clip.
+        """
+        args = [(path, self.frame_rate, self.dtype) for path in paths]
+        if self.workers == 1:
+            return map(_decode_entry, args)
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Results are consumed in order while later clips are still decoding.
+        results = executor.map(_decode_entry, args, chunksize=8)
+        executor.shutdown(wait=False)
+        return results
+
+    def _read_manifest(self) -> dict:
+        """Reads the manifest of the previous export.
+
+        Returns:
+            dict: The manifest, empty if there was none.
+        """
+        try:
+            with open(f"{self.output_folder}/{MANIFEST}", "r", encoding="utf8") as manifest:
+                return json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, labels) -> None:
+        """Atomically writes the manifest.
+
+        Args:
+            labels (dict): Maps labels to their folder, fingerprint and clip count.
+        """
+        path = f"{self.output_folder}/{MANIFEST}"
+        with open(f"{path}.tmp", "w", encoding="utf8") as manifest:
+            json.dump(
+                {"frame_rate": self.frame_rate, "dtype": self.dtype, "labels": labels},
+                manifest,
+                indent=2,
+            )
+        os.replace(f"{path}.tmp", path)
+
+
+class _LabelWriter:
+    """Writes the shards of one label into a temporary folder, then swaps it in."""
+
+    def __init__(self, exporter, folder_name) -> None:
+        """Initializes the _LabelWriter.
+
+        Args:
+            exporter (DatasetExporter): The exporter the settings come from.
+            folder_name (str): The name of the label's folder.
+        """
+        self.folder = f"{exporter.output_folder}/{folder_name}"
+        self.partial_folder = f"{self.folder}{PARTIAL_SUFFIX}"
+        self.shard_bytes = exporter.shard_bytes
+        self.clips = []
+        self._shard = None
+        self._shard_index = -1
+        self._shard_size = 0
+
+        shutil.rmtree(self.partial_folder, ignore_errors=True)
+        os.makedirs(self.partial_folder)
+
+    def add(self, file_name, samples) -> None:
+        """Appends a clip, starting a new shard if it does not fit the current one.
+
+        Args:
+            file_name (str): The name of the clip.
+            samples (np.ndarray): The samples of the clip.
+        """
+        if self._shard is None or (
+            self._shard_size and self._shard_size + samples.nbytes > self.shard_bytes
+        ):
+            self._next_shard()
+
+        self.clips.append(
+            [file_name, self._shard_index, self._shard_size // samples.itemsize, len(samples)]
+        )
+        self._shard.write(samples.tobytes())
+        self._shard_size += samples.nbytes
+
+    def _next_shard(self) -> None:
+        """Closes the current shard and opens the next one."""
+        if self._shard is not None:
+            self._shard.close()
+        self._shard_index += 1
+        self._shard_size = 0
+        self._shard = open(f"{self.partial_folder}/{shard_file_name(self._shard_index)}", "wb")
+
+    def commit(self) -> int:
+        """Writes the offsets index and replaces the label's previous folder.
+
+        Returns:
+            int: The number of clips written.
+        """
+        if self._shard is not None:
+            self._shard.close()
+
+        with open(f"{self.partial_folder}/index.json", "w", encoding="utf8") as index:
+            json.dump({"shards": self._shard_index + 1, "clips": self.clips}, index)
+
+        shutil.rmtree(self.folder, ignore_errors=True)
+        os.replace(self.partial_folder, self.folder)
+        return len(self.clips)
+
+
+def shard_file_name(index) -> str:
+    """Returns the file name of a shard, e.g. ``shard-00003.pcm``.
+
+    Args:
+        index (int): The position of the shard in its label folder.
+
+    Returns:
+        str: The file name.
+    """
+    return f"shard-{str(index).zfill(5)}.pcm"
+
+
+class Dataset:
+    """Reads an exported dataset without copying any samples.
+
+    Attributes:
+        folder (str): The folder the dataset was exported to.
+        frame_rate (int): The sample rate of the clips in Hz.
+        dtype (np.dtype): The sample type of the clips.
+        labels (list): The labels in the dataset.
+    """
+
+    def __init__(self, folder) -> None:
+        """Initializes the Dataset and reads its manifest.
+
+        Args:
+            folder (str): The folder the dataset was exported to.
+        """
+        self.folder = folder
+        with open(f"{folder}/{MANIFEST}", "r", encoding="utf8") as manifest:
+            self._manifest = json.load(manifest)
+
+        self.frame_rate = self._manifest["frame_rate"]
+        self.dtype = np.dtype(self._manifest["dtype"])
+        self.labels = sorted(self._manifest["labels"])
+        self._shards = {}
+
+    def clips(self, label):
+        """Yields the clips of a label as read-only views into the shards.
+
+        Args:
+            label (str): The classification.
+
+        Yields:
+            tuple: The file name of the clip and its samples as an ``np.memmap``.
+        """
+        label_folder = f"{self.folder}/{self._manifest['labels'][label]['folder']}"
+        with open(f"{label_folder}/index.json", "r", encoding="utf8") as index:
+            clips = json.load(index)["clips"]
+
+        for file_name, shard, offset, length in clips:
+            yield file_name, self._shard(label_folder, shard)[offset : offset + length]
+
+    def _shard(self, label_folder, shard):
+        """Returns a shard memory-mapped as an array, opening it once.
+
+        Args:
+            label_folder (str): The folder of the label.
+            shard (int): The position of the shard.
+
+        Returns:
+            np.memmap: The samples of the shard.
+        """
+        path = f"{label_folder}/{shard_file_name(shard)}"
+        if path not in self._shards:
+            if os.path.getsize(path):
+                self._shards[path] = np.memmap(path, dtype=self.dtype, mode="r")
+            else:
+                self._shards[path] = np.zeros(0, dtype=self.dtype)
+        return self._shards[path]
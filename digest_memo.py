@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from split_checkpoint import file_digest
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Sidecar file of a folder that remembers the SHA-256 of its files.
+DIGEST_LOG = "digests.jsonl"
+
+_memos = {}
+_memos_lock = threading.Lock()
+
+
+def folder_memo(folder) -> "DigestMemo":
+    """Returns the DigestMemo of a folder, shared by everything in the process.
+
+    Args:
+        folder (str): The path to the folder.
+
+    Returns:
+        DigestMemo: The memo.
+    """
+    folder = os.path.abspath(folder)
+    with _memos_lock:
+        memo = _memos.get(folder)
+        if memo is None:
+            memo = _memos[folder] = DigestMemo(folder)
+        return memo
+
+
+def digest_of(file_path) -> str:
+    """Returns the SHA-256 of a file, read from the memo of its folder if unchanged.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The digest as a hex string.
+    """
+    folder, file_name = os.path.split(os.path.abspath(file_path))
+    return folder_memo(folder).digest(file_name)
+
+
+class DigestMemo:
+    """Remembers the SHA-256 of the files of a folder by size and mtime.
+
+    The PCM cache, the feature cache and the duplicate finder all key their
+    entries by this digest, so an unchanged file is read once to hash it,
+    whichever of them asks first and in whichever process. Digests are
+    appended to ``digests.jsonl`` in the sidecar folder as they are computed;
+    a record cut off by a crash is ignored, and the log is rewritten once
+    most of its records are outdated. In a folder that cannot be written to,
+    digests are only remembered for the running process.
+
+    Attributes:
+        folder (str): The path to the folder.
+    """
+
+    def __init__(self, folder) -> None:
+        """Initializes the DigestMemo. The log is read on first use.
+
+        Args:
+            folder (str): The path to the folder.
+        """
+        self.folder = folder
+        self._known = None
+        self._log_path = None
+        self._lock = threading.Lock()
+
+    def digest(self, file_name) -> str:
+        """Returns the SHA-256 of a file of the folder.
+
+        Args:
+            file_name (str): The full name of the file.
+
+        Returns:
+            str: The digest as a hex string.
+        """
+        return self.digests([file_name])[file_name]
+
+    def digests(self, file_names) -> dict:
+        """Returns the SHA-256 of files of the folder, hashing only new or changed ones.
+
+        Args:
+            file_names (iterable): The full names of the files.
+
+        Returns:
+            dict: Maps file names to their digest.
+        """
+        digests = {}
+        stale = []
+        with self._lock:
+            self._load()
+            for file_name in file_names:
+                stat = os.stat(f"{self.folder}/{file_name}")
+                stamp = [stat.st_size, stat.st_mtime_ns]
+                known = self._known.get(file_name)
+                if known is not None and known[:2] == stamp:
+                    digests[file_name] = known[2]
+                else:
+                    stale.append((file_name, stamp))
+
+        # Hashing runs outside the lock, other lookups need not wait for it.
+        records = []
+        for file_name, stamp in stale:
+            digests[file_name] = file_digest(f"{self.folder}/{file_name}")
+            records.append([file_name, *stamp, digests[file_name]])
+
+        if records:
+            self._append(records)
+        return digests
+
+    def remember(self, file_name, digest) -> None:
+        """Records the digest of a file that was just written and hashed.
+
+        Args:
+            file_name (str): The full name of the file.
+            digest (str): Its SHA-256 as a hex string.
+        """
+        stat = os.stat(f"{self.folder}/{file_name}")
+        self._append([[file_name, stat.st_size, stat.st_mtime_ns, digest]])
+
+    def _load(self) -> None:
+        """Reads the log once, compacting it if most of its records are outdated."""
+        if self._known is not None:
+            return
+
+        # file_controller imports the PCM cache, which imports this module.
+        from file_controller import SIDECAR_FOLDER
+
+        self._known = {}
+        self._log_path = os.path.join(self.folder, SIDECAR_FOLDER, DIGEST_LOG)
+        try:
+            with open(self._log_path, "r", encoding="utf8") as log:
+                lines = log.read().split("\n")[:-1]
+        except OSError:
+            return
+
+        for line in lines:
+            try:
+                file_name, size, mtime_ns, digest = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping malformed record in {self._log_path}")
+                continue
+            self._known[file_name] = [size, mtime_ns, digest]
+
+        if len(lines) > 2 * len(self._known) + 1000:
+            self._rewrite()
+
+    def _append(self, records) -> None:
+        """Remembers digests and appends them to the log.
+
+        Args:
+            records (list): ``[file_name, size, mtime_ns, digest]`` of every file.
+        """
+        with self._lock:
+            self._load()
+            for file_name, *entry in records:
+                self._known[file_name] = entry
+            if self._log_path is None:
+                return
+
+            try:
+                os.makedirs(os.path.dirname(self._log_path), exist_ok=True)
+                with open(self._log_path, "a", encoding="utf8") as log:
+                    log.write("".join(json.dumps(record) + "\n" for record in records))
+            except OSError as error:
+                logging.warning(f"Keeping digests in memory only, {self._log_path}: {error}")
+                self._log_path = None
+
+    def _rewrite(self) -> None:
+        """Atomically replaces the log with one record per file."""
+        try:
+            with open(f"{self._log_path}.tmp", "w", encoding="utf8") as log:
+                for file_name, entry in self._known.items():
+                    log.write(json.dumps([file_name, *entry]) + "\n")
+            os.replace(f"{self._log_path}.tmp", self._log_path)
+        except OSError as error:
+            logging.warning(f"Could not compact {self._log_path}: {error}")
@@ -0,0 +1,331 @@
+import os
+import time
+import numpy as np
+from feature_extraction import FeatureExtractor
+from file_controller import AUDIO_EXTENSIONS, sidecar_path
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Number of time segments a clip's spectrogram is averaged into.
+SEGMENTS = 8
+
+# Number of LSH bands a fingerprint is cut into, and of bits per band. With
+# 16-bit bands unrelated clips share a bucket about once in 65536, so
+# buckets hold about one clip even in large folders, and with 24 bands two
+# clips at MIN_SIMILARITY still share at least one bucket 99% of the time.
+BANDS = 24
+BAND_BITS = 16
+FINGERPRINT_BITS = BANDS * BAND_BITS
+
+# Number of candidate pairs whose descriptors are compared at once.
+_PAIR_BATCH = 1 << 16
+
+# Smallest cosine similarity between the descriptors of near-duplicates.
+MIN_SIMILARITY = 0.95
+
+# Largest relative difference in length between near-duplicates.
+MAX_LENGTH_DIFFERENCE = 0.1
+
+# Dynamic range kept below the loudest band of a clip, in dB. Quieter
+# detail, such as background noise, does not tell clips apart.
+DYNAMIC_RANGE_DB = 40
+
+# Seed of the random hyperplanes, fixed so fingerprints stay comparable.
+_SEED = 0x5EED
+
+
+def spectral_descriptor(log_mel) -> np.ndarray:
+    """Averages a log-mel spectrogram into a fixed number of time segments.
+
+    Everything more than DYNAMIC_RANGE_DB below the loudest band is clamped
+    and the mean is removed, so the same sound at a different gain gives the
+    same descriptor.
+
+    Args:
+        log_mel (np.ndarray): The spectrogram of shape (frames, n_mels).
+
+    Returns:
+        np.ndarray: The flattened segment means, of length SEGMENTS * n_mels.
+    """
+    floor = log_mel.max() - DYNAMIC_RANGE_DB * np.log(10) / 10
+    log_mel = np.maximum(log_mel, floor)
+
+    frames = len(log_mel)
+    starts = np.arange(SEGMENTS) * frames // SEGMENTS
+    sizes = np.maximum(np.diff(np.append(starts, frames)), 1)
+    segments = np.add.reduceat(log_mel.astype(np.float64), starts, axis=0) / sizes[:, None]
+
+    descriptor = segments.ravel()
+    return descriptor - descriptor.mean()
+
+
+def fingerprints(descriptors) -> np.ndarray:
+    """Computes SimHash fingerprints of the descriptors of a folder, cut into bands.
+
+    Descriptors should be centered on the folder mean first, so that what
+    all clips have in common does not dominate. Each bit is the side of a
+    random hyperplane the descriptor lies on, so the Hamming distance between
+    two fingerprints grows with the angle between their descriptors.
+
+    Args:
+        descriptors (np.ndarray): One descriptor per row.
+
+    Returns:
+        np.ndarray: One row of BANDS band keys per descriptor, as uint32.
+    """
+    if not len(descriptors):
+        return np.zeros((0, BANDS), dtype=np.uint32)
+
+    planes = np.random.default_rng(_SEED).standard_normal(
+        (descriptors.shape[1], FINGERPRINT_BITS)
+    )
+    bits = ((descriptors @ planes) > 0).reshape(len(descriptors), BANDS, BAND_BITS)
+    return (bits @ (1 << np.arange(BAND_BITS))).astype(np.uint32)
+
+
+def candidate_pairs(keys) -> np.ndarray:
+    """Returns the pairs of rows that share the key of at least one band.
+
+    Each band is sorted once, so rows with the same key end up next to
+    each other; the pairs within these runs are taken by comparing every row
+    with the ones ``offset`` places further, for offsets up to the largest run.
+
+    Args:
+        keys (np.ndarray): The band keys, one row per clip.
+
+    Returns:
+        np.ndarray: The distinct pairs as rows ``(a, b)`` with ``a < b``.
+    """
+    count = len(keys)
+    codes = [np.zeros(0, dtype=np.int64)]
+    for band in keys.T:
+        order = np.argsort(band, kind="stable")
+        _, runs, sizes = np.unique(band[order], return_inverse=True, return_counts=True)
+        for offset in range(1, int(sizes.max(initial=1))):
+            same = runs[offset:] == runs[:-offset]
+            first, second = order[:-offset][same], order[offset:][same]
+            codes.append(np.minimum(first, second) * count + np.maximum(first, second))
+
+    codes = np.unique(np.concatenate(codes))
+    return np.stack([codes // max(count, 1), codes % max(count, 1)], axis=1)
+
+
+class _DisjointSet:
+    """Union-find over the positions of the clips."""
+
+    def __init__(self, size) -> None:
+        """Initializes every clip as its own group.
+
+        Args:
+            size (int): The number of clips.
+        """
+        self.parents = list(range(size))
+
+    def find(self, item) -> int:
+        """Returns the representative of a clip's group.
+
+        Args:
+            item (int): The position of the clip.
+
+        Returns:
+            int: The position of the representative.
+        """
+        while self.parents[item] != item:
+            self.parents[item] = self.parents[self.parents[item]]
+            item = self.parents[item]
+        return item
+
+    def union(self, a, b) -> bool:
+        """Merges the groups of two clips.
+
+        Args:
+            a (int): The position of a clip.
+            b (int): The position of another clip.
+
+        Returns:
+            bool: False if they already were in the same group.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        self.parents[max(a, b)] = min(a, b)
+        return True
+
+
+class DuplicateFinder:
+    """Finds groups of duplicate and near-duplicate clips in a folder.
+
+    Descriptors are derived from the cached log-mel spectrograms and kept
+    in an ``.npz`` index in the sidecar folder under each clip's content
+    hash. Clips with the same content hash are duplicates outright; of the
+    rest, candidate pairs come from LSH buckets: SimHash fingerprints are
+    cut into bands and only clips sharing a band are compared, instead of
+    all pairs. Candidates are near-duplicates if their descriptors are
+    similar enough and their lengths are close.
+
+    Attributes:
+        folder (str): The path to the chunk folder.
+        min_similarity (float): The smallest cosine similarity of near-duplicates.
+        extractor (FeatureExtractor): The source of the spectrograms.
+        comparisons (int): The number of candidate pairs compared by the last run.
+    """
+
+    def __init__(self, folder, min_similarity=MIN_SIMILARITY, params=None, workers=None) -> None:
+        """Initializes the DuplicateFinder.
+
+        Args:
+            folder (str): The path to the chunk folder.
+            min_similarity (float, optional): The smallest cosine similarity of
+                near-duplicates.
+            params (FeatureParams, optional): The feature parameters.
+            workers (int, optional): The number of processes computing features.
+        """
+        self.folder = folder
+        self.min_similarity = min_similarity
+        self.extractor = FeatureExtractor(folder, params, workers)
+        self.comparisons = 0
+
+    def describe_folder(self):
+        """Returns the descriptor and length of every clip, computing only new ones.
+
+        Returns:
+            tuple: The file names, their content hashes, and the descriptors as
+                rows of an array and lengths in frames of the distinct contents,
+                in the order of ``np.unique`` of the hashes.
+        """
+        key = self.extractor.params.key("log_mel")
+        path = sidecar_path(self.folder, "features", f"descriptors-{key}.npz")
+        known = {}
+        if os.path.exists(path):
+            with np.load(path) as index:
+                known = dict(
+                    zip(
+                        index["hashes"].tolist(),
+                        zip(index["descriptors"], index["frames"].tolist()),
+                    )
+                )
+
+        file_names = [
+            name
+            for name in sorted(os.listdir(self.folder))
+            if os.path.splitext(name)[1][1:] in AUDIO_EXTENSIONS
+        ]
+        hashes = self.extractor.content_hashes(file_names)
+
+        # Only clips with new content need their spectrogram.
+        names_by_hash = {hashes[name]: name for name in file_names}
+        missing = sorted(set(names_by_hash) - set(known))
+        if missing:
+            features = self.extractor.features_of(
+                [names_by_hash[digest] for digest in missing], "log_mel"
+            )
+            for digest in missing:
+                log_mel = features.get(names_by_hash[digest])
+                if log_mel is not None:
+                    known[digest] = (spectral_descriptor(log_mel), len(log_mel))
+
+            with open(f"{path}.tmp", "wb") as index:
+                np.savez(
+                    index,
+                    hashes=np.array(list(known), dtype=str),
+                    descriptors=np.array([entry[0] for entry in known.values()]),
+                    frames=np.array([entry[1] for entry in known.values()]),
+                )
+            os.replace(f"{path}.tmp", path)
+
+        names = [name for name in file_names if hashes[name] in known]
+        if not names:
+            return [], [], np.zeros((0, 0)), np.zeros(0, dtype=int)
+
+        digests = [hashes[name] for name in names]
+        contents = np.unique(digests).tolist()
+        descriptors = np.stack([known[digest][0] for digest in contents])
+        frames = np.array([known[digest][1] for digest in contents])
+        return names, digests, descriptors, frames
+
+    def groups(self) -> list:
+        """Groups the clips of the folder into near-duplicates.
+
+        Returns:
+            list: The groups with more than one clip, largest first, each a sorted
+                list of file names.
+        """
+        start = time.perf_counter()
+        names, digests, descriptors, frames = self.describe_folder()
+        if not names:
+            return []
+
+        # Clips with the same content join the group of the first of them.
+        _, representatives, contents = np.unique(
+            digests, return_index=True, return_inverse=True
+        )
+        groups = _DisjointSet(len(names))
+        for position, content in enumerate(contents.tolist()):
+            groups.union(position, int(representatives[content]))
+
+        centered = descriptors - descriptors.mean(axis=0)
+        norms = np.linalg.norm(centered, axis=1)
+        units = centered / np.where(norms == 0, 1.0, norms)[:, None]
+
+        pairs = candidate_pairs(fingerprints(centered))
+        self.comparisons = len(pairs)
+        for a, b in pairs[self._similar(units, frames, pairs)].tolist():
+            groups.union(int(representatives[a]), int(representatives[b]))
+
+        members = {}
+        for position, name in enumerate(names):
+            members.setdefault(groups.find(position), []).append(name)
+        result = sorted(
+            (sorted(group) for group in members.values() if len(group) > 1),
+            key=lambda group: (-len(group), group[0]),
+        )
+
+        logging.info(
+            f"Found {len(result)} duplicate groups among {len(names)} clips in "
+            f"{self.folder} with {self.comparisons} comparisons in "
+            f"{time.perf_counter() - start:.2f} s"
+        )
+        return result
+
+    def _similar(self, units, frames, pairs) -> np.ndarray:
+        """Checks which candidate pairs are near-duplicates, a batch at a time.
+
+        Args:
+            units (np.ndarray): The unit-length centered descriptors.
+            frames (np.ndarray): The length of each clip in frames.
+            pairs (np.ndarray): The candidate pairs as rows ``(a, b)``.
+
+        Returns:
+            np.ndarray: True for the pairs whose lengths and descriptors are
+                close enough.
+        """
+        similar = np.zeros(len(pairs), dtype=bool)
+        for batch in range(0, len(pairs), _PAIR_BATCH):
+            a, b = pairs[batch : batch + _PAIR_BATCH].T
+            longest = np.maximum(frames[a], frames[b])
+            close = np.flatnonzero(
+                np.abs(frames[a] - frames[b]) <= MAX_LENGTH_DIFFERENCE * longest + 1
+            )
+            # Only pairs of about the same length have their descriptors compared.
+            similarity = np.einsum("ij,ij->i", units[a[close]], units[b[close]])
+            similar[batch + close] = similarity >= self.min_similarity
+        return similar
+
+
+def label_group(csv_controller, group, classification) -> None:
+    """Applies one classification to every clip of a duplicate group.
+
+    Args:
+        csv_controller (CSVController): The open controller of the folder.
+        group (list): The file names of the group.
+        classification (str): The classification to set.
+    """
+    for file_name in group:
+        index = csv_controller.get_row_index(file_name)
+        if index is not None:
+            csv_controller.set_classification(index, classification)
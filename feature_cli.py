@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from feature_extraction import FeatureExtractor, FeatureParams, KINDS
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parses the command line.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    defaults = FeatureParams()
+    parser = argparse.ArgumentParser(
+        description="Compute and cache spectral features of a classified folder."
+    )
+    parser.add_argument("folder", help="The classified folder holding the clips and csv file.")
+    parser.add_argument("--kind", choices=KINDS, default="mfcc", help="Features to compute.")
+    parser.add_argument("--rate", type=int, default=defaults.frame_rate, help="Sample rate.")
+    parser.add_argument("--n-fft", type=int, default=defaults.n_fft, help="FFT size.")
+    parser.add_argument("--hop", type=int, default=defaults.hop_length, help="Hop length.")
+    parser.add_argument("--win", type=int, default=defaults.win_length, help="Window length.")
+    parser.add_argument("--n-mels", type=int, default=defaults.n_mels, help="Mel bands.")
+    parser.add_argument("--n-mfcc", type=int, default=defaults.n_mfcc, help="Cepstral coefficients.")
+    parser.add_argument(
+        "--all", action="store_true", help="Include clips without a classification."
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write the features and labels to this .npz file."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes computing features.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Extracts the features and prints a summary.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        int: The exit code.
+    """
+    args = parse_args(argv)
+    params = FeatureParams(
+        frame_rate=args.rate,
+        n_fft=args.n_fft,
+        hop_length=args.hop,
+        win_length=args.win,
+        n_mels=args.n_mels,
+        n_mfcc=args.n_mfcc,
+    )
+    extractor = FeatureExtractor(args.folder, params, workers=args.jobs)
+
+    start = time.perf_counter()
+    features = extractor.extract(args.kind, classified_only=not args.all)
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        names = sorted(features)
+        np.savez(
+            args.output,
+            names=np.array(names),
+            labels=np.array([features[name][0] for name in names]),
+            **{f"features_{i}": features[name][1] for i, name in enumerate(names)},
+        )
+
+    print(
+        f"{len(features)} clips: {extractor.computed} computed, "
+        f"{extractor.cached} from cache in {elapsed:.2f} s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+import numpy as np
+from csv_controller import read_classifications
+from dataset_exporter import decode_clip
+from digest_memo import folder_memo
+from file_controller import sidecar_path
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Kinds of features that can be extracted.
+KINDS = ("log_mel", "mfcc")
+
+# Number of clips whose frames go through one FFT call.
+BATCH_SIZE = 32
+
+
+class FeatureParams(NamedTuple):
+    """The parameters features are computed with.
+
+    Attributes:
+        frame_rate (int): The sample rate clips are resampled to in Hz.
+        n_fft (int): The FFT size in samples.
+        hop_length (int): The number of samples between frames.
+        win_length (int): The length of the Hann window in samples.
+        n_mels (int): The number of mel bands.
+        fmin (float): The lowest frequency of the mel bands in Hz.
+        fmax (float): The highest frequency of the mel bands in Hz, Nyquist if None.
+        n_mfcc (int): The number of cepstral coefficients.
+    """
+
+    frame_rate: int = 16000
+    n_fft: int = 512
+    hop_length: int = 160
+    win_length: int = 400
+    n_mels: int = 40
+    fmin: float = 0.0
+    fmax: Optional[float] = None
+    n_mfcc: int = 13
+
+    def key(self, kind) -> str:
+        """Returns a short hash of the parameters a kind of feature depends on.
+
+        MFCCs are derived from the log-mel spectrogram, so changing only
+        ``n_mfcc`` keeps the cached log-mel features valid.
+
+        Args:
+            kind (str): ``log_mel`` or ``mfcc``.
+
+        Returns:
+            str: The hex digest.
+        """
+        fields = list(self[:7])
+        if kind == "mfcc":
+            fields.append(self.n_mfcc)
+        return hashlib.sha1(repr(fields).encode("utf8")).hexdigest()[:12]
+
+
+def hz_to_mel(frequencies):
+    """Converts frequencies to the HTK mel scale.
+
+    Args:
+        frequencies (np.ndarray): Frequencies in Hz.
+
+    Returns:
+        np.ndarray: The mel values.
+    """
+    return 2595.0 * np.log10(1.0 + np.asarray(frequencies) / 700.0)
+
+
+def mel_to_hz(mels):
+    """Converts HTK mel values to frequencies.
+
+    Args:
+        mels (np.ndarray): The mel values.
+
+    Returns:
+        np.ndarray: Frequencies in Hz.
+    """
+    return 700.0 * (10.0 ** (np.asarray(mels) / 2595.0) - 1.0)
+
+
+def mel_filterbank(params) -> np.ndarray:
+    """Builds triangular mel filters over the bins of a real FFT.
+
+    Args:
+        params (FeatureParams): The feature parameters.
+
+    Returns:
+        np.ndarray: A float32 matrix of shape (n_fft // 2 + 1, n_mels).
+    """
+    fmax = params.fmax if params.fmax is not None else params.frame_rate / 2
+    mels = np.linspace(hz_to_mel(params.fmin), hz_to_mel(fmax), params.n_mels + 2)
+    edges = mel_to_hz(mels)
+    bins = np.fft.rfftfreq(params.n_fft, d=1.0 / params.frame_rate)
+
+    lower = (bins[:, None] - edges[None, :-2]) / (edges[1:-1] - edges[:-2])
+    upper = (edges[None, 2:] - bins[:, None]) / (edges[2:] - edges[1:-1])
+    return np.maximum(0.0, np.minimum(lower, upper)).astype(np.float32)
+
+
+def dct_matrix(n_mels, n_mfcc) -> np.ndarray:
+    """Builds an orthonormal DCT-II matrix.
+
+    Args:
+        n_mels (int): The number of mel bands.
+        n_mfcc (int): The number of coefficients to keep.
+
+    Returns:
+        np.ndarray: A float32 matrix of shape (n_mels, n_mfcc).
+    """
+    n = np.arange(n_mels)[:, None]
+    k = np.arange(n_mfcc)[None, :]
+    basis = np.cos(np.pi / n_mels * (n + 0.5) * k) * np.sqrt(2.0 / n_mels)
+    basis[:, 0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+
+def frame_signal(samples, params) -> np.ndarray:
+    """Cuts a signal into overlapping, windowed frames without copying it first.
+
+    Clips shorter than one FFT are zero-padded to a single frame.
+
+    Args:
+        samples (np.ndarray): Mono float32 samples.
+        params (FeatureParams): The feature parameters.
+
+    Returns:
+        np.ndarray: A float32 array of shape (frames, n_fft).
+    """
+    if len(samples) < params.n_fft:
+        samples = np.pad(samples, (0, params.n_fft - len(samples)))
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, params.n_fft)
+    frames = frames[:: params.hop_length]
+
+    window = np.zeros(params.n_fft, dtype=np.float32)
+    offset = (params.n_fft - params.win_length) // 2
+    window[offset : offset + params.win_length] = np.hanning(params.win_length + 1)[:-1]
+    return frames * window
+
+
+def log_mel_batch(clips, params) -> list:
+    """Computes log-mel spectrograms of several clips with one FFT call.
+
+    Args:
+        clips (list): Mono float32 samples of each clip.
+        params (FeatureParams): The feature parameters.
+
+    Returns:
+        list: A float32 array of shape (frames, n_mels) per clip.
+    """
+    if not clips:
+        return []
+
+    frames = [frame_signal(samples, params) for samples in clips]
+    bounds = np.cumsum([len(clip_frames) for clip_frames in frames])[:-1]
+
+    spectrum = np.fft.rfft(np.concatenate(frames), axis=1)
+    power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+    log_mel = np.log(power @ mel_filterbank(params) + 1e-10)
+
+    return np.split(log_mel, bounds)
+
+
+def mfcc_from_log_mel(log_mel, params) -> np.ndarray:
+    """Computes MFCCs from a log-mel spectrogram.
+
+    Args:
+        log_mel (np.ndarray): The log-mel spectrogram of shape (frames, n_mels).
+        params (FeatureParams): The feature parameters.
+
+    Returns:
+        np.ndarray: A float32 array of shape (frames, n_mfcc).
+    """
+    return log_mel @ dct_matrix(params.n_mels, params.n_mfcc)
+
+
+def _log_mel_files(paths, params) -> list:
+    """Decodes clips and computes their log-mel spectrograms. Runs inside a worker process.
+
+    Args:
+        paths (list): The paths of the clips.
+        params (FeatureParams): The feature parameters.
+
+    Returns:
+        list: The spectrogram of each clip, or the error message if it failed.
+    """
+    clips = []
+    errors = {}
+    for position, path in enumerate(paths):
+        try:
+            clips.append(decode_clip(path, params.frame_rate, "float32"))
+        except Exception as error:
+            errors[position] = repr(error)
+
+    log_mels = iter(log_mel_batch(clips, params))
+    return [
+        errors[position] if position in errors else next(log_mels)
+        for position in range(len(paths))
+    ]
+
+
+class FeatureExtractor:
+    """Computes spectral features of a classified folder and caches them on disk.
+
+    Features are stored in the sidecar folder under the content hash of each
+    clip and a hash of the parameters they depend on, so renamed or copied
+    clips are not recomputed, and a parameter change only recomputes the
+    features it affects. Content hashes come from the digest memo of the
+    folder, which the PCM cache shares, so unchanged clips are not read again.
+
+    Attributes:
+        folder (str): The path to the classified folder.
+        params (FeatureParams): The feature parameters.
+        workers (int): The number of processes computing features.
+        computed (int): The number of log-mel spectrograms computed by the last run.
+        cached (int): The number of features read from the cache by the last run.
+    """
+
+    def __init__(self, folder, params=None, workers=None) -> None:
+        """Initializes the FeatureExtractor.
+
+        Args:
+            folder (str): The path to the classified folder.
+            params (FeatureParams, optional): The feature parameters.
+            workers (int, optional): The number of processes, one per CPU by default.
+        """
+        self.folder = folder
+        self.params = params or FeatureParams()
+        self.workers = workers or os.cpu_count() or 1
+        self.computed = 0
+        self.cached = 0
+
+    def extract(self, kind="mfcc", classified_only=True) -> dict:
+        """Returns the features of the clips in the folder.
+
+        Args:
+            kind (str, optional): ``log_mel`` or ``mfcc``.
+            classified_only (bool, optional): Skip clips without a classification.
+
+        Returns:
+            dict: Maps file names to ``(classification, features)``, where features
+                is a float32 array of shape (frames, n_mels or n_mfcc).
+        """
+        labels = {
+            file_name: label
+            for file_name, label in read_classifications(self.folder).items()
+            if (label or not classified_only) and os.path.isfile(f"{self.folder}/{file_name}")
+        }
+        features = self.features_of(labels, kind)
+        return {
+            file_name: (labels[file_name], features[file_name])
+            for file_name in labels
+            if file_name in features
+        }
+
+    def features_of(self, file_names, kind="mfcc") -> dict:
+        """Returns the features of the given clips, computing only uncached ones.
+
+        Unlike ``extract``, this does not need the folder to have a CSV file.
+
+        Args:
+            file_names (iterable): The names of the clips in the folder.
+            kind (str, optional): ``log_mel`` or ``mfcc``.
+
+        Returns:
+            dict: Maps file names to a float32 array of shape (frames, n_mels or
+                n_mfcc). Clips that could not be decoded are left out.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unsupported kind {kind!r}, expected one of {KINDS}")
+
+        start = time.perf_counter()
+        self.computed = 0
+        self.cached = 0
+
+        file_names = list(file_names)
+        hashes = self.content_hashes(file_names)
+
+        features = {}
+        missing = []
+        for file_name in file_names:
+            cached = self._load(kind, hashes[file_name])
+            if cached is None and kind == "mfcc":
+                log_mel = self._load("log_mel", hashes[file_name])
+                if log_mel is not None:
+                    cached = mfcc_from_log_mel(log_mel, self.params)
+                    self._store("mfcc", hashes[file_name], cached)
+            if cached is None:
+                missing.append(file_name)
+            else:
+                self.cached += 1
+                features[file_name] = cached
+
+        for file_name, log_mel in self._compute_log_mel(missing):
+            self.computed += 1
+            self._store("log_mel", hashes[file_name], log_mel)
+            if kind == "mfcc":
+                features[file_name] = mfcc_from_log_mel(log_mel, self.params)
+                self._store("mfcc", hashes[file_name], features[file_name])
+            else:
+                features[file_name] = log_mel
+
+        logging.info(
+            f"Extracted {kind} features of {len(features)} clips in {self.folder} "
+            f"({self.computed} computed, {self.cached} cached) in "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+        return features
+
+    def _compute_log_mel(self, file_names):
+        """Computes log-mel spectrograms in batches, in parallel.
+
+        Args:
+            file_names (list): The clips to compute.
+
+        Yields:
+            tuple: The file name and log-mel spectrogram of each clip that decoded.
+        """
+        batches = [
+            file_names[i : i + BATCH_SIZE] for i in range(0, len(file_names), BATCH_SIZE)
+        ]
+        paths = [[f"{self.folder}/{name}" for name in batch] for batch in batches]
+
+        if self.workers == 1 or len(batches) < 2:
+            results = (_log_mel_files(batch, self.params) for batch in paths)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = executor.map(_log_mel_files, paths, [self.params] * len(paths))
+
+        try:
+            for batch, log_mels in zip(batches, results):
+                for file_name, log_mel in zip(batch, log_mels):
+                    if isinstance(log_mel, str):
+                        logging.error(f"Could not extract features of {file_name}: {log_mel}")
+                        continue
+                    yield file_name, log_mel
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def content_hashes(self, file_names) -> dict:
+        """Returns the content hash of each clip, rehashing only changed files.
+
+        Args:
+            file_names (iterable): The clips to hash.
+
+        Returns:
+            dict: Maps file names to their SHA-256.
+        """
+        return folder_memo(self.folder).digests(file_names)
+
+    def _cache_path(self, kind, digest) -> str:
+        """Returns the path of a cached feature.
+
+        Args:
+            kind (str): ``log_mel`` or ``mfcc``.
+            digest (str): The content hash of the clip.
+
+        Returns:
+            str: The path.
+        """
+        return sidecar_path(
+            self.folder, "features", f"{kind}-{self.params.key(kind)}", f"{digest}.npy"
+        )
+
+    def _load(self, kind, digest):
+        """Reads a cached feature.
+
+        Args:
+            kind (str): ``log_mel`` or ``mfcc``.
+            digest (str): The content hash of the clip.
+
+        Returns:
+            np.ndarray: The feature, or None if it is not cached.
+        """
+        try:
+            return np.load(self._cache_path(kind, digest))
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, kind, digest, feature) -> None:
+        """Atomically writes a feature to the cache.
+
+        Args:
+            kind (str): ``log_mel`` or ``mfcc``.
+            digest (str): The content hash of the clip.
+            feature (np.ndarray): The feature.
+        """
+        path = self._cache_path(kind, digest)
+        with open(f"{path}.tmp", "wb") as file:
+            np.save(file, feature)
+        os.replace(f"{path}.tmp", path)
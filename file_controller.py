@@ -1,39 +1,132 @@
+import os
 import pathlib
 from pydub import AudioSegment
+from audio_metadata import AudioInfo, probe_audio
+from pcm_cache import shared_cache
+import instrumentation
+
+AUDIO_EXTENSIONS = ["wav", "mp3", "flac"]
+
+# Hidden folder inside an audio folder that holds its indexes and caches.
+SIDECAR_FOLDER = ".audioclassifier"
+
+
+def sidecar_path(folder, *names) -> str:
+    """Returns a path inside the sidecar folder of an audio folder, creating its parents.
+
+    Args:
+        folder (str): The path to the audio folder.
+        *names (str): The path components inside the sidecar folder.
+
+    Returns:
+        str: The path.
+    """
+    path = os.path.join(folder, SIDECAR_FOLDER, *names)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def split_file_name(name) -> tuple:
+    """Splits a file name into its name and extension.
+
+    This is the same split as pathlib's stem and suffix, without building a
+    Path, which dominates the cost of listing large folders.
+
+    Args:
+        name (str): The full file name, e.g. ``0003.mp3``.
+
+    Returns:
+        tuple: The name without the extension and the extension without the dot.
+    """
+    dot = name.rfind(".")
+    if 0 < dot < len(name) - 1:
+        return name[:dot], name[dot + 1 :]
+    return name, ""
 
 
 class FileController:
     """Controls operations on a file.
 
+    Audio is only decoded the first time ``audio_file`` is accessed. The
+    length of an audio file is read from its header, so creating a
+    FileController costs the same no matter how long the audio is.
+
     Attributes:
         file_path (str): The path to the file.
         file_name (str): The name of the file without the extension.
         file_extension (str): The extension of the file.
         file_folder (pathlib.Path): The parent folder of the file.
         file_name_full (str): The full name of the file including the extension.
+        is_audio_file (bool): Whether the file is a wav, mp3 or flac file.
         audio_file (AudioSegment): The audio file if the file is an audio file, None otherwise.
+        audio_info (AudioInfo): The duration, sample rate and channels of the audio
+            file if the file is an audio file, None otherwise.
         audio_length (float): The duration of the audio file in seconds if the file is an audio file, None otherwise.
     """
 
-    def __init__(self, file_path) -> None:
+    def __init__(self, file_path, audio_info=None) -> None:
         """Initializes the FileController with a file path and sets up the attributes.
 
         Args:
             file_path (str): The path to the file.
+            audio_info (AudioInfo, optional): Metadata already known, e.g. from a
+                folder index, so the header does not have to be read.
         """
         self.file_path = file_path
-        self.file_name = pathlib.Path(self.file_path).stem
-        self.file_extension = pathlib.Path(self.file_path).suffix[1:]
-        self.file_folder = pathlib.Path(self.file_path).parent
-        self.file_name_full = self.file_name + "." + self.file_extension
 
-        is_audio_file = self.file_extension in ["wav", "mp3"]
-        self.audio_file = (
-            AudioSegment.from_file(self.file_path, self.file_extension)
-            if is_audio_file
-            else None
+        self.file_name, self.file_extension = split_file_name(
+            os.path.basename(file_path.rstrip("/"))
         )
-        self.audio_length = self.audio_file.duration_seconds if is_audio_file else None
+        self.file_name_full = self.file_name + "." + self.file_extension
+
+        self.is_audio_file = self.file_extension in AUDIO_EXTENSIONS
+        self._audio_file = None
+        self._audio_info = audio_info
+
+    @property
+    def file_folder(self) -> pathlib.Path:
+        """pathlib.Path: The parent folder of the file."""
+        return pathlib.Path(self.file_path).parent
+
+    @property
+    def audio_file(self) -> AudioSegment:
+        """AudioSegment: The decoded audio, loaded on first access."""
+        if self._audio_file is None and self.is_audio_file:
+            self._audio_file = self.load_audio()
+        return self._audio_file
+
+    def load_audio(self) -> AudioSegment:
+        """Decodes the audio without keeping it on the FileController.
+
+        The samples are memory-mapped from the PCM cache, so a file is only
+        decoded the first time any stage reads it.
+
+        Returns:
+            AudioSegment: The decoded audio, or None if the file is not an audio file.
+        """
+        if not self.is_audio_file:
+            return None
+        with instrumentation.span("file.decode", file=self.file_name_full):
+            return shared_cache().segment(self.file_path, file_format=self.file_extension)
+
+    @property
+    def audio_info(self) -> AudioInfo:
+        """AudioInfo: The metadata of the audio, read from the file header."""
+        if self._audio_info is None and self.is_audio_file:
+            info = probe_audio(self.file_path)
+            if info is None:
+                # Unusual headers still get metadata, at the cost of a decode.
+                audio = self.audio_file
+                info = AudioInfo(audio.duration_seconds, audio.frame_rate, audio.channels)
+            self._audio_info = info
+        return self._audio_info
+
+    @property
+    def audio_length(self) -> float:
+        """float: The duration of the audio in seconds, read from the file header."""
+        if not self.is_audio_file:
+            return None
+        return self.audio_info.duration_seconds
 
     def __str__(self) -> str:
         """Returns the file name as a string representation.
@@ -0,0 +1,142 @@
+import math
+import os
+import sqlite3
+from file_controller import AUDIO_EXTENSIONS, FileController, sidecar_path, split_file_name
+from cut_list import cut_chunks
+from queue_model import QueueModel
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    duration REAL,
+    frame_rate INTEGER,
+    channels INTEGER
+)
+"""
+
+
+class FolderIndex:
+    """Remembers the metadata of the files in a folder between sessions.
+
+    The index is a small SQLite database in the sidecar folder holding the
+    size, mtime, duration, sample rate and channel count of every audio file.
+    Scanning a folder only stats its files; audio headers are read for new or
+    changed files alone.
+
+    Attributes:
+        folder (str): The path to the folder.
+        index_path (str): The path to the SQLite database.
+        probed (int): The number of files whose header was read by the last scan.
+        other_files (list): The names of the files that are not audio, sorted, as
+            of the last scan.
+    """
+
+    def __init__(self, folder) -> None:
+        """Initializes the FolderIndex.
+
+        Args:
+            folder (str): The path to the folder.
+        """
+        self.folder = folder
+        self.index_path = sidecar_path(folder, "index.sqlite")
+        self.probed = 0
+        self.other_files = []
+
+    def scan(self) -> QueueModel:
+        """Lists the files of the folder and brings the index up to date.
+
+        Returns:
+            QueueModel: The audio files of the folder and the chunks of its cut
+                list, in name order, with their metadata. The names of the other
+                files are left in ``other_files``.
+        """
+        connection = sqlite3.connect(self.index_path)
+        try:
+            connection.execute(_SCHEMA)
+            known = {
+                row[0]: row[1:]
+                for row in connection.execute(
+                    "SELECT file_name, size, mtime, duration, frame_rate, channels FROM files"
+                )
+            }
+
+            rows = []
+            changed = []
+            self.other_files = []
+            self.probed = 0
+
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+
+                    stem, extension = split_file_name(entry.name)
+                    if extension not in AUDIO_EXTENSIONS:
+                        self.other_files.append(entry.name)
+                        continue
+
+                    stat = entry.stat()
+                    row = known.pop(entry.name, None)
+                    if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+                        rows.append((stem, entry.name, *row[2:], -1, -1))
+                        continue
+
+                    try:
+                        info = FileController(f"{self.folder}/{entry.name}").audio_info
+                    except Exception as error:
+                        logging.warning(f"Could not read metadata of {entry.name}: {error!r}")
+                        rows.append((stem, entry.name, math.nan, 0, 0, -1, -1))
+                        continue
+
+                    self.probed += 1
+                    rows.append((stem, entry.name, *info, -1, -1))
+                    changed.append((entry.name, stat.st_size, stat.st_mtime, *info))
+
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", changed
+                )
+                # Whatever is left in ``known`` was deleted from the folder.
+                connection.executemany(
+                    "DELETE FROM files WHERE file_name = ?", [(name,) for name in known]
+                )
+        finally:
+            connection.close()
+
+        # Chunks of a cut list that were not exported yet are played from the source.
+        manifest, chunks = cut_chunks(self.folder, [row[1] for row in rows])
+        for file_name, start_ms, end_ms in chunks:
+            rows.append(
+                (
+                    split_file_name(file_name)[0],
+                    file_name,
+                    (end_ms - start_ms) / 1000,
+                    manifest["frame_rate"],
+                    manifest["channels"],
+                    start_ms,
+                    end_ms,
+                )
+            )
+
+        rows.sort(key=lambda row: row[0])
+        self.other_files.sort()
+        logging.info(
+            f"Scanned {len(rows) + len(self.other_files)} files in {self.folder}, "
+            f"read {self.probed} headers"
+        )
+
+        columns = list(zip(*rows)) or [()] * 7
+        return QueueModel(
+            self.folder,
+            *columns[1:],
+            source=None if manifest is None else manifest["source"],
+        )
@@ -0,0 +1,334 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Set to a file path to record a trace of the whole run and write it at exit.
+# Paths ending in ``.jsonl`` get JSON lines, anything else a Chrome trace.
+TRACE_ENV = "AUDIOCLASSIFIER_TRACE"
+
+
+class TraceRecorder:
+    """Collects timing spans and counter samples from every thread.
+
+    Timestamps are relative to ``origin``. Recorders in worker processes
+    can share the origin of the main recorder, since ``perf_counter`` is
+    system-wide, and their events merged into it.
+
+    Attributes:
+        origin (int): The ``time.perf_counter_ns()`` value timestamps count from.
+        events (list): The recorded events as dicts, in the order they ended.
+        counters (dict): The current value of every counter.
+    """
+
+    def __init__(self, origin=None) -> None:
+        """Initializes an empty TraceRecorder.
+
+        Args:
+            origin (int, optional): The ``time.perf_counter_ns()`` value timestamps
+                count from, now by default.
+        """
+        self.origin = time.perf_counter_ns() if origin is None else origin
+        self.events = []
+        self.counters = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def now_us(self) -> float:
+        """Returns the time since the recorder was created.
+
+        Returns:
+            float: The time in microseconds.
+        """
+        return (time.perf_counter_ns() - self.origin) / 1000
+
+    def timestamp_us(self, perf_counter) -> float:
+        """Converts a ``time.perf_counter()`` value to the recorder's timeline.
+
+        Args:
+            perf_counter (float): The value in seconds.
+
+        Returns:
+            float: The time since the recorder was created in microseconds.
+        """
+        return (perf_counter * 1e9 - self.origin) / 1000
+
+    def add_span(self, name, start_us, duration_us, args) -> None:
+        """Records a finished span.
+
+        Args:
+            name (str): The name of the span.
+            start_us (float): The start of the span in microseconds.
+            duration_us (float): The duration of the span in microseconds.
+            args (dict): Extra fields describing the span.
+        """
+        event = {
+            "type": "span",
+            "name": name,
+            "start_us": start_us,
+            "duration_us": duration_us,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def add_count(self, name, value) -> None:
+        """Adds to a counter and records its new value.
+
+        Args:
+            name (str): The name of the counter.
+            value (float): The amount to add.
+        """
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.events.append(
+                {
+                    "type": "counter",
+                    "name": name,
+                    "start_us": self.now_us(),
+                    "value": total,
+                    "pid": self._pid,
+                }
+            )
+
+    def merge(self, events) -> None:
+        """Adds the events of another recorder with the same origin.
+
+        Args:
+            events (list): The events, e.g. from a worker process.
+        """
+        with self._lock:
+            self.events.extend(events)
+
+    def summary(self) -> dict:
+        """Aggregates the spans by name.
+
+        Returns:
+            dict: Maps span names to their count and total, mean and maximum
+                duration in milliseconds.
+        """
+        with self._lock:
+            spans = [event for event in self.events if event["type"] == "span"]
+
+        summary = {}
+        for event in spans:
+            entry = summary.setdefault(
+                event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            duration_ms = event["duration_us"] / 1000
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+
+        for entry in summary.values():
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+        return summary
+
+    def write_json_lines(self, path) -> None:
+        """Writes one JSON object per event.
+
+        Args:
+            path (str): The path of the file to write.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        with open(f"{path}.tmp", "w", encoding="utf8") as file:
+            for event in events:
+                file.write(json.dumps(event) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+    def write_chrome_trace(self, path) -> None:
+        """Writes the events in the Trace Event Format of chrome://tracing and Perfetto.
+
+        Args:
+            path (str): The path of the file to write.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        trace_events = []
+        for event in events:
+            if event["type"] == "span":
+                trace_events.append(
+                    {
+                        "name": event["name"],
+                        "ph": "X",
+                        "ts": event["start_us"],
+                        "dur": event["duration_us"],
+                        "pid": event["pid"],
+                        "tid": event["tid"],
+                        "args": event["args"],
+                    }
+                )
+            else:
+                trace_events.append(
+                    {
+                        "name": event["name"],
+                        "ph": "C",
+                        "ts": event["start_us"],
+                        "pid": event["pid"],
+                        "args": {"value": event["value"]},
+                    }
+                )
+
+        with open(f"{path}.tmp", "w", encoding="utf8") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+        os.replace(f"{path}.tmp", path)
+
+    def save(self, path) -> None:
+        """Writes the trace in the format the file extension asks for.
+
+        Args:
+            path (str): The path of the file, ``.jsonl`` for JSON lines and
+                anything else for a Chrome trace.
+        """
+        if path.endswith(".jsonl"):
+            self.write_json_lines(path)
+        else:
+            self.write_chrome_trace(path)
+        logging.info(f"Wrote {len(self.events)} trace events to {path}")
+
+
+class _Span:
+    """Times the block it is entered for and records it on exit."""
+
+    __slots__ = ("_recorder", "_name", "_args", "_start")
+
+    def __init__(self, recorder, name, args) -> None:
+        self._recorder = recorder
+        self._name = name
+        self._args = args
+        self._start = None
+
+    def __enter__(self):
+        self._start = self._recorder.now_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._recorder.add_span(
+            self._name, self._start, self._recorder.now_us() - self._start, self._args
+        )
+        return False
+
+
+class _NullSpan:
+    """Stands in for a span while recording is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_recorder = None
+
+
+def enable(recorder=None) -> TraceRecorder:
+    """Starts recording spans and counters.
+
+    Args:
+        recorder (TraceRecorder, optional): The recorder to use, a new one by default.
+
+    Returns:
+        TraceRecorder: The active recorder.
+    """
+    global _recorder
+    _recorder = recorder or TraceRecorder()
+    return _recorder
+
+
+def disable() -> TraceRecorder:
+    """Stops recording.
+
+    Returns:
+        TraceRecorder: The recorder that was active, or None.
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def recorder() -> TraceRecorder:
+    """Returns the active recorder.
+
+    Returns:
+        TraceRecorder: The recorder, or None while recording is disabled.
+    """
+    return _recorder
+
+
+def span(name, **args):
+    """Returns a context manager that times the block it wraps.
+
+    While recording is disabled this returns a shared object whose enter and
+    exit do nothing, so instrumented code pays one function call.
+
+    Args:
+        name (str): The name of the span, e.g. ``split.export``.
+        **args: Extra fields describing the span.
+
+    Returns:
+        The context manager.
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, args)
+
+
+def interval(name, start, end, **args) -> None:
+    """Records a span that was timed elsewhere while recording is enabled.
+
+    Args:
+        name (str): The name of the span.
+        start (float): The ``time.perf_counter()`` value the span started at.
+        end (float): The ``time.perf_counter()`` value the span ended at.
+        **args: Extra fields describing the span.
+    """
+    if _recorder is not None:
+        _recorder.add_span(name, _recorder.timestamp_us(start), (end - start) * 1e6, args)
+
+
+def count(name, value=1) -> None:
+    """Adds to a counter while recording is enabled.
+
+    Args:
+        name (str): The name of the counter, e.g. ``cache.hits``.
+        value (float, optional): The amount to add.
+    """
+    if _recorder is not None:
+        _recorder.add_count(name, value)
+
+
+def _save_at_exit(path) -> None:
+    """Writes the trace of the main process when the program exits.
+
+    Args:
+        path (str): The path of the trace file.
+    """
+    # Worker processes import this module too and must not overwrite it.
+    if multiprocessing.parent_process() is None and _recorder is not None:
+        _recorder.save(path)
+
+
+if os.environ.get(TRACE_ENV):
+    enable()
+    atexit.register(_save_at_exit, os.environ[TRACE_ENV])
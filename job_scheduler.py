@@ -0,0 +1,442 @@
+import asyncio
+import functools
+import itertools
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Job priorities. Jobs with a lower value start first, equal ones in order.
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+# Job states, which are also the kinds of event sent to listeners.
+QUEUED = "queued"
+STARTED = "started"
+PROGRESS = "progress"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+DONE_STATES = (FINISHED, FAILED, CANCELLED)
+
+# Jobs run at the same time by the scheduler the GUI frames share.
+MAX_JOBS = 2
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``Job.report`` once the job was cancelled."""
+
+
+class JobEvent(NamedTuple):
+    """A change in the state or progress of a job.
+
+    Attributes:
+        job_id (int): The id of the job.
+        name (str): The name of the job.
+        group (str): The group the job was submitted in.
+        state (str): QUEUED, STARTED, PROGRESS, FINISHED, FAILED or CANCELLED.
+        text (str): A short description of what the job is doing.
+        done (int): The units of work done so far, if the job counts them.
+        total (int): The units of work in total, if the job knows them.
+        result: The return value of the job, for FINISHED events.
+        error (str): The error the job failed with, for FAILED events.
+        time (float): The ``time.perf_counter()`` value the event was sent at.
+    """
+
+    job_id: int
+    name: str
+    group: str
+    state: str
+    text: str = None
+    done: int = None
+    total: int = None
+    result: object = None
+    error: str = None
+    time: float = 0.0
+
+
+class Job:
+    """A unit of work queued on a JobScheduler.
+
+    Attributes:
+        job_id (int): The id of the job, unique per scheduler.
+        name (str): The name of the job shown in progress messages.
+        group (str): The group the job belongs to, e.g. ``split``.
+        priority (int): HIGH, NORMAL or LOW.
+        key: Jobs with the same key are never queued twice, e.g. an output folder.
+        in_process (bool): Whether the job runs in a worker process.
+        state (str): The current state of the job.
+        result: The return value of the job once it finished.
+        error (str): The error the job failed with.
+    """
+
+    def __init__(
+        self, scheduler, job_id, name, group, priority, key, in_process, function, args, kwargs
+    ) -> None:
+        """Initializes the Job.
+
+        Args:
+            scheduler (JobScheduler): The scheduler the job is queued on.
+            job_id (int): The id of the job.
+            name (str): The name of the job.
+            group (str): The group the job belongs to.
+            priority (int): HIGH, NORMAL or LOW.
+            key: The key duplicate jobs are recognized by, or None.
+            in_process (bool): Whether the job runs in a worker process.
+            function (callable): The work to run.
+            args (tuple): The arguments to pass to the function.
+            kwargs (dict): The keyword arguments to pass to the function.
+        """
+        self.job_id = job_id
+        self.name = name
+        self.group = group
+        self.priority = priority
+        self.key = key
+        self.in_process = in_process
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+
+        self._scheduler = scheduler
+        self._function = function
+        self._args = args
+        self._kwargs = kwargs
+        self._cancel = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        """bool: Whether the job finished, failed or was cancelled."""
+        return self.state in DONE_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        """bool: Whether the job was asked to stop."""
+        return self._cancel.is_set()
+
+    def report(self, text=None, done=None, total=None) -> None:
+        """Sends a progress event and stops the job if it was cancelled.
+
+        Jobs running in a thread should call this regularly, it is where
+        cancellation takes effect.
+
+        Args:
+            text (str, optional): A short description of what the job is doing.
+            done (int, optional): The units of work done so far.
+            total (int, optional): The units of work in total.
+
+        Raises:
+            JobCancelled: If the job was cancelled.
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+        self._scheduler._emit(self, PROGRESS, text=text, done=done, total=total)
+
+    def cancel(self) -> None:
+        """Cancels the job, see ``JobScheduler.cancel``."""
+        self._scheduler.cancel(self)
+
+    def __repr__(self) -> str:
+        return f"Job({self.job_id}, {self.name!r}, {self.state})"
+
+
+class JobScheduler:
+    """Runs jobs with bounded concurrency, priorities and cancellation.
+
+    An asyncio event loop on a background thread owns a priority queue and
+    ``max_jobs`` runner tasks, each of which takes the next job and awaits
+    it on a thread or process pool. Submitting and cancelling are safe from
+    any thread. Nothing here touches Tk: frames listen for JobEvents on a
+    queue and poll it with ``after``, the CLI blocks on it.
+
+    Jobs run in a thread by default and get their Job as first argument, so
+    they can report progress and notice cancellation through ``Job.report``.
+    Jobs submitted with ``in_process=True`` run in a worker process and are
+    called with their own arguments only; they can be cancelled until they
+    start.
+
+    Attributes:
+        max_jobs (int): The number of jobs run at the same time.
+    """
+
+    def __init__(self, max_jobs=MAX_JOBS) -> None:
+        """Initializes the JobScheduler and starts its event loop.
+
+        Args:
+            max_jobs (int, optional): The number of jobs run at the same time.
+        """
+        self.max_jobs = max_jobs
+
+        self._jobs = {}
+        self._listeners = []
+        self._ids = itertools.count(1)
+        # Held while a state changes and its event is sent, so listeners never
+        # see a job done before they got its last event.
+        self._lock = threading.RLock()
+        self._threads = ThreadPoolExecutor(max_jobs, thread_name_prefix="job")
+        self._processes = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="job-scheduler", daemon=True
+        )
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self) -> None:
+        """Creates the queue and the runner tasks inside the event loop."""
+        self._queue = asyncio.PriorityQueue()
+        self._runners = [asyncio.create_task(self._runner()) for _ in range(self.max_jobs)]
+
+    def submit(
+        self,
+        name,
+        function,
+        *args,
+        priority=NORMAL,
+        group=None,
+        key=None,
+        in_process=False,
+        **kwargs,
+    ) -> Job:
+        """Queues a job.
+
+        Args:
+            name (str): The name of the job shown in progress messages.
+            function (callable): The work to run. Unless ``in_process`` is set it is
+                called with the Job as first argument.
+            *args: The arguments to pass to the function.
+            priority (int, optional): HIGH, NORMAL or LOW.
+            group (str, optional): The group listeners can filter on.
+            key (optional): If an unfinished job with the same key exists, it is
+                returned instead of queueing another one.
+            in_process (bool, optional): Run the function in a worker process.
+                Its arguments and result must be picklable.
+            **kwargs: The keyword arguments to pass to the function.
+
+        Returns:
+            Job: The queued job.
+        """
+        with self._lock:
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and not job.done:
+                        logging.info(f"{name} is already queued as job {job.job_id}")
+                        return job
+
+            job = Job(
+                self,
+                next(self._ids),
+                name,
+                group,
+                priority,
+                key,
+                in_process,
+                function,
+                args,
+                kwargs,
+            )
+            self._jobs[job.job_id] = job
+            self._emit(job, QUEUED)
+
+        self._loop.call_soon_threadsafe(
+            self._queue.put_nowait, (priority, job.job_id, job)
+        )
+        return job
+
+    def cancel(self, job) -> None:
+        """Cancels a job.
+
+        A queued job never starts. A running job in a thread stops the next
+        time it reports progress; one in a worker process runs to the end.
+
+        Args:
+            job (Job): The job to cancel.
+        """
+        with self._lock:
+            if job.done:
+                return
+            job._cancel.set()
+            if job.state == QUEUED:
+                # The runner that takes it off the queue skips it.
+                job.state = CANCELLED
+                del self._jobs[job.job_id]
+                self._emit(job, CANCELLED)
+                return
+
+        if job.in_process:
+            logging.info(f"{job.name} runs in a worker process and cannot be stopped")
+
+    def cancel_all(self, group=None) -> None:
+        """Cancels every unfinished job.
+
+        Args:
+            group (str, optional): Only cancel the jobs of this group.
+        """
+        for job in self.jobs(group):
+            self.cancel(job)
+
+    def jobs(self, group=None) -> list:
+        """Returns the unfinished jobs.
+
+        Args:
+            group (str, optional): Only return the jobs of this group.
+
+        Returns:
+            list: The jobs, in the order they were submitted.
+        """
+        with self._lock:
+            return [
+                job
+                for job in self._jobs.values()
+                if not job.done and (group is None or job.group == group)
+            ]
+
+    def listen(self, group=None) -> queue.Queue:
+        """Returns a queue that receives the events of every job from now on.
+
+        Args:
+            group (str, optional): Only send the events of this group.
+
+        Returns:
+            queue.Queue: The queue of JobEvents.
+        """
+        events = queue.Queue()
+        with self._lock:
+            self._listeners.append((group, events))
+        return events
+
+    def drain(self, events, group=None):
+        """Yields events from a listener queue until no job is left.
+
+        Args:
+            events (queue.Queue): A queue returned by ``listen``.
+            group (str, optional): Only wait for the jobs of this group.
+
+        Yields:
+            JobEvent: The next event.
+        """
+        while True:
+            try:
+                yield events.get(timeout=0.2)
+            except queue.Empty:
+                if not self.jobs(group):
+                    return
+
+    def shutdown(self) -> None:
+        """Cancels every job and stops the event loop.
+
+        Running thread jobs stop at their next progress report. The process
+        pool is waited for, so its management thread is gone before the
+        interpreter tears down; jobs still queued there are dropped.
+        """
+        self.cancel_all()
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=True, cancel_futures=True)
+
+    async def _stop(self) -> None:
+        """Stops the runner tasks, then the event loop."""
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        asyncio.get_running_loop().call_soon(asyncio.get_running_loop().stop)
+
+    def _emit(self, job, state, **fields) -> None:
+        """Sends an event to every listener of the job's group.
+
+        Args:
+            job (Job): The job the event is about.
+            state (str): The kind of event.
+            **fields: The other JobEvent fields.
+        """
+        event = JobEvent(
+            job.job_id, job.name, job.group, state, time=time.perf_counter(), **fields
+        )
+        with self._lock:
+            for group, events in self._listeners:
+                if group is None or group == job.group:
+                    events.put(event)
+
+    async def _runner(self) -> None:
+        """Runs queued jobs one at a time, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            with self._lock:
+                if job.state != QUEUED:
+                    continue
+                job.state = STARTED
+                self._emit(job, STARTED)
+
+            try:
+                if job.in_process:
+                    if self._processes is None:
+                        self._processes = ProcessPoolExecutor(
+                            self.max_jobs, initializer=_ignore_interrupts
+                        )
+                    call = functools.partial(job._function, *job._args, **job._kwargs)
+                    result = await loop.run_in_executor(self._processes, call)
+                else:
+                    call = functools.partial(job._function, job, *job._args, **job._kwargs)
+                    result = await loop.run_in_executor(self._threads, call)
+            except JobCancelled:
+                logging.info(f"Cancelled {job.name}")
+                self._finish(job, CANCELLED)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as error:
+                # Includes KeyboardInterrupt, which would otherwise stop the loop.
+                logging.error(f"{job.name} failed: {error!r}")
+                self._finish(job, FAILED, error=repr(error))
+            else:
+                self._finish(job, FINISHED, result=result)
+
+    def _finish(self, job, state, result=None, error=None) -> None:
+        """Records how a job ended and tells the listeners.
+
+        Args:
+            job (Job): The job that ended.
+            state (str): FINISHED, FAILED or CANCELLED.
+            result (optional): The return value of the job.
+            error (str, optional): The error the job failed with.
+        """
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.state = state
+            # The scheduler only needs to remember unfinished jobs.
+            del self._jobs[job.job_id]
+            self._emit(job, state, result=result, error=error)
+
+
+def _ignore_interrupts() -> None:
+    """Makes a worker process ignore Ctrl+C, the main process cancels its jobs."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> JobScheduler:
+    """Returns the scheduler the GUI frames share, creating it on first use.
+
+    Returns:
+        JobScheduler: The shared scheduler.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = JobScheduler()
+        return _shared
@@ -0,0 +1,372 @@
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from itertools import combinations
+from typing import NamedTuple
+import numpy as np
+from classification_journal import ClassificationJournal
+from file_controller import sidecar_path
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Sidecar sub-folder holding the session plan, the delta files and the conflicts.
+SESSIONS_FOLDER = "sessions"
+_PLAN = "plan.json"
+_CONFLICTS = "conflicts.csv"
+
+
+class Conflict(NamedTuple):
+    """A file the annotators gave different labels without a majority.
+
+    Attributes:
+        file_name (str): The full name of the file.
+        votes (dict): Maps each annotator who labelled the file to the label.
+    """
+
+    file_name: str
+    votes: dict
+
+
+class MergeResult(NamedTuple):
+    """The outcome of merging the session deltas into the CSV file.
+
+    Attributes:
+        rows (int): The number of files in the CSV file.
+        labelled (int): The number of files at least one annotator labelled.
+        updated (int): The number of files whose classification changed.
+        conflicts (list): The Conflict of every file left unchanged for lack
+            of a majority.
+        conflicts_path (str): The path of the conflict report, None without conflicts.
+        agreement (dict): The agreement statistics of ``agreement_stats``.
+        seconds (float): The wall time of the merge.
+    """
+
+    rows: int
+    labelled: int
+    updated: int
+    conflicts: list
+    conflicts_path: str
+    agreement: dict
+    seconds: float
+
+
+def check_annotator(annotator) -> str:
+    """Checks that an annotator name can be used as a file name.
+
+    Args:
+        annotator (str): The name.
+
+    Returns:
+        str: The name.
+
+    Raises:
+        ValueError: If the name is empty or holds other characters than
+            letters, digits, ``_``, ``-`` and ``.``, or starts with a dot.
+    """
+    if not re.fullmatch(r"[\w-][\w.-]*", annotator or ""):
+        raise ValueError(f"Annotator name {annotator!r} must be a plain file name")
+    return annotator
+
+
+def delta_path(folder, annotator) -> str:
+    """Returns the path of the label delta file of an annotator.
+
+    Args:
+        folder (str): The path to the audio folder.
+        annotator (str): The annotator.
+
+    Returns:
+        str: The path.
+    """
+    return sidecar_path(folder, SESSIONS_FOLDER, f"{check_annotator(annotator)}.csv")
+
+
+def read_plan(folder):
+    """Reads the session plan of a folder.
+
+    Args:
+        folder (str): The path to the audio folder.
+
+    Returns:
+        dict: The annotators, the overlap and the files assigned to every
+            annotator, or None if the folder has no sessions.
+    """
+    try:
+        with open(
+            sidecar_path(folder, SESSIONS_FOLDER, _PLAN), "r", encoding="utf8"
+        ) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def plan_sessions(folder, annotators, overlap=0.0, seed=0) -> dict:
+    """Splits the files of a folder between annotators and writes the plan.
+
+    Files are dealt out in name order, so every annotator gets a slice
+    spread over the whole folder. A random ``overlap`` fraction of the files
+    is also given to the next annotator, which is what agreement is measured
+    on. The CSV file is created first if the folder has none yet, so the
+    sessions never race to create it.
+
+    Args:
+        folder (str): The path to the audio folder.
+        annotators (list): The names of the annotators.
+        overlap (float, optional): The fraction of files labelled twice, 0 for
+            disjoint slices.
+        seed (int, optional): The seed picking the overlapping files.
+
+    Returns:
+        dict: The plan, as written to the sessions folder.
+    """
+    from csv_controller import CSVController
+
+    annotators = [check_annotator(annotator) for annotator in annotators]
+    if len(set(annotators)) != len(annotators) or not annotators:
+        raise ValueError(f"Expected distinct annotators, got {annotators}")
+    if len(annotators) == 1:
+        overlap = 0.0
+
+    controller = CSVController()
+    controller.open_folder(folder)
+    names = controller.folder_files.names.tolist()
+    controller.close()
+
+    shared = np.random.default_rng(seed).random(len(names)) < overlap
+    assignments = {annotator: [] for annotator in annotators}
+    for index, name in enumerate(names):
+        owner = index % len(annotators)
+        assignments[annotators[owner]].append(name)
+        if shared[index]:
+            assignments[annotators[(owner + 1) % len(annotators)]].append(name)
+
+    plan = {"annotators": annotators, "overlap": overlap, "assignments": assignments}
+    path = sidecar_path(folder, SESSIONS_FOLDER, _PLAN)
+    with open(f"{path}.tmp", "w", encoding="utf8") as file:
+        json.dump(plan, file)
+    os.replace(f"{path}.tmp", path)
+
+    logging.info(
+        f"Planned sessions of {len(names)} files in {folder} for {len(annotators)} "
+        f"annotators, {int(shared.sum())} files shared"
+    )
+    return plan
+
+
+def cohen_kappa(first, second):
+    """Computes Cohen's kappa of two annotators over the same files.
+
+    Args:
+        first (list): The labels of the first annotator.
+        second (list): The labels of the second annotator, in the same order.
+
+    Returns:
+        float: The kappa, 1.0 if both used one and the same label throughout,
+            or None without any files.
+    """
+    if not len(first):
+        return None
+
+    categories, codes = np.unique(np.concatenate([first, second]), return_inverse=True)
+    first_codes, second_codes = codes[: len(first)], codes[len(first) :]
+    observed = np.mean(first_codes == second_codes)
+    expected = np.dot(
+        np.bincount(first_codes, minlength=len(categories)),
+        np.bincount(second_codes, minlength=len(categories)),
+    ) / len(first) ** 2
+
+    if expected == 1:
+        return 1.0
+    return float((observed - expected) / (1 - expected))
+
+
+def agreement_stats(deltas) -> dict:
+    """Measures how often the annotators agree on the files they share.
+
+    Args:
+        deltas (dict): Maps annotators to a dict of file names and labels.
+
+    Returns:
+        dict: ``pairs`` maps ``"first/second"`` to the number of shared files,
+            the fraction labelled the same and Cohen's kappa. ``shared`` is the
+            number of files labelled by two or more annotators and ``unanimous``
+            the fraction of those that all of them labelled the same.
+    """
+    pairs = {}
+    for first, second in combinations(sorted(deltas), 2):
+        shared = [name for name in deltas[first] if name in deltas[second]]
+        first_labels = [deltas[first][name] for name in shared]
+        second_labels = [deltas[second][name] for name in shared]
+        pairs[f"{first}/{second}"] = {
+            "files": len(shared),
+            "agreement": (
+                float(np.mean(np.array(first_labels) == np.array(second_labels)))
+                if shared
+                else None
+            ),
+            "kappa": cohen_kappa(first_labels, second_labels),
+        }
+
+    votes = Counter()
+    unanimous = Counter()
+    labels = {}
+    for delta in deltas.values():
+        for name, label in delta.items():
+            votes[name] += 1
+            if labels.setdefault(name, label) == label:
+                unanimous[name] += 1
+
+    shared = [name for name, count in votes.items() if count > 1]
+    return {
+        "pairs": pairs,
+        "shared": len(shared),
+        "unanimous": (
+            sum(unanimous[name] == votes[name] for name in shared) / len(shared)
+            if shared
+            else None
+        ),
+    }
+
+
+def read_delta(folder, annotator) -> dict:
+    """Reads the labels an annotator gave.
+
+    Args:
+        folder (str): The path to the audio folder.
+        annotator (str): The annotator.
+
+    Returns:
+        dict: Maps file names to the last label the annotator gave them. Files
+            whose label was cleared again are left out.
+    """
+    labels = dict(ClassificationJournal(delta_path(folder, annotator)).replay())
+    return {name: label for name, label in labels.items() if label}
+
+
+def merge_sessions(folder) -> MergeResult:
+    """Merges the label deltas of every annotator into the CSV file of a folder.
+
+    The deltas are read once and the CSV rows are walked once, so the merge
+    is linear in the number of rows and edits. A file takes the label a
+    strict majority of the annotators who labelled it gave; files without a
+    majority keep their classification and are listed in ``conflicts.csv``
+    in the sessions folder. The CSV file is replaced atomically, after the
+    edits still in its journal are applied, and the deltas are kept, so
+    merging again after more labelling is safe.
+
+    Sessions only append to their own delta file and can keep running, but
+    a single-writer session on the folder would overwrite the merge.
+
+    Args:
+        folder (str): The path to the audio folder.
+
+    Returns:
+        MergeResult: The counts, conflicts and agreement statistics.
+    """
+    start = time.perf_counter()
+    plan = read_plan(folder)
+    if plan is None:
+        raise FileNotFoundError(f"No session plan in {folder}")
+
+    deltas = {annotator: read_delta(folder, annotator) for annotator in plan["annotators"]}
+
+    csv_names = sorted(name for name in os.listdir(folder) if name.endswith(".csv"))
+    if not csv_names:
+        raise FileNotFoundError(f"No csv file in {folder}")
+    csv_path = f"{folder}/{csv_names[0]}"
+    with open(csv_path, "r", encoding="utf8", newline="") as csvfile:
+        rows = list(csv.reader(csvfile))
+
+    journal = ClassificationJournal(f"{csv_path}.journal")
+    pending = dict(journal.replay())
+
+    labelled = 0
+    updated = 0
+    conflicts = []
+    for row in rows[1:]:
+        if len(row) < 2:
+            continue
+        if row[0] in pending:
+            row[1] = pending[row[0]]
+
+        votes = {
+            annotator: delta[row[0]] for annotator, delta in deltas.items() if row[0] in delta
+        }
+        if not votes:
+            continue
+
+        labelled += 1
+        label, count = Counter(votes.values()).most_common(1)[0]
+        if count * 2 <= len(votes):
+            conflicts.append(Conflict(row[0], votes))
+        elif row[1] != label:
+            row[1] = label
+            updated += 1
+
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf8",
+        newline="",
+        dir=folder,
+        prefix=".",
+        suffix=".csv.tmp",
+        delete=False,
+    ) as csvfile:
+        csv.writer(csvfile).writerows(rows)
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+    os.replace(csvfile.name, csv_path)
+    journal.truncate()
+
+    conflicts_path = _write_conflicts(folder, plan["annotators"], conflicts)
+    result = MergeResult(
+        rows=len(rows) - 1,
+        labelled=labelled,
+        updated=updated,
+        conflicts=conflicts,
+        conflicts_path=conflicts_path,
+        agreement=agreement_stats(deltas),
+        seconds=time.perf_counter() - start,
+    )
+    logging.info(
+        f"Merged {len(deltas)} sessions into {csv_path}: {updated} updated, "
+        f"{len(conflicts)} conflicts in {result.seconds:.2f} s"
+    )
+    return result
+
+
+def _write_conflicts(folder, annotators, conflicts):
+    """Writes the conflict report, or removes an old one when there are none.
+
+    Args:
+        folder (str): The path to the audio folder.
+        annotators (list): The annotators, one column each.
+        conflicts (list): The Conflict of every unresolved file.
+
+    Returns:
+        str: The path of the report, or None without conflicts.
+    """
+    path = sidecar_path(folder, SESSIONS_FOLDER, _CONFLICTS)
+    if not conflicts:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+
+    with open(f"{path}.tmp", "w", encoding="utf8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["file_name", *annotators])
+        for conflict in conflicts:
+            writer.writerow(
+                [conflict.file_name, *(conflict.votes.get(name, "") for name in annotators)]
+            )
+    os.replace(f"{path}.tmp", path)
+    return path
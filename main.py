@@ -2,6 +2,7 @@ import logging
 from tkinter import Tk, ttk, Frame
 from classify_audio_chunks import ClassifyAudioChunks
 from audio_chunk_generator import AudioChunkGenerator
+from job_scheduler import shared_scheduler
 
 
 logging.basicConfig(
@@ -77,6 +78,7 @@ class MainApplication(Tk):
 
             frame.grid(row=0, column=0, sticky="nsew")
         self.show_frame(MainPage)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         logging.info("MainApplication initialized successfully")
 
     def show_frame(self, controller) -> None:
@@ -89,6 +91,13 @@ class MainApplication(Tk):
         frame = self.frames[controller]
         frame.tkraise()
 
+    def on_close(self) -> None:
+        """Saves pending classifications, cancels background jobs and closes the window."""
+        logging.info("Closing MainApplication")
+        self.frames[ClassifyAudioChunks].close()
+        shared_scheduler().shutdown()
+        self.destroy()
+
 
 class MainPage(Frame):
     """The main page of the Audio Crop application."""
@@ -109,5 +118,6 @@ class MainPage(Frame):
         logging.info("MainPage initialized successfully")
 
 
-app = MainApplication()
-app.mainloop()
+if __name__ == "__main__":
+    app = MainApplication()
+    app.mainloop()
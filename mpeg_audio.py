@@ -0,0 +1,141 @@
+from typing import NamedTuple
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Bitrates in kbit/s, indexed by [MPEG-1][layer][bitrate index].
+_BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+
+# Sample rates in Hz, indexed by the version bits of the frame header.
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# Offset of a VBRI header in the first frame, which is fixed unlike Xing's.
+_VBRI_OFFSET = 36
+
+
+class MpegFrame(NamedTuple):
+    """The fields of an MPEG audio frame header.
+
+    Attributes:
+        mpeg1 (bool): Whether the frame is MPEG-1 rather than MPEG-2 or 2.5.
+        layer (int): The layer, 1 to 3.
+        bitrate (int): The bitrate in bit/s.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+        samples (int): The number of samples per channel in the frame.
+        size (int): The length of the frame in bytes, header included.
+    """
+
+    mpeg1: bool
+    layer: int
+    bitrate: int
+    frame_rate: int
+    channels: int
+    samples: int
+    size: int
+
+
+def parse_frame_header(header):
+    """Parses a four-byte MPEG audio frame header.
+
+    Args:
+        header (bytes): The four header bytes.
+
+    Returns:
+        MpegFrame: The parsed header, or None if the bytes are not a valid header.
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    channel_mode = header[3] >> 6
+
+    # Version 1 is reserved, bitrate 0 is free format.
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1][layer][bitrate_index] * 1000
+    frame_rate = _SAMPLE_RATES[version][rate_index]
+
+    if layer == 1:
+        samples = 384
+        size = (12 * bitrate // frame_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        size = (samples // 8) * bitrate // frame_rate + padding
+
+    channels = 1 if channel_mode == 3 else 2
+    return MpegFrame(mpeg1, layer, bitrate, frame_rate, channels, samples, size)
+
+
+def id3v2_size(header) -> int:
+    """Returns the size of an ID3v2 tag at the start of a file, 0 if there is none.
+
+    Args:
+        header (bytes): The first ten bytes of the file.
+
+    Returns:
+        int: The size of the tag including its header and footer.
+    """
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def side_info_size(frame) -> int:
+    """Returns the size of the Layer III side information after the frame header.
+
+    Args:
+        frame (MpegFrame): The frame.
+
+    Returns:
+        int: The size in bytes, where a Xing or Info header starts after the
+            four header bytes.
+    """
+    if frame.mpeg1:
+        return 17 if frame.channels == 1 else 32
+    return 9 if frame.channels == 1 else 17
+
+
+def info_tag(frame, data):
+    """Returns the kind of VBR header a frame holds instead of audio.
+
+    Args:
+        frame (MpegFrame): The parsed header of the frame.
+        data (bytes): The frame, from its header on.
+
+    Returns:
+        bytes: ``b"Xing"``, ``b"Info"`` or ``b"VBRI"``, or None for an audio frame.
+    """
+    xing = 4 + side_info_size(frame)
+    if data[xing : xing + 4] in (b"Xing", b"Info"):
+        return bytes(data[xing : xing + 4])
+    if data[_VBRI_OFFSET : _VBRI_OFFSET + 4] == b"VBRI":
+        return b"VBRI"
+    return None
@@ -0,0 +1,427 @@
+import os
+import struct
+import threading
+from typing import NamedTuple
+import numpy as np
+from pydub import AudioSegment
+from audio_stream import read_wav_header
+from digest_memo import digest_of
+import instrumentation
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Set to the folder of the shared cache, or to "off" to decode every time.
+CACHE_ENV = "AUDIOCLASSIFIER_PCM_CACHE"
+
+# Set to the size cap of the shared cache in MiB.
+CACHE_SIZE_ENV = "AUDIOCLASSIFIER_PCM_CACHE_MB"
+
+DEFAULT_CACHE_MB = 4096
+
+# Magic, sample rate, channels and sample width in front of the samples of an entry.
+_HEADER = struct.Struct("<4sIHH")
+_MAGIC = b"PCM1"
+
+
+class PCMAudio(NamedTuple):
+    """Decoded audio, memory-mapped from a cache entry or read into memory.
+
+    Attributes:
+        data (memoryview): The raw PCM data, laid out as pydub holds it in memory.
+        sample_width (int): The number of bytes per sample.
+        frame_rate (int): The sample rate in Hz.
+        channels (int): The number of audio channels.
+    """
+
+    data: memoryview
+    sample_width: int
+    frame_rate: int
+    channels: int
+
+    def segment(self) -> AudioSegment:
+        """Wraps the samples in an AudioSegment without copying them.
+
+        Returns:
+            AudioSegment: The audio.
+        """
+        return AudioSegment(
+            data=self.data,
+            sample_width=self.sample_width,
+            frame_rate=self.frame_rate,
+            channels=self.channels,
+        )
+
+
+def default_cache_folder() -> str:
+    """Returns the folder of the shared cache in the user's cache directory.
+
+    Returns:
+        str: The path.
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "audioclassifier", "pcm")
+
+
+def _map(path, offset, size) -> memoryview:
+    """Memory-maps part of a file read-only.
+
+    Args:
+        path (str): The path to the file.
+        offset (int): The byte offset to map from.
+        size (int): The number of bytes to map.
+
+    Returns:
+        memoryview: The mapped bytes.
+    """
+    if size <= 0:
+        return memoryview(b"")
+    return memoryview(np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(size,)))
+
+
+class PCMEntryWriter:
+    """Writes the samples of a cache entry as they are decoded.
+
+    The entry only appears in the cache once it is committed, so a decode
+    that fails or is abandoned halfway leaves nothing behind.
+    """
+
+    def __init__(self, cache, path, sample_width, frame_rate, channels) -> None:
+        """Initializes the PCMEntryWriter and opens its temporary file.
+
+        Args:
+            cache (PCMCache): The cache the entry belongs to.
+            path (str): The path of the entry.
+            sample_width (int): The number of bytes per sample.
+            frame_rate (int): The sample rate in Hz.
+            channels (int): The number of audio channels.
+        """
+        self._cache = cache
+        self._path = path
+        self._temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(self._temporary, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, frame_rate, channels, sample_width))
+
+    def write(self, data) -> None:
+        """Appends samples to the entry.
+
+        Args:
+            data (bytes): The raw PCM data.
+        """
+        self._file.write(data)
+
+    def commit(self) -> PCMAudio:
+        """Adds the entry to the cache.
+
+        Returns:
+            PCMAudio: The samples, memory-mapped from the entry.
+        """
+        self._file.close()
+        os.replace(self._temporary, self._path)
+        audio = self._cache._read_entry(self._path)
+        self._cache._added(os.path.getsize(self._path))
+        return audio
+
+    def discard(self) -> None:
+        """Drops the samples written so far."""
+        self._file.close()
+        if os.path.exists(self._temporary):
+            os.remove(self._temporary)
+
+
+class PCMCache:
+    """On-disk cache of decoded audio shared by every stage and process.
+
+    Entries are keyed by the SHA-256 of the source file and the format the
+    audio was converted to, so a file is decoded at most once per format
+    wherever it is copied or moved. Every entry is a raw PCM file behind a
+    small header and is memory-mapped when read, so the samples are never
+    copied into memory. Reading an entry touches its mtime; once the
+    entries exceed ``max_bytes`` the least recently used ones are removed.
+
+    Only entries are mapped: they are replaced whole and never truncated.
+    A source file may be rewritten in place while its samples are in use,
+    and reading a mapped page that was cut off kills the process, so PCM WAV
+    files whose samples pydub would not convert are read into memory
+    instead, without decoding and without an entry.
+
+    Attributes:
+        folder (str): The folder of the entries, None to keep nothing on disk.
+        max_bytes (int): The largest total size of the entries.
+        hits (int): The number of reads served from an entry.
+        misses (int): The number of reads that had to decode the file.
+        evictions (int): The number of entries removed to stay within budget.
+    """
+
+    def __init__(self, folder=None, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024) -> None:
+        """Initializes the PCMCache.
+
+        Args:
+            folder (str, optional): The folder of the entries, None to keep nothing on disk.
+            max_bytes (int, optional): The largest total size of the entries.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._size = None
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        """Returns the cache counters.
+
+        Returns:
+            dict: The hit, miss and eviction counts.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _entry_path(self, file_path, target) -> str:
+        """Returns the path of the entry of a file in a format.
+
+        The content hash comes from the digest memo of the file's folder, so
+        an unchanged file is not read again to hash it.
+
+        Args:
+            file_path (str): The path to the audio file.
+            target (tuple): The sample rate, channels and sample width the audio
+                is converted to, None for the audio as decoded.
+
+        Returns:
+            str: The path.
+        """
+        digest = digest_of(file_path)
+        tag = "native" if target is None else "{}hz-{}ch-{}b".format(*target)
+        return os.path.join(self.folder, digest[:2], f"{digest}-{tag}.pcm")
+
+    @staticmethod
+    def _read_entry(path) -> PCMAudio:
+        """Maps the samples of an entry.
+
+        Args:
+            path (str): The path of the entry.
+
+        Returns:
+            PCMAudio: The samples, or None if the file is not a complete entry.
+        """
+        with open(path, "rb") as file:
+            header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+
+        magic, frame_rate, channels, sample_width = _HEADER.unpack(header)
+        size = os.path.getsize(path) - _HEADER.size
+        if magic != _MAGIC or size % (sample_width * channels):
+            return None
+        return PCMAudio(_map(path, _HEADER.size, size), sample_width, frame_rate, channels)
+
+    def lookup(self, file_path, target=None):
+        """Returns the decoded audio of a file if it can be read without decoding.
+
+        Args:
+            file_path (str): The path to the audio file.
+            target (tuple, optional): The sample rate, channels and sample width
+                to convert to, the audio as decoded by default.
+
+        Returns:
+            PCMAudio: The samples, or None.
+        """
+        if file_path.lower().endswith(".wav"):
+            header = read_wav_header(file_path)
+            # pydub converts 8 and 24-bit samples when it loads them.
+            if header is not None and header.sample_width in (2, 4):
+                native = (header.frame_rate, header.channels, header.sample_width)
+                if target is None or tuple(target) == native:
+                    frame_width = header.channels * header.sample_width
+                    with open(file_path, "rb") as wav_file:
+                        wav_file.seek(header.data_offset)
+                        data = wav_file.read(header.data_size - header.data_size % frame_width)
+                    return PCMAudio(
+                        memoryview(data)[: len(data) - len(data) % frame_width],
+                        header.sample_width,
+                        header.frame_rate,
+                        header.channels,
+                    )
+
+        if self.folder is None:
+            return None
+
+        path = self._entry_path(file_path, target)
+        try:
+            audio = self._read_entry(path)
+            os.utime(path)
+        except OSError:
+            audio = None
+        if audio is None:
+            return None
+
+        with self._lock:
+            self.hits += 1
+        instrumentation.count("pcm_cache.hits")
+        return audio
+
+    def writer(self, file_path, sample_width, frame_rate, channels, target=None):
+        """Starts an entry that is filled while a file is decoded elsewhere.
+
+        Args:
+            file_path (str): The path to the audio file.
+            sample_width (int): The number of bytes per sample of the decoded audio.
+            frame_rate (int): The sample rate in Hz.
+            channels (int): The number of audio channels.
+            target (tuple, optional): The format the audio was converted to.
+
+        Returns:
+            PCMEntryWriter: The writer, or None if nothing is kept on disk.
+        """
+        if self.folder is None:
+            return None
+        return PCMEntryWriter(
+            self, self._entry_path(file_path, target), sample_width, frame_rate, channels
+        )
+
+    def load(self, file_path, target=None, file_format=None) -> PCMAudio:
+        """Returns the decoded audio of a file, decoding and caching it on a miss.
+
+        A converted format is made from the audio as decoded, which is read
+        from the cache too, so converting to another format does not decode
+        the file again.
+
+        Args:
+            file_path (str): The path to the audio file.
+            target (tuple, optional): The sample rate, channels and sample width
+                to convert to, the audio as decoded by default.
+            file_format (str, optional): The format of the file, guessed by ffmpeg
+                by default.
+
+        Returns:
+            PCMAudio: The samples.
+        """
+        audio = self.lookup(file_path, target)
+        if audio is not None:
+            return audio
+
+        with self._lock:
+            self.misses += 1
+        instrumentation.count("pcm_cache.misses")
+
+        with instrumentation.span("pcm_cache.decode", file=file_path, target=str(target)):
+            if target is None:
+                segment = AudioSegment.from_file(file_path, file_format)
+            else:
+                frame_rate, channels, sample_width = target
+                segment = (
+                    self.load(file_path, file_format=file_format)
+                    .segment()
+                    .set_channels(channels)
+                    .set_frame_rate(frame_rate)
+                    .set_sample_width(sample_width)
+                )
+
+        writer = self.writer(
+            file_path, segment.sample_width, segment.frame_rate, segment.channels, target
+        )
+        if writer is None:
+            return PCMAudio(
+                memoryview(segment.raw_data),
+                segment.sample_width,
+                segment.frame_rate,
+                segment.channels,
+            )
+
+        try:
+            writer.write(segment.raw_data)
+        except BaseException:
+            writer.discard()
+            raise
+        return writer.commit()
+
+    def segment(self, file_path, target=None, file_format=None) -> AudioSegment:
+        """Returns the decoded audio of a file as an AudioSegment.
+
+        The segment's data is a memoryview of the samples: slicing it
+        copies nothing, and ``raw_data`` is not ``bytes``. ``other + segment``
+        works as is; ``segment + other`` needs a segment of
+        ``bytes(segment.raw_data)`` first.
+
+        Args:
+            file_path (str): The path to the audio file.
+            target (tuple, optional): The sample rate, channels and sample width
+                to convert to, the audio as decoded by default.
+            file_format (str, optional): The format of the file, guessed by ffmpeg
+                by default.
+
+        Returns:
+            AudioSegment: The audio.
+        """
+        return self.load(file_path, target, file_format).segment()
+
+    def _added(self, size) -> None:
+        """Accounts for a new entry and evicts entries once over budget.
+
+        The total size is measured once per process and then kept up to
+        date, so the folder is only listed again when it may be full.
+
+        Args:
+            size (int): The size of the new entry in bytes.
+        """
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+                if self._size <= self.max_bytes:
+                    return
+
+            entries = []
+            for shard in os.scandir(self.folder):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".pcm"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            self._size = sum(entry[1] for entry in entries)
+            if self._size <= self.max_bytes:
+                return
+
+            # Evict down to 90% so the next few entries do not list the folder again.
+            entries.sort()
+            for _, entry_size, path in entries:
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._size -= entry_size
+                self.evictions += 1
+
+        logging.info(f"PCM cache at {self.folder}: {self._size} bytes after eviction")
+
+
+_shared = None
+
+
+def shared_cache() -> PCMCache:
+    """Returns the cache every stage of this process reads decoded audio from.
+
+    Its folder and size come from ``CACHE_ENV`` and ``CACHE_SIZE_ENV``, so
+    worker processes share the cache of the process that started them.
+
+    Returns:
+        PCMCache: The cache.
+    """
+    global _shared
+    if _shared is None:
+        folder = os.environ.get(CACHE_ENV) or default_cache_folder()
+        if folder.lower() == "off":
+            folder = None
+        megabytes = int(os.environ.get(CACHE_SIZE_ENV) or DEFAULT_CACHE_MB)
+        _shared = PCMCache(folder, megabytes * 1024 * 1024)
+    return _shared
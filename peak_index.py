@@ -0,0 +1,267 @@
+import json
+import os
+import numpy as np
+from file_controller import FileController, sidecar_path
+from silence_detection import samples_from_buffer, max_possible_amplitude
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Samples per bin of each resolution, finest first.
+LEVELS = (256, 2048, 16384)
+
+_MANIFEST = "peaks.json"
+
+
+def compute_envelopes(segment, levels=LEVELS) -> np.ndarray:
+    """Computes min/max/RMS envelopes of a segment at several resolutions.
+
+    Channels are mixed together: a bin holds the lowest and highest sample
+    of any channel and the RMS of all of them, scaled to [-1, 1].
+
+    Args:
+        segment (AudioSegment): The decoded audio.
+        levels (tuple, optional): The number of frames per bin of each resolution.
+
+    Returns:
+        np.ndarray: A float16 array of shape (bins, 3) with the bins of every
+            level one after the other.
+    """
+    samples = samples_from_buffer(segment.raw_data, segment.sample_width)
+    frames = samples.reshape(-1, segment.channels).astype(np.float32)
+    frames /= max_possible_amplitude(segment.sample_width)
+
+    envelopes = []
+    for frames_per_bin in levels:
+        bins = -(-len(frames) // frames_per_bin)
+        padded = np.zeros((bins * frames_per_bin, segment.channels), dtype=np.float32)
+        padded[: len(frames)] = frames
+        padded = padded.reshape(bins, -1)
+
+        envelope = np.empty((bins, 3), dtype=np.float32)
+        envelope[:, 0] = padded.min(axis=1)
+        envelope[:, 1] = padded.max(axis=1)
+        envelope[:, 2] = np.sqrt(np.mean(np.square(padded), axis=1))
+        envelopes.append(envelope)
+
+    if not envelopes:
+        return np.zeros((0, 3), dtype=np.float16)
+    return np.concatenate(envelopes).astype(np.float16)
+
+
+class PeakIndex:
+    """Reads the waveform envelopes of a folder without decoding any audio.
+
+    Every file has its own ``.npy`` file in the sidecar folder, which is
+    memory-mapped when read, and ``peaks.json`` records where each level
+    starts in it.
+
+    Attributes:
+        folder (str): The path to the audio folder.
+        entries (dict): Maps file names to their size, mtime, frame count and levels.
+    """
+
+    def __init__(self, folder) -> None:
+        """Initializes the PeakIndex and reads its manifest.
+
+        Args:
+            folder (str): The path to the audio folder.
+        """
+        self.folder = folder
+        self.entries = {}
+
+        try:
+            with open(self._manifest_path(), "r", encoding="utf8") as manifest:
+                self.entries = json.load(manifest)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _manifest_path(self) -> str:
+        """Returns the path of the manifest.
+
+        Returns:
+            str: The path.
+        """
+        return sidecar_path(self.folder, "peaks", _MANIFEST)
+
+    def _peaks_path(self, file_name) -> str:
+        """Returns the path of the envelopes of a file.
+
+        Args:
+            file_name (str): The full name of the audio file.
+
+        Returns:
+            str: The path.
+        """
+        return sidecar_path(self.folder, "peaks", f"{file_name}.npy")
+
+    def envelope(self, file_name, width):
+        """Returns an envelope of a file with at most ``width`` columns.
+
+        The coarsest level with at least ``width`` bins is memory-mapped and
+        its bins are merged down to ``width`` columns.
+
+        Args:
+            file_name (str): The full name of the audio file.
+            width (int): The number of columns to draw.
+
+        Returns:
+            np.ndarray: A float32 array of shape (columns, 3) holding the minimum,
+                maximum and RMS of each column, or None if the file is not indexed.
+        """
+        entry = self.entries.get(file_name)
+        if entry is None or width <= 0:
+            return None
+
+        try:
+            peaks = np.load(self._peaks_path(file_name), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        levels = entry["levels"]
+        offset, count = levels[0][1], levels[0][2]
+        for _, level_offset, level_count in levels:
+            if level_count >= width:
+                offset, count = level_offset, level_count
+
+        if not count:
+            return np.zeros((0, 3), dtype=np.float32)
+
+        level = np.asarray(peaks[offset : offset + count], dtype=np.float32)
+        starts = np.unique(np.linspace(0, count, num=min(width, count), endpoint=False).astype(int))
+
+        columns = np.empty((len(starts), 3), dtype=np.float32)
+        columns[:, 0] = np.minimum.reduceat(level[:, 0], starts)
+        columns[:, 1] = np.maximum.reduceat(level[:, 1], starts)
+        sizes = np.diff(np.append(starts, count))
+        columns[:, 2] = np.sqrt(np.add.reduceat(np.square(level[:, 2]), starts) / sizes)
+
+        return columns
+
+    def save(self) -> None:
+        """Atomically writes the manifest."""
+        path = self._manifest_path()
+        with open(f"{path}.tmp", "w", encoding="utf8") as manifest:
+            json.dump(self.entries, manifest)
+        os.replace(f"{path}.tmp", path)
+
+
+class PeakIndexBuilder:
+    """Builds and updates the peak index of a folder.
+
+    Only files that are new or whose size or mtime changed since the last
+    build are decoded, and entries of deleted files are dropped.
+
+    Attributes:
+        folder (str): The path to the audio folder.
+        levels (tuple): The number of frames per bin of each resolution.
+        index (PeakIndex): The index being built.
+        done (bool): Whether ``build`` has finished.
+    """
+
+    def __init__(self, folder, levels=LEVELS) -> None:
+        """Initializes the PeakIndexBuilder.
+
+        Args:
+            folder (str): The path to the audio folder.
+            levels (tuple, optional): The number of frames per bin of each resolution.
+        """
+        self.folder = folder
+        self.levels = tuple(levels)
+        self.index = PeakIndex(folder)
+        self.done = False
+
+    def build(self, on_progress=None) -> int:
+        """Brings the index up to date with the folder.
+
+        Args:
+            on_progress (callable, optional): Called before each audio file
+                with a status text and the number of files done so far, e.g.
+                ``Job.report``. An exception it raises stops the build.
+
+        Returns:
+            int: The number of files that were (re)indexed.
+        """
+        try:
+            return self._build(on_progress)
+        finally:
+            self.done = True
+
+    def _build(self, on_progress) -> int:
+        """Indexes new and changed files and drops deleted ones.
+
+        Args:
+            on_progress (callable): Called before each audio file, or None.
+
+        Returns:
+            int: The number of files that were (re)indexed.
+        """
+        present = set()
+        updated = 0
+
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                audio = FileController(f"{self.folder}/{entry.name}")
+                if not audio.is_audio_file or not entry.is_file():
+                    continue
+
+                if on_progress is not None:
+                    on_progress(f"Indexing peaks... {len(present)} files", done=len(present))
+                present.add(entry.name)
+                stat = entry.stat()
+                known = self.index.entries.get(entry.name)
+                if (
+                    known is not None
+                    and known["size"] == stat.st_size
+                    and known["mtime"] == stat.st_mtime
+                    and tuple(level[0] for level in known["levels"]) == self.levels
+                ):
+                    continue
+
+                try:
+                    self._index_file(audio, stat)
+                except Exception as error:
+                    logging.warning(f"Could not index peaks of {entry.name}: {error!r}")
+                    continue
+                updated += 1
+
+        for file_name in set(self.index.entries) - present:
+            del self.index.entries[file_name]
+            path = self.index._peaks_path(file_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.index.save()
+        logging.info(f"Peak index of {self.folder}: {updated} of {len(present)} files updated")
+        return updated
+
+    def _index_file(self, audio, stat) -> None:
+        """Computes and stores the envelopes of one file.
+
+        Args:
+            audio (FileController): The audio file.
+            stat (os.stat_result): The stat of the file when it was listed.
+        """
+        segment = audio.load_audio()
+        peaks = compute_envelopes(segment, self.levels)
+
+        levels = []
+        offset = 0
+        frame_count = int(segment.frame_count())
+        for frames_per_bin in self.levels:
+            count = -(-frame_count // frames_per_bin)
+            levels.append([frames_per_bin, offset, count])
+            offset += count
+
+        np.save(self.index._peaks_path(audio.file_name_full), peaks)
+        self.index.entries[audio.file_name_full] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "frames": frame_count,
+            "frame_rate": segment.frame_rate,
+            "levels": levels,
+        }
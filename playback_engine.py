@@ -0,0 +1,425 @@
+import queue
+import threading
+import time
+import logging
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Length of the blocks written to streaming backends, in milliseconds.
+BLOCK_MS = 20
+
+
+class NullBackend:
+    """Audio backend that discards samples, for running without a sound card.
+
+    Attributes:
+        streaming (bool): Always True, samples are written block by block.
+        realtime (bool): Whether writes take as long as the audio they hold.
+        bytes_written (int): The number of bytes written since creation.
+        opened (int): The number of times an output stream was (re)opened.
+    """
+
+    streaming = True
+
+    def __init__(self, realtime=False) -> None:
+        """Initializes the NullBackend.
+
+        Args:
+            realtime (bool, optional): Whether writes take as long as the audio they hold.
+        """
+        self.realtime = realtime
+        self.bytes_written = 0
+        self.opened = 0
+        self._format = None
+
+    def open(self, sample_width, frame_rate, channels) -> None:
+        """Prepares the output for the given sample format.
+
+        Args:
+            sample_width (int): The number of bytes per sample.
+            frame_rate (int): The sample rate in Hz.
+            channels (int): The number of audio channels.
+        """
+        if self._format != (sample_width, frame_rate, channels):
+            self._format = (sample_width, frame_rate, channels)
+            self.opened += 1
+
+    def write(self, data) -> None:
+        """Consumes a block of samples.
+
+        Args:
+            data (bytes): Raw PCM data in the format passed to ``open``.
+        """
+        self.bytes_written += len(data)
+        if self.realtime:
+            sample_width, frame_rate, channels = self._format
+            time.sleep(len(data) / (sample_width * frame_rate * channels))
+
+    def stop(self) -> None:
+        """Drops any queued samples. Nothing is queued, so this does nothing."""
+
+    def close(self) -> None:
+        """Releases the output."""
+        self._format = None
+
+
+class PyAudioBackend:
+    """Audio backend that keeps one PyAudio output stream open across clips.
+
+    The stream is only reopened when a clip has a different sample format
+    than the previous one.
+
+    Attributes:
+        streaming (bool): Always True, samples are written block by block.
+    """
+
+    streaming = True
+
+    def __init__(self) -> None:
+        """Initializes the PyAudioBackend."""
+        self._audio = pyaudio.PyAudio()
+        self._stream = None
+        self._format = None
+
+    def open(self, sample_width, frame_rate, channels) -> None:
+        """Makes sure the output stream matches the given sample format.
+
+        Args:
+            sample_width (int): The number of bytes per sample.
+            frame_rate (int): The sample rate in Hz.
+            channels (int): The number of audio channels.
+        """
+        if self._format == (sample_width, frame_rate, channels):
+            return
+
+        self.close()
+        self._stream = self._audio.open(
+            format=self._audio.get_format_from_width(sample_width),
+            channels=channels,
+            rate=frame_rate,
+            output=True,
+            frames_per_buffer=max(1, frame_rate * BLOCK_MS // 1000),
+        )
+        self._format = (sample_width, frame_rate, channels)
+
+    def write(self, data) -> None:
+        """Writes a block of samples, blocking until the stream accepts it.
+
+        Args:
+            data (bytes): Raw PCM data in the format passed to ``open``.
+        """
+        self._stream.write(data)
+
+    def stop(self) -> None:
+        """Keeps the stream open. Blocks are short, so nothing needs flushing."""
+
+    def close(self) -> None:
+        """Closes the output stream."""
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+            self._format = None
+
+
+class SimpleAudioBackend:
+    """Audio backend built on simpleaudio, used when PyAudio is not installed.
+
+    simpleaudio cannot keep a stream open, so each clip is handed over as a
+    whole. The playback engine still serializes every call on its own thread.
+
+    Attributes:
+        streaming (bool): Always False, clips are played as a whole.
+    """
+
+    streaming = False
+
+    def __init__(self) -> None:
+        """Initializes the SimpleAudioBackend."""
+        self._playback = None
+
+    def play(self, data, sample_width, frame_rate, channels) -> None:
+        """Starts playing a clip.
+
+        Args:
+            data (bytes): Raw PCM data of the clip.
+            sample_width (int): The number of bytes per sample.
+            frame_rate (int): The sample rate in Hz.
+            channels (int): The number of audio channels.
+        """
+        self.stop()
+        self._playback = simpleaudio.play_buffer(
+            data,
+            bytes_per_sample=sample_width,
+            sample_rate=frame_rate,
+            num_channels=channels,
+        )
+
+    def is_playing(self) -> bool:
+        """Returns whether the last clip is still playing.
+
+        Returns:
+            bool: True while the clip plays.
+        """
+        return self._playback is not None and self._playback.is_playing()
+
+    def stop(self) -> None:
+        """Stops the current clip."""
+        if self._playback is not None:
+            self._playback.stop()
+            self._playback = None
+
+    def close(self) -> None:
+        """Stops the current clip."""
+        self.stop()
+
+
+def create_backend():
+    """Returns the best available audio backend.
+
+    Returns:
+        PyAudioBackend, SimpleAudioBackend or NullBackend: The backend.
+    """
+    if pyaudio is not None:
+        return PyAudioBackend()
+    if simpleaudio is not None:
+        return SimpleAudioBackend()
+
+    logging.warning("Neither pyaudio nor simpleaudio is installed, audio is muted")
+    return NullBackend(realtime=True)
+
+
+class PlaybackEngine:
+    """Plays audio on one long-lived worker thread driven by a command queue.
+
+    ``play``, ``stop`` and ``seek`` only enqueue a command and return at
+    once, so fast key presses never pile up threads or race each other: the
+    worker handles the commands in order and a new ``play`` simply replaces
+    the current clip.
+
+    Attributes:
+        backend: The audio backend samples are written to.
+        on_first_sample (callable): Called with the latency in seconds from the
+            play request to the first sample reaching the backend.
+        latencies (list): Every measured latency in seconds.
+    """
+
+    def __init__(self, backend=None, on_first_sample=None) -> None:
+        """Initializes the PlaybackEngine and starts its worker thread.
+
+        Args:
+            backend (optional): The audio backend, the best available one by default.
+            on_first_sample (callable, optional): Called with each measured latency.
+        """
+        self.backend = backend if backend is not None else create_backend()
+        self.on_first_sample = on_first_sample
+        self.latencies = []
+
+        self._commands = queue.Queue()
+        self._segment = None
+        self._position = 0
+        self._request_time = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def play(self, source, request_time=None) -> None:
+        """Replaces the current clip and starts playing from the beginning.
+
+        Args:
+            source (AudioSegment or callable): The audio to play, or a function that
+                returns it. A function is called on the worker thread, so a slow
+                decode does not block the caller.
+            request_time (float, optional): The ``time.perf_counter()`` value of the
+                key press that asked for playback, now by default.
+        """
+        if request_time is None:
+            request_time = time.perf_counter()
+        self._idle.clear()
+        self._commands.put(("play", source, request_time))
+
+    def stop(self) -> None:
+        """Stops the current clip."""
+        self._commands.put(("stop",))
+
+    def seek(self, position_ms) -> None:
+        """Moves the playback position of the current clip.
+
+        Args:
+            position_ms (int): The new position in milliseconds.
+        """
+        self._commands.put(("seek", position_ms))
+
+    def wait(self, timeout=None) -> bool:
+        """Waits until the current clip has finished or was stopped.
+
+        Args:
+            timeout (float, optional): The longest time to wait in seconds.
+
+        Returns:
+            bool: True if playback is idle.
+        """
+        return self._idle.wait(timeout)
+
+    def close(self) -> None:
+        """Stops playback and the worker thread, then releases the backend."""
+        self._commands.put(("close",))
+        self._thread.join()
+        self.backend.close()
+
+    def _run(self) -> None:
+        """Handles commands and feeds the backend until closed."""
+        while True:
+            if self._segment is None:
+                command = self._commands.get()
+            elif self.backend.streaming:
+                command = self._next_command(timeout=0)
+            else:
+                # Wait for the clip to end, waking up for new commands.
+                command = self._next_command(timeout=BLOCK_MS / 1000)
+
+            if command is not None:
+                commands = [command] + self._drain()
+                if any(command[0] == "close" for command in commands):
+                    self.backend.stop()
+                    return
+
+                # Only the last play or stop matters when keys are mashed.
+                last = max(
+                    (i for i, command in enumerate(commands) if command[0] in ("play", "stop")),
+                    default=0,
+                )
+                for command in commands[last:]:
+                    self._handle(command)
+            elif self.backend.streaming:
+                self._write_block()
+            elif not self.backend.is_playing():
+                self._finish()
+
+    def _drain(self) -> list:
+        """Returns every command that is already queued.
+
+        Returns:
+            list: The queued commands, oldest first.
+        """
+        commands = []
+        while True:
+            try:
+                commands.append(self._commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def _next_command(self, timeout):
+        """Returns the next queued command, if one arrives in time.
+
+        Args:
+            timeout (float): The longest time to wait in seconds.
+
+        Returns:
+            tuple: The command, or None if there was none.
+        """
+        try:
+            if timeout:
+                return self._commands.get(timeout=timeout)
+            return self._commands.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _handle(self, command) -> None:
+        """Applies a play, stop or seek command.
+
+        Args:
+            command (tuple): The command name followed by its arguments.
+        """
+        name = command[0]
+
+        if name == "play":
+            _, source, request_time = command
+            self.backend.stop()
+            try:
+                segment = source() if callable(source) else source
+            except Exception as error:
+                logging.error(f"Could not load audio for playback: {error!r}")
+                self._finish()
+                return
+
+            self._segment = segment
+            self._position = 0
+            self._request_time = request_time
+            self._idle.clear()
+
+            if self.backend.streaming:
+                self.backend.open(segment.sample_width, segment.frame_rate, segment.channels)
+            else:
+                self._start_clip()
+
+        elif name == "stop":
+            self.backend.stop()
+            self._finish()
+
+        elif name == "seek" and self._segment is not None:
+            frame_width = self._segment.frame_width
+            frame = int(command[1] * self._segment.frame_rate / 1000)
+            self._position = min(frame * frame_width, len(self._segment.raw_data))
+            if not self.backend.streaming:
+                self._start_clip()
+
+    def _start_clip(self) -> None:
+        """Hands the rest of the current clip to a non-streaming backend."""
+        segment = self._segment
+        self.backend.play(
+            segment.raw_data[self._position :],
+            segment.sample_width,
+            segment.frame_rate,
+            segment.channels,
+        )
+        self._report_first_sample()
+
+    def _write_block(self) -> None:
+        """Writes the next block of the current clip to a streaming backend."""
+        segment = self._segment
+        data = segment.raw_data
+        block_bytes = max(1, segment.frame_rate * BLOCK_MS // 1000) * segment.frame_width
+
+        if self._position >= len(data):
+            self._finish()
+            return
+
+        self.backend.write(data[self._position : self._position + block_bytes])
+        self._position += block_bytes
+        self._report_first_sample()
+
+    def _report_first_sample(self) -> None:
+        """Records the latency of the current clip once its first samples are out."""
+        if self._request_time is None:
+            return
+
+        latency = time.perf_counter() - self._request_time
+        self._request_time = None
+        self.latencies.append(latency)
+
+        if self.on_first_sample is not None:
+            self.on_first_sample(latency)
+
+    def _finish(self) -> None:
+        """Marks playback as idle."""
+        self._segment = None
+        self._position = 0
+        self._request_time = None
+        self._idle.set()
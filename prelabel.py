@@ -0,0 +1,179 @@
+import time
+from typing import NamedTuple
+import numpy as np
+from feature_extraction import FeatureExtractor
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+class PreLabelResult(NamedTuple):
+    """The outcome of pre-labeling a folder.
+
+    Attributes:
+        labeled (int): The number of labeled clips the model was fitted on.
+        predictions (dict): Maps unlabeled file names to ``(classification, confidence)``.
+        seconds (float): The wall time spent, including feature extraction.
+    """
+
+    labeled: int
+    predictions: dict
+    seconds: float
+
+
+def clip_embeddings(features) -> np.ndarray:
+    """Summarizes variable-length feature matrices as fixed-size vectors.
+
+    Args:
+        features (list): A (frames, coefficients) array per clip.
+
+    Returns:
+        np.ndarray: The per-coefficient mean and standard deviation of each clip,
+            of shape (clips, 2 * coefficients).
+    """
+    return np.stack(
+        [np.concatenate([clip.mean(axis=0), clip.std(axis=0)]) for clip in features]
+    ).astype(np.float64)
+
+
+class NearestCentroid:
+    """Classifies embeddings by the closest class mean after standardization.
+
+    The confidence of a prediction is the softmax of the negative squared
+    distances to every centroid, scaled by the average squared distance of
+    the training clips to their own centroid, so it does not depend on the
+    number of dimensions.
+
+    Attributes:
+        classes (list): The labels, in centroid order.
+        centroids (np.ndarray): The standardized class means.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an unfitted NearestCentroid."""
+        self.classes = []
+        self.centroids = None
+        self._mean = None
+        self._scale = None
+        self._spread = 1.0
+
+    def fit(self, embeddings, labels) -> "NearestCentroid":
+        """Computes the class centroids.
+
+        Args:
+            embeddings (np.ndarray): The training embeddings, one row per clip.
+            labels (list): The label of each row.
+
+        Returns:
+            NearestCentroid: The fitted model.
+        """
+        self._mean = embeddings.mean(axis=0)
+        self._scale = embeddings.std(axis=0)
+        self._scale[self._scale == 0] = 1.0
+        standardized = (embeddings - self._mean) / self._scale
+
+        self.classes = sorted(set(labels))
+        classes = np.searchsorted(self.classes, labels)
+        counts = np.bincount(classes, minlength=len(self.classes))
+        sums = np.zeros((len(self.classes), embeddings.shape[1]))
+        np.add.at(sums, classes, standardized)
+        self.centroids = sums / counts[:, None]
+
+        spread = np.square(standardized - self.centroids[classes]).sum(axis=1).mean()
+        self._spread = spread if spread > 0 else 1.0
+        return self
+
+    def predict(self, embeddings):
+        """Predicts the label of every row in one batch.
+
+        Args:
+            embeddings (np.ndarray): The embeddings, one row per clip.
+
+        Returns:
+            tuple: The predicted labels and their confidence in [0, 1].
+        """
+        standardized = (embeddings - self._mean) / self._scale
+        distances = (
+            np.square(standardized).sum(axis=1)[:, None]
+            - 2 * standardized @ self.centroids.T
+            + np.square(self.centroids).sum(axis=1)[None, :]
+        )
+
+        logits = -distances / (2 * self._spread)
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        best = probabilities.argmax(axis=1)
+        return [self.classes[i] for i in best], probabilities[np.arange(len(best)), best]
+
+
+class PreLabeler:
+    """Predicts labels for the unlabeled clips of a folder from the labeled ones.
+
+    MFCCs come from the feature cache, so after the first run pre-labeling
+    takes as long as fitting the centroids, which is a few matrix operations.
+
+    Attributes:
+        folder (str): The path to the classified folder.
+        extractor (FeatureExtractor): The source of the clip features.
+    """
+
+    def __init__(self, folder, params=None, workers=None) -> None:
+        """Initializes the PreLabeler.
+
+        Args:
+            folder (str): The path to the classified folder.
+            params (FeatureParams, optional): The feature parameters.
+            workers (int, optional): The number of processes computing features.
+        """
+        self.folder = folder
+        self.extractor = FeatureExtractor(folder, params, workers)
+
+    def run(self, csv_controller=None) -> PreLabelResult:
+        """Fits the model and predicts every unlabeled clip.
+
+        Args:
+            csv_controller (CSVController, optional): The open controller of the folder,
+                which the predictions are written through.
+
+        Returns:
+            PreLabelResult: The predictions.
+        """
+        start = time.perf_counter()
+        features = self.extractor.extract("mfcc", classified_only=False)
+
+        labeled = [name for name, (label, _) in features.items() if label]
+        unlabeled = [name for name, (label, _) in features.items() if not label]
+        if not labeled or not unlabeled:
+            logging.info(
+                f"Nothing to pre-label in {self.folder}: {len(labeled)} labeled, "
+                f"{len(unlabeled)} unlabeled clips"
+            )
+            return PreLabelResult(len(labeled), {}, time.perf_counter() - start)
+
+        model = NearestCentroid().fit(
+            clip_embeddings([features[name][1] for name in labeled]),
+            [features[name][0] for name in labeled],
+        )
+        labels, confidences = model.predict(
+            clip_embeddings([features[name][1] for name in unlabeled])
+        )
+        predictions = {
+            name: (label, float(confidence))
+            for name, label, confidence in zip(unlabeled, labels, confidences)
+        }
+
+        if csv_controller is not None:
+            csv_controller.set_predictions(predictions)
+
+        result = PreLabelResult(len(labeled), predictions, time.perf_counter() - start)
+        logging.info(
+            f"Pre-labeled {len(predictions)} clips in {self.folder} from {len(labeled)} "
+            f"labeled clips and {len(model.classes)} classes in {result.seconds:.2f} s"
+        )
+        return result
@@ -0,0 +1,430 @@
+import numpy as np
+from audio_metadata import AudioInfo
+from cut_list import CutFileController
+from file_controller import FileController
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Label id of the files that have no classification yet.
+UNLABELED = 0
+
+
+class FenwickTree:
+    """Counts over positions with O(log n) updates, prefix sums and rank lookups.
+
+    Attributes:
+        size (int): The number of positions.
+        total (int): The sum over all positions.
+    """
+
+    def __init__(self, counts) -> None:
+        """Builds the tree from the count of every position in O(n).
+
+        Args:
+            counts (np.ndarray): The initial count of every position.
+        """
+        self.size = len(counts)
+        prefix = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(counts, out=prefix[1:])
+
+        # Node i covers the positions (i - lowbit(i), i].
+        nodes = np.arange(1, self.size + 1)
+        self._tree = np.zeros(self.size + 1, dtype=np.int32)
+        self._tree[1:] = prefix[nodes] - prefix[nodes - (nodes & -nodes)]
+        self.total = int(prefix[-1])
+
+    def add(self, position, delta) -> None:
+        """Adds to the count of a position.
+
+        Args:
+            position (int): The 0-based position.
+            delta (int): The amount to add.
+        """
+        node = position + 1
+        while node <= self.size:
+            self._tree[node] += delta
+            node += node & -node
+        self.total += delta
+
+    def prefix(self, end) -> int:
+        """Returns the sum over the positions before ``end``.
+
+        Args:
+            end (int): The 0-based position to stop before.
+
+        Returns:
+            int: The sum.
+        """
+        total = 0
+        node = end
+        while node > 0:
+            total += int(self._tree[node])
+            node -= node & -node
+        return total
+
+    def find(self, rank) -> int:
+        """Returns the position at which the prefix sum reaches ``rank``.
+
+        Args:
+            rank (int): The 1-based rank, at most ``total``.
+
+        Returns:
+            int: The 0-based position.
+        """
+        node = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            following = node + step
+            if following <= self.size and self._tree[following] < rank:
+                node = following
+                rank -= int(self._tree[following])
+            step >>= 1
+        return node
+
+
+class QueueModel:
+    """The audio files of a folder in parallel arrays, in the order they are labelled.
+
+    Nothing is kept per file but a few array elements: FileController objects
+    are only built for the files that are played or written out. Items are
+    numbered in file name order; the queue order is a permutation of them.
+    For every label that is navigated by, a Fenwick tree over the queue
+    positions counts the items with that label, so moving to the next or
+    previous item with a label takes O(log n) whatever the folder size.
+
+    Attributes:
+        folder (str): The path to the folder.
+        names (np.ndarray): The full file name of every item.
+        durations (np.ndarray): The duration in seconds, NaN where it is unknown.
+        frame_rates (np.ndarray): The sample rate in Hz, 0 where it is unknown.
+        channels (np.ndarray): The number of channels, 0 where it is unknown.
+        starts_ms (np.ndarray): The start of a cut list chunk in its source,
+            -1 for files on disk.
+        ends_ms (np.ndarray): The end of a cut list chunk in its source.
+        source (str): The source file of the cut list chunks, None without any.
+        labels (list): The label names; the id of a label is its index.
+        label_ids (np.ndarray): The label id of every item.
+        order (np.ndarray): The items in queue order.
+    """
+
+    def __init__(
+        self,
+        folder,
+        names,
+        durations,
+        frame_rates,
+        channels,
+        starts_ms=None,
+        ends_ms=None,
+        source=None,
+    ) -> None:
+        """Initializes the QueueModel with every item unlabelled, in name order.
+
+        Args:
+            folder (str): The path to the folder.
+            names (list): The full file names, sorted by name.
+            durations (list): The duration of every file in seconds, NaN where unknown.
+            frame_rates (list): The sample rate of every file, 0 where unknown.
+            channels (list): The number of channels of every file, 0 where unknown.
+            starts_ms (list, optional): The start of every cut list chunk, -1 for
+                files on disk. All files are on disk when omitted.
+            ends_ms (list, optional): The end of every cut list chunk, -1 for files on disk.
+            source (str, optional): The source file of the cut list chunks.
+        """
+        self.folder = folder
+        self.names = np.array(names, dtype=str)
+        self.durations = np.array(durations, dtype=np.float64)
+        self.frame_rates = np.array(frame_rates, dtype=np.int32)
+        self.channels = np.array(channels, dtype=np.int16)
+        count = len(self.names)
+        if starts_ms is None:
+            starts_ms = ends_ms = np.full(count, -1)
+        self.starts_ms = np.array(starts_ms, dtype=np.int64)
+        self.ends_ms = np.array(ends_ms, dtype=np.int64)
+        self.source = source
+
+        self.labels = [""]
+        self._label_index = {"": UNLABELED}
+        self.label_ids = np.zeros(count, dtype=np.int32)
+
+        self.order = np.arange(count)
+        self._positions = np.arange(count)
+        self._name_order = np.argsort(self.names, kind="stable")
+        self._trees = {}
+
+    def __len__(self) -> int:
+        """Returns the number of items.
+
+        Returns:
+            int: The number of items.
+        """
+        return len(self.names)
+
+    def select(self, items) -> "QueueModel":
+        """Builds a model of some of the items, unlabelled and in name order.
+
+        Args:
+            items (list): The items to keep.
+
+        Returns:
+            QueueModel: The new model.
+        """
+        items = np.sort(np.asarray(items, dtype=np.int64))
+        return QueueModel(
+            self.folder,
+            self.names[items],
+            self.durations[items],
+            self.frame_rates[items],
+            self.channels[items],
+            self.starts_ms[items],
+            self.ends_ms[items],
+            self.source,
+        )
+
+    def path(self, item) -> str:
+        """Returns the path of an item.
+
+        Args:
+            item (int): The item.
+
+        Returns:
+            str: The path the file has, or would have once its chunk is exported.
+        """
+        return f"{self.folder}/{self.names[item]}"
+
+    def file(self, item) -> FileController:
+        """Builds the FileController of an item.
+
+        Args:
+            item (int): The item.
+
+        Returns:
+            FileController: A CutFileController for a chunk of the cut list.
+        """
+        info = None
+        if self.frame_rates[item]:
+            info = AudioInfo(
+                float(self.durations[item]), int(self.frame_rates[item]), int(self.channels[item])
+            )
+
+        if self.starts_ms[item] < 0:
+            return FileController(self.path(item), info)
+        return CutFileController(
+            self.path(item),
+            self.source,
+            int(self.starts_ms[item]),
+            int(self.ends_ms[item]),
+            info.frame_rate,
+            info.channels,
+        )
+
+    def files(self):
+        """Builds the FileController of every item, one at a time, in name order.
+
+        Yields:
+            FileController: The file of the next item.
+        """
+        for item in range(len(self)):
+            yield self.file(item)
+
+    def find(self, file_name):
+        """Looks an item up by file name in O(log n).
+
+        Args:
+            file_name (str): The full file name.
+
+        Returns:
+            int: The item, or None if the folder has no such file.
+        """
+        found = np.searchsorted(self.names, file_name, sorter=self._name_order)
+        if found < len(self) and self.names[self._name_order[found]] == file_name:
+            return int(self._name_order[found])
+        return None
+
+    def label_id(self, label) -> int:
+        """Returns the id of a label, adding it if it is new.
+
+        Args:
+            label (str): The label, "" for no label.
+
+        Returns:
+            int: The id.
+        """
+        label_id = self._label_index.get(label)
+        if label_id is None:
+            label_id = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def label(self, item) -> str:
+        """Returns the label of an item.
+
+        Args:
+            item (int): The item.
+
+        Returns:
+            str: The label, "" if the item is unlabelled.
+        """
+        return self.labels[self.label_ids[item]]
+
+    def set_label(self, item, label) -> None:
+        """Changes the label of an item and the trees that count either label.
+
+        Args:
+            item (int): The item.
+            label (str): The new label, "" for none.
+        """
+        old = int(self.label_ids[item])
+        new = self.label_id(label or "")
+        if old == new:
+            return
+
+        self.label_ids[item] = new
+        position = int(self._positions[item])
+        if old in self._trees:
+            self._trees[old].add(position, -1)
+        if new in self._trees:
+            self._trees[new].add(position, 1)
+
+    def set_labels(self, labels) -> None:
+        """Replaces the labels of all items.
+
+        Args:
+            labels (dict): Maps file names to their label. Items of files that
+                are missing are unlabelled.
+        """
+        self.label_ids[:] = [
+            self.label_id(labels.get(name) or "") for name in self.names.tolist()
+        ]
+        self._trees = {}
+
+    def label_counts(self) -> dict:
+        """Counts the items of every label.
+
+        Returns:
+            dict: Maps the labels in use, including "", to their number of items.
+        """
+        counts = np.bincount(self.label_ids, minlength=len(self.labels))
+        return {label: int(count) for label, count in zip(self.labels, counts) if count}
+
+    def order_by(self, keys=None) -> None:
+        """Reorders the queue.
+
+        Args:
+            keys (np.ndarray, optional): A sort key per item; items with equal keys
+                stay in name order. The queue is in name order when omitted.
+        """
+        if keys is None:
+            self.order = np.arange(len(self))
+        else:
+            self.order = np.argsort(np.asarray(keys), kind="stable")
+        self._positions = np.empty(len(self), dtype=np.int64)
+        self._positions[self.order] = np.arange(len(self))
+        self._trees = {}
+
+    def item_at(self, position) -> int:
+        """Returns the item at a queue position.
+
+        Args:
+            position (int): The 0-based queue position.
+
+        Returns:
+            int: The item.
+        """
+        return int(self.order[position])
+
+    def position_of(self, item) -> int:
+        """Returns the queue position of an item.
+
+        Args:
+            item (int): The item.
+
+        Returns:
+            int: The 0-based queue position.
+        """
+        return int(self._positions[item])
+
+    def _tree(self, label) -> FenwickTree:
+        """Returns the tree counting a label over the queue positions, building it once.
+
+        Args:
+            label (str): The label.
+
+        Returns:
+            FenwickTree: The tree.
+        """
+        label_id = self.label_id(label)
+        tree = self._trees.get(label_id)
+        if tree is None:
+            tree = FenwickTree(self.label_ids[self.order] == label_id)
+            self._trees[label_id] = tree
+        return tree
+
+    def count(self, label=None) -> int:
+        """Returns the number of items with a label.
+
+        Args:
+            label (str, optional): The label, "" for the unlabelled items. All
+                items count when omitted.
+
+        Returns:
+            int: The number of items.
+        """
+        if label is None:
+            return len(self)
+        return self._tree(label).total
+
+    def next_position(self, position, label=None):
+        """Returns the first queue position after ``position`` with a label.
+
+        Args:
+            position (int): The 0-based queue position, -1 to search from the start.
+            label (str, optional): The label, "" for unlabelled items. Any item
+                matches when omitted.
+
+        Returns:
+            int: The 0-based queue position, or None if there is none.
+        """
+        if label is None:
+            return position + 1 if position + 1 < len(self) else None
+
+        tree = self._tree(label)
+        rank = tree.prefix(position + 1) + 1
+        return tree.find(rank) if rank <= tree.total else None
+
+    def previous_position(self, position, label=None):
+        """Returns the last queue position before ``position`` with a label.
+
+        Args:
+            position (int): The 0-based queue position.
+            label (str, optional): The label, "" for unlabelled items. Any item
+                matches when omitted.
+
+        Returns:
+            int: The 0-based queue position, or None if there is none.
+        """
+        if label is None:
+            return position - 1 if position > 0 else None
+
+        tree = self._tree(label)
+        rank = tree.prefix(position)
+        return tree.find(rank) if rank else None
+
+    def rank(self, position, label=None) -> int:
+        """Returns how many items with a label come up to and including a position.
+
+        Args:
+            position (int): The 0-based queue position.
+            label (str, optional): The label. Any item counts when omitted.
+
+        Returns:
+            int: The number of items.
+        """
+        if label is None:
+            return position + 1
+        return self._tree(label).prefix(position + 1)
@@ -0,0 +1,82 @@
+import argparse
+import sys
+from label_sessions import merge_sessions, plan_sessions
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parses the command line.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Share a folder between several annotators and merge their labels."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="Split the files of a folder between annotators.")
+    plan.add_argument("folder", help="The folder holding the clips.")
+    plan.add_argument("annotators", nargs="+", help="The names of the annotators.")
+    plan.add_argument(
+        "--overlap",
+        type=float,
+        default=0.0,
+        help="Fraction of files also given to a second annotator (default: 0).",
+    )
+    plan.add_argument("--seed", type=int, default=0, help="Seed picking the shared files.")
+
+    merge = commands.add_parser("merge", help="Merge the labels of every annotator.")
+    merge.add_argument("folder", help="The folder holding the clips and csv file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Plans the sessions of a folder or merges them and prints a summary.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        int: The exit code, non-zero if the merge left conflicts.
+    """
+    args = parse_args(argv)
+
+    if args.command == "plan":
+        plan = plan_sessions(args.folder, args.annotators, args.overlap, args.seed)
+        for annotator, names in plan["assignments"].items():
+            print(f"{annotator}: {len(names)} files")
+        return 0
+
+    result = merge_sessions(args.folder)
+    print(
+        f"Merged labels of {result.labelled} of {result.rows} files: {result.updated} "
+        f"updated, {len(result.conflicts)} conflicts in {result.seconds:.2f} s"
+    )
+    for pair, stats in result.agreement["pairs"].items():
+        if stats["files"]:
+            print(
+                f"  {pair}: {stats['files']} shared, {stats['agreement']:.1%} agree, "
+                f"kappa {stats['kappa']:.3f}"
+            )
+    if result.agreement["shared"]:
+        print(
+            f"  {result.agreement['unanimous']:.1%} of {result.agreement['shared']} "
+            "shared files labelled the same by everyone"
+        )
+    if result.conflicts_path:
+        print(f"Conflicts written to {result.conflicts_path}")
+    return 1 if result.conflicts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
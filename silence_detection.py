@@ -0,0 +1,342 @@
+import itertools
+import numpy as np
+from pydub.utils import db_to_float
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Number of window starts evaluated per vectorized block.
+BLOCK_MS = 60000
+
+_SAMPLE_TYPES = {1: np.int8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+
+def samples_from_buffer(data, sample_width) -> np.ndarray:
+    """Views raw PCM data as an array of interleaved samples.
+
+    Args:
+        data (bytes): Raw PCM data in the layout pydub uses in memory.
+        sample_width (int): The number of bytes per sample.
+
+    Returns:
+        np.ndarray: The samples, without copying the data.
+    """
+    return np.frombuffer(data, dtype=_SAMPLE_TYPES[sample_width])
+
+
+def max_possible_amplitude(sample_width) -> float:
+    """Returns the largest absolute sample value, as pydub defines it.
+
+    Args:
+        sample_width (int): The number of bytes per sample.
+
+    Returns:
+        float: The maximum amplitude.
+    """
+    return (2 ** (sample_width * 8)) / 2
+
+
+def rms_to_dbfs(rms, sample_width) -> np.ndarray:
+    """Converts RMS amplitudes to dBFS.
+
+    Args:
+        rms (np.ndarray): RMS amplitudes as returned by window_rms.
+        sample_width (int): The number of bytes per sample.
+
+    Returns:
+        np.ndarray: The levels in dBFS, -inf where the RMS is zero.
+    """
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(rms / max_possible_amplitude(sample_width))
+
+
+def window_rms(
+    samples,
+    channels,
+    frame_rate,
+    starts_ms,
+    window_ms,
+    first_frame=0,
+    total_frames=None,
+) -> np.ndarray:
+    """Computes the RMS of fixed-length windows with a cumulative sum.
+
+    The frame boundaries, the silent padding past the end of the audio and
+    the truncation of the result match ``AudioSegment[start:end].rms``, so
+    the values are identical to pydub's for 8 and 16-bit audio.
+
+    Args:
+        samples (np.ndarray): Interleaved samples starting at ``first_frame``.
+        channels (int): The number of audio channels.
+        frame_rate (int): The sample rate in Hz.
+        starts_ms (np.ndarray): The window starts in milliseconds, in increasing order.
+        window_ms (int): The length of each window in milliseconds.
+        first_frame (int, optional): The frame index of the first sample.
+        total_frames (int, optional): The number of frames in the whole audio.
+
+    Returns:
+        np.ndarray: The truncated RMS of each window.
+    """
+    starts_ms = np.asarray(starts_ms, dtype=np.int64)
+    if not len(starts_ms):
+        return np.zeros(0)
+
+    available = len(samples) // channels
+    if total_frames is None:
+        total_frames = first_frame + available
+
+    frames_per_ms = frame_rate / 1000.0
+    start_frames = (starts_ms * frames_per_ms).astype(np.int64)
+    end_frames = ((starts_ms + window_ms) * frames_per_ms).astype(np.int64)
+
+    low = start_frames[0]
+    high = min(int(end_frames[-1]), total_frames)
+
+    frames = samples[(low - first_frame) * channels : (high - first_frame) * channels]
+    frames = frames.reshape(-1, channels)
+
+    # 32-bit squares overflow int64 once summed, pydub sums them as doubles.
+    accumulator = np.float64 if samples.dtype.itemsize == 4 else np.int64
+    energy = np.square(frames, dtype=accumulator).sum(axis=1)
+
+    cumulative = np.zeros(len(energy) + 1, dtype=accumulator)
+    np.cumsum(energy, out=cumulative[1:])
+
+    sum_squares = (
+        cumulative[np.minimum(end_frames, high) - low] - cumulative[start_frames - low]
+    )
+    sample_count = (end_frames - start_frames) * channels
+
+    rms = np.zeros(len(starts_ms))
+    counted = sample_count > 0
+    rms[counted] = np.floor(
+        np.sqrt(sum_squares[counted].astype(np.float64) / sample_count[counted])
+    )
+
+    return rms
+
+
+def silent_window_starts(
+    samples,
+    sample_width,
+    channels,
+    frame_rate,
+    starts_ms,
+    min_silence_len,
+    silence_thresh,
+    first_frame=0,
+    total_frames=None,
+) -> np.ndarray:
+    """Returns the window starts whose window is at or below the silence threshold.
+
+    Args:
+        samples (np.ndarray): Interleaved samples starting at ``first_frame``.
+        sample_width (int): The number of bytes per sample.
+        channels (int): The number of audio channels.
+        frame_rate (int): The sample rate in Hz.
+        starts_ms (np.ndarray): The window starts in milliseconds, in increasing order.
+        min_silence_len (int): The length of each window in milliseconds.
+        silence_thresh (float): The silence threshold in dBFS.
+        first_frame (int, optional): The frame index of the first sample.
+        total_frames (int, optional): The number of frames in the whole audio.
+
+    Returns:
+        np.ndarray: The silent window starts in milliseconds.
+    """
+    starts_ms = np.asarray(starts_ms, dtype=np.int64)
+    thresh = db_to_float(silence_thresh) * max_possible_amplitude(sample_width)
+
+    rms = window_rms(
+        samples,
+        channels,
+        frame_rate,
+        starts_ms,
+        min_silence_len,
+        first_frame,
+        total_frames,
+    )
+    return starts_ms[rms <= thresh]
+
+
+def detect_silence(audio_segment, min_silence_len=1000, silence_thresh=-16, seek_step=1) -> list:
+    """Returns all silent sections ``[start, end]`` in milliseconds of a segment.
+
+    Drop-in replacement for ``pydub.silence.detect_silence``.
+
+    Args:
+        audio_segment (AudioSegment): The segment to find silence in.
+        min_silence_len (int, optional): The minimum length of a silence in milliseconds.
+        silence_thresh (float, optional): The silence threshold in dBFS.
+        seek_step (int, optional): The step between window starts in milliseconds.
+
+    Returns:
+        list: The silent ranges.
+    """
+    seg_len = len(audio_segment)
+    if seg_len < min_silence_len:
+        return []
+
+    samples = samples_from_buffer(audio_segment.raw_data, audio_segment.sample_width)
+    total_frames = len(samples) // audio_segment.channels
+
+    last_slice_start = seg_len - min_silence_len
+    slice_starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+    if last_slice_start % seek_step:
+        slice_starts = np.append(slice_starts, last_slice_start)
+
+    silence_starts = [
+        silent_window_starts(
+            samples,
+            audio_segment.sample_width,
+            audio_segment.channels,
+            audio_segment.frame_rate,
+            slice_starts[i : i + BLOCK_MS],
+            min_silence_len,
+            silence_thresh,
+            total_frames=total_frames,
+        )
+        for i in range(0, len(slice_starts), BLOCK_MS)
+    ]
+    silence_starts = np.concatenate(silence_starts)
+
+    return group_silent_starts(silence_starts, min_silence_len, seek_step)
+
+
+def group_silent_starts(silence_starts, min_silence_len, seek_step=1) -> list:
+    """Merges silent window starts into silent ranges the way pydub does.
+
+    Args:
+        silence_starts (np.ndarray): The silent window starts in increasing order.
+        min_silence_len (int): The length of each window in milliseconds.
+        seek_step (int, optional): The step between window starts in milliseconds.
+
+    Returns:
+        list: The silent ranges ``[start, end]`` in milliseconds.
+    """
+    if not len(silence_starts):
+        return []
+
+    silence_starts = np.asarray(silence_starts, dtype=np.int64)
+    previous = silence_starts[:-1]
+    current = silence_starts[1:]
+
+    breaks = np.flatnonzero(
+        (current != previous + seek_step) & (current > previous + min_silence_len)
+    )
+
+    range_starts = np.concatenate(([silence_starts[0]], current[breaks]))
+    range_ends = np.concatenate((previous[breaks], [silence_starts[-1]])) + min_silence_len
+
+    return [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+
+
+def detect_nonsilent(audio_segment, min_silence_len=1000, silence_thresh=-16, seek_step=1) -> list:
+    """Returns all nonsilent sections ``[start, end]`` in milliseconds of a segment.
+
+    Drop-in replacement for ``pydub.silence.detect_nonsilent``.
+
+    Args:
+        audio_segment (AudioSegment): The segment to find sound in.
+        min_silence_len (int, optional): The minimum length of a silence in milliseconds.
+        silence_thresh (float, optional): The silence threshold in dBFS.
+        seek_step (int, optional): The step between window starts in milliseconds.
+
+    Returns:
+        list: The nonsilent ranges.
+    """
+    silent_ranges = detect_silence(audio_segment, min_silence_len, silence_thresh, seek_step)
+    return invert_ranges(silent_ranges, len(audio_segment))
+
+
+def invert_ranges(silent_ranges, length_ms) -> list:
+    """Turns silent ranges into the nonsilent ranges between them.
+
+    Args:
+        silent_ranges (list): The silent ranges ``[start, end]`` in milliseconds.
+        length_ms (int): The length of the audio in milliseconds.
+
+    Returns:
+        list: The nonsilent ranges ``[start, end]`` in milliseconds.
+    """
+    if not silent_ranges:
+        return [[0, length_ms]]
+
+    if silent_ranges[0][0] == 0 and silent_ranges[0][1] == length_ms:
+        return []
+
+    prev_end_i = 0
+    nonsilent_ranges = []
+    for start_i, end_i in silent_ranges:
+        nonsilent_ranges.append([prev_end_i, start_i])
+        prev_end_i = end_i
+
+    if end_i != length_ms:
+        nonsilent_ranges.append([prev_end_i, length_ms])
+
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+
+    return nonsilent_ranges
+
+
+def chunk_ranges(nonsilent_ranges, keep_silence, length_ms) -> list:
+    """Widens nonsilent ranges by the kept silence, splitting any overlap evenly.
+
+    Args:
+        nonsilent_ranges (list): The nonsilent ranges ``[start, end]`` in milliseconds.
+        keep_silence (int): The silence kept on both sides of a chunk in milliseconds.
+        length_ms (int): The length of the audio in milliseconds.
+
+    Returns:
+        list: The ranges ``[start, end]`` each chunk is cut from.
+    """
+    output_ranges = [
+        [start - keep_silence, end + keep_silence] for start, end in nonsilent_ranges
+    ]
+
+    first, second = itertools.tee(output_ranges)
+    next(second, None)
+    for range_i, range_ii in zip(first, second):
+        last_end = range_i[1]
+        next_start = range_ii[0]
+        if next_start < last_end:
+            range_i[1] = (last_end + next_start) // 2
+            range_ii[0] = range_i[1]
+
+    return [[max(start, 0), min(end, length_ms)] for start, end in output_ranges]
+
+
+def split_on_silence(
+    audio_segment, min_silence_len=1000, silence_thresh=-16, keep_silence=100, seek_step=1
+) -> list:
+    """Splits a segment on its silent sections.
+
+    Drop-in replacement for ``pydub.silence.split_on_silence``.
+
+    Args:
+        audio_segment (AudioSegment): The segment to split.
+        min_silence_len (int, optional): The minimum length of a silence in milliseconds.
+        silence_thresh (float, optional): The silence threshold in dBFS.
+        keep_silence (int or bool, optional): The silence kept around each chunk in
+            milliseconds, or True to keep all of it and False to keep none.
+        seek_step (int, optional): The step between window starts in milliseconds.
+
+    Returns:
+        list: The chunks as AudioSegments.
+    """
+    length_ms = len(audio_segment)
+    if isinstance(keep_silence, bool):
+        keep_silence = length_ms if keep_silence else 0
+
+    nonsilent_ranges = detect_nonsilent(
+        audio_segment, min_silence_len, silence_thresh, seek_step
+    )
+
+    return [
+        audio_segment[start:end]
+        for start, end in chunk_ranges(nonsilent_ranges, keep_silence, length_ms)
+    ]
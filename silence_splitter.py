@@ -0,0 +1,454 @@
+from collections import deque
+import numpy as np
+from pydub import AudioSegment
+from audio_stream import PCMStream, WINDOW_MS
+from pcm_cache import shared_cache
+from silence_detection import samples_from_buffer, silent_window_starts
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Splitting parameters used by the GUI.
+MIN_SILENCE_LEN = 500
+SILENCE_THRESH = -48
+KEEP_SILENCE = 100
+
+# Silence added before and after every exported chunk, in milliseconds.
+PADDING_MS = 500
+
+
+class SilenceRangeTracker:
+    """Turns silent window starts into the ranges ``split_on_silence`` would cut.
+
+    Window starts must be fed in increasing order. The tracker reproduces
+    pydub's ``detect_silence``, ``detect_nonsilent`` and ``split_on_silence``
+    range logic incrementally, so a chunk range is released as soon as no
+    later window can change it.
+
+    Attributes:
+        min_silence_len (int): The minimum length of a silence in milliseconds.
+        keep_silence (int): The silence kept on both sides of a chunk in milliseconds.
+    """
+
+    def __init__(self, min_silence_len=MIN_SILENCE_LEN, keep_silence=KEEP_SILENCE) -> None:
+        """Initializes the SilenceRangeTracker.
+
+        Args:
+            min_silence_len (int, optional): The minimum length of a silence in milliseconds.
+            keep_silence (int, optional): The silence kept around each chunk in milliseconds.
+        """
+        self.min_silence_len = min_silence_len
+        self.keep_silence = keep_silence
+
+        self._range_start = None
+        self._prev_start = None
+        self._pending = None
+
+    @property
+    def earliest_needed_ms(self) -> int:
+        """int: The earliest position a chunk that is not yet released can start at."""
+        if self._range_start is None:
+            return 0
+
+        earliest = self._prev_start + self.min_silence_len - self.keep_silence
+        if self._pending is not None:
+            earliest = min(earliest, self._pending[0])
+
+        return max(earliest, 0)
+
+    def add_silent_start(self, start_ms) -> list:
+        """Records a window that was found to be silent.
+
+        Args:
+            start_ms (int): The start of the silent window in milliseconds.
+
+        Returns:
+            list: The chunk ranges ``[start_ms, end_ms]`` that are now final.
+        """
+        if self._range_start is None:
+            self._range_start = self._prev_start = start_ms
+            if start_ms == 0:
+                return []
+            return self._add_nonsilent(0, start_ms)
+
+        ready = []
+        continuous = start_ms == self._prev_start + 1
+        has_gap = start_ms > self._prev_start + self.min_silence_len
+
+        if not continuous and has_gap:
+            ready = self._add_nonsilent(
+                self._prev_start + self.min_silence_len, start_ms
+            )
+            self._range_start = start_ms
+
+        self._prev_start = start_ms
+        return ready
+
+    @property
+    def resumable(self) -> bool:
+        """bool: Whether a released range is always followed by a fresh state.
+
+        A range is only released once the silence after it starts, unless the
+        kept silence can make the next range overlap it and it is held back.
+        """
+        return self.min_silence_len >= 2 * self.keep_silence
+
+    def resume(self, silence_start_ms) -> None:
+        """Continues from the silence that closed a range released earlier.
+
+        The tracker is then in the state it was in right after releasing the
+        range, so the ranges it finds next are the same.
+
+        Args:
+            silence_start_ms (int): The start of the first silent window after
+                the range, its end minus ``keep_silence``.
+
+        Raises:
+            ValueError: If ranges are held back, so the state depends on more
+                than the last range.
+        """
+        if not self.resumable:
+            raise ValueError(
+                f"Cannot resume with {self.keep_silence} ms of kept silence around "
+                f"silences of {self.min_silence_len} ms"
+            )
+        self._range_start = self._prev_start = silence_start_ms
+        self._pending = None
+
+    def add_silent_run(self, first_ms, last_ms) -> list:
+        """Records a run of consecutive silent windows at once.
+
+        Equivalent to calling add_silent_start for every start of the run.
+
+        Args:
+            first_ms (int): The start of the first silent window in milliseconds.
+            last_ms (int): The start of the last silent window in milliseconds.
+
+        Returns:
+            list: The chunk ranges ``[start_ms, end_ms]`` that are now final.
+        """
+        ready = self.add_silent_start(first_ms)
+        self._prev_start = last_ms
+        return ready
+
+    def finish(self, length_ms) -> list:
+        """Closes the last silent range once the length of the audio is known.
+
+        Args:
+            length_ms (int): The length of the audio in milliseconds.
+
+        Returns:
+            list: The remaining chunk ranges ``[start_ms, end_ms]``.
+        """
+        ready = []
+        if self._range_start is None:
+            ready = self._add_nonsilent(0, length_ms)
+        else:
+            end = self._prev_start + self.min_silence_len
+            if end != length_ms:
+                ready = self._add_nonsilent(end, length_ms)
+
+        if self._pending is not None:
+            ready.append(self._pending)
+            self._pending = None
+
+        return ready
+
+    def _add_nonsilent(self, start_ms, end_ms) -> list:
+        """Adds a nonsilent range and releases the chunk ranges it settles.
+
+        Args:
+            start_ms (int): The start of the nonsilent range in milliseconds.
+            end_ms (int): The end of the nonsilent range in milliseconds.
+
+        Returns:
+            list: The chunk ranges that are now final.
+        """
+        ready = []
+        output_range = [start_ms - self.keep_silence, end_ms + self.keep_silence]
+
+        if self._pending is not None:
+            if output_range[0] < self._pending[1]:
+                self._pending[1] = (self._pending[1] + output_range[0]) // 2
+                output_range[0] = self._pending[1]
+            ready.append(self._pending)
+            self._pending = None
+
+        # The next range starts after a full silence, so it can only overlap
+        # this one when the kept silence is more than half of that silence.
+        if self.min_silence_len >= 2 * self.keep_silence:
+            ready.append(output_range)
+        else:
+            self._pending = output_range
+
+        return ready
+
+
+class StreamingSilenceSplitter:
+    """Splits an audio file on silence without loading the whole file.
+
+    The file is decoded in windows of ``window_ms``. Only the samples that a
+    pending chunk or the current silence window still need are kept, so the
+    memory used is bounded by the longest chunk rather than the input length.
+    The chunks are identical to ``split_on_silence`` on the fully loaded file.
+
+    Attributes:
+        audio_file (str): The path to the input audio file.
+        min_silence_len (int): The minimum length of a silence in milliseconds.
+        silence_thresh (int): The level in dBFS under which audio counts as silent.
+        keep_silence (int): The silence kept on both sides of a chunk in milliseconds.
+        window_ms (int): The length of each decoded window in milliseconds.
+        frame_rate (int): The sample rate of the input in Hz, once it has been opened.
+        channels (int): The number of audio channels, once the input has been opened.
+        length_ms (int): The length of the input in milliseconds, once it has been read.
+        resume_ms (int): The start of the silence after the chunk ``iter_cuts``
+            yielded last, which a later split can continue from, or None if it
+            cannot.
+    """
+
+    def __init__(
+        self,
+        audio_file,
+        min_silence_len=MIN_SILENCE_LEN,
+        silence_thresh=SILENCE_THRESH,
+        keep_silence=KEEP_SILENCE,
+        window_ms=WINDOW_MS,
+    ) -> None:
+        """Initializes the StreamingSilenceSplitter.
+
+        Args:
+            audio_file (str): The path to the input audio file.
+            min_silence_len (int, optional): The minimum length of a silence in milliseconds.
+            silence_thresh (int, optional): The silence threshold in dBFS.
+            keep_silence (int, optional): The silence kept around each chunk in milliseconds.
+            window_ms (int, optional): The length of each decoded window in milliseconds.
+        """
+        self.audio_file = audio_file
+        self.min_silence_len = min_silence_len
+        self.silence_thresh = silence_thresh
+        self.keep_silence = keep_silence
+        self.window_ms = window_ms
+        self.frame_rate = None
+        self.channels = None
+        self.length_ms = None
+        self.resume_ms = None
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def iter_chunks(self):
+        """Yields the chunks of the input file as soon as they are complete.
+
+        Yields:
+            AudioSegment: The next chunk, without padding.
+        """
+        for _, _, chunk in self.iter_cuts():
+            yield chunk
+
+    def iter_cuts(self, resume_ms=None):
+        """Yields the chunks of the input file with their ranges as soon as they are complete.
+
+        Args:
+            resume_ms (int, optional): Continue after the chunk of an earlier split
+                whose ``resume_ms`` this was, without reading what comes before it.
+
+        Yields:
+            tuple: The start and end of the chunk in milliseconds, as sliced
+                from the input, and the chunk as an AudioSegment without padding.
+        """
+        with PCMStream(self.audio_file, self.window_ms, shared_cache()) as stream:
+            frame_rate = self.frame_rate = stream.frame_rate
+            self.channels = stream.channels
+            frame_width = stream.frame_width
+
+            def to_frame(ms):
+                # Same rounding as AudioSegment slicing.
+                return int(ms * (frame_rate / 1000.0))
+
+            tracker = SilenceRangeTracker(self.min_silence_len, self.keep_silence)
+            ready = deque()
+            buffer = bytearray()
+            buffer_start = 0
+            total_frames = 0
+            window_start = 0
+            self.resume_ms = None
+
+            if resume_ms is not None:
+                tracker.resume(resume_ms)
+                buffer_start = total_frames = stream.seek(resume_ms)
+                window_start = resume_ms + 1
+
+            for window in stream.windows():
+                buffer += window
+                total_frames += len(window) // frame_width
+
+                # Hold back the last millisecond so that no window tested here
+                # could fall past the rounded length of the audio.
+                window_stop = int(total_frames * 1000 / frame_rate) - self.min_silence_len
+                while to_frame(window_stop + self.min_silence_len + 1) > total_frames:
+                    window_stop -= 1
+
+                if window_stop >= window_start:
+                    for silent_start in self._silent_starts(
+                        stream, buffer, buffer_start, window_start, window_stop + 1
+                    ):
+                        ready.extend(tracker.add_silent_start(int(silent_start)))
+                    window_start = window_stop + 1
+
+                while ready and to_frame(ready[0][1]) <= total_frames:
+                    start, end = ready.popleft()
+                    start = max(start, 0)
+                    if tracker.resumable:
+                        self.resume_ms = end - self.keep_silence
+                    yield start, end, self._slice(
+                        stream, buffer, buffer_start, start, end, to_frame
+                    )
+
+                keep_from = min(
+                    to_frame(window_start), to_frame(tracker.earliest_needed_ms)
+                )
+                if ready:
+                    keep_from = min(keep_from, to_frame(max(ready[0][0], 0)))
+
+                if keep_from > buffer_start:
+                    del buffer[: (keep_from - buffer_start) * frame_width]
+                    buffer_start = keep_from
+
+            length_ms = round(1000 * (total_frames / frame_rate))
+            self.length_ms = length_ms
+            window_stop = length_ms - self.min_silence_len + 1
+
+            if window_stop > window_start:
+                for silent_start in self._silent_starts(
+                    stream,
+                    buffer,
+                    buffer_start,
+                    window_start,
+                    window_stop,
+                    total_frames,
+                ):
+                    ready.extend(tracker.add_silent_start(int(silent_start)))
+
+            ready.extend(tracker.finish(length_ms))
+
+            # The last chunk may end at the end of the audio instead of a silence.
+            self.resume_ms = None
+            while ready:
+                start, end = ready.popleft()
+                start, end = max(start, 0), min(end, length_ms)
+                yield start, end, self._slice(
+                    stream, buffer, buffer_start, start, end, to_frame
+                )
+
+        logging.info(f"Finished streaming {self.audio_file}")
+
+    def _silent_starts(
+        self, stream, buffer, buffer_start, start_ms, stop_ms, total_frames=None
+    ) -> np.ndarray:
+        """Finds the silent windows among a range of window starts.
+
+        Args:
+            stream (PCMStream): The stream the buffer was filled from.
+            buffer (bytearray): The buffered PCM data.
+            buffer_start (int): The frame index of the first buffered frame.
+            start_ms (int): The first window start to test in milliseconds.
+            stop_ms (int): The window start to stop before in milliseconds.
+            total_frames (int, optional): The number of frames in the whole audio,
+                once it is known.
+
+        Returns:
+            np.ndarray: The silent window starts in milliseconds.
+        """
+        frames_per_ms = stream.frame_rate / 1000.0
+        first_frame = int(start_ms * frames_per_ms)
+        last_frame = int((stop_ms - 1 + self.min_silence_len) * frames_per_ms)
+        if total_frames is not None:
+            last_frame = min(last_frame, total_frames)
+
+        data = bytes(
+            buffer[
+                (first_frame - buffer_start) * stream.frame_width : (last_frame - buffer_start)
+                * stream.frame_width
+            ]
+        )
+
+        return silent_window_starts(
+            samples_from_buffer(data, stream.sample_width),
+            stream.sample_width,
+            stream.channels,
+            stream.frame_rate,
+            np.arange(start_ms, stop_ms, dtype=np.int64),
+            self.min_silence_len,
+            self.silence_thresh,
+            first_frame=first_frame,
+            total_frames=total_frames,
+        )
+
+    def _slice(self, stream, buffer, buffer_start, start_ms, end_ms, to_frame) -> AudioSegment:
+        """Builds a chunk from the buffered PCM data.
+
+        Args:
+            stream (PCMStream): The stream the buffer was filled from.
+            buffer (bytearray): The buffered PCM data.
+            buffer_start (int): The frame index of the first buffered frame.
+            start_ms (int): The start of the chunk in milliseconds.
+            end_ms (int): The end of the chunk in milliseconds.
+            to_frame: Converts milliseconds to a frame index.
+
+        Returns:
+            AudioSegment: The chunk.
+        """
+        data = self._frames(
+            stream, buffer, buffer_start, to_frame(start_ms), to_frame(end_ms)
+        )
+        return AudioSegment(
+            data=data,
+            sample_width=stream.sample_width,
+            frame_rate=stream.frame_rate,
+            channels=stream.channels,
+        )
+
+    @staticmethod
+    def _frames(stream, buffer, buffer_start, start_frame, end_frame) -> bytes:
+        """Returns a range of buffered frames, padded with silence past the end.
+
+        Args:
+            stream (PCMStream): The stream the buffer was filled from.
+            buffer (bytearray): The buffered PCM data.
+            buffer_start (int): The frame index of the first buffered frame.
+            start_frame (int): The first frame to return.
+            end_frame (int): The frame after the last one to return.
+
+        Returns:
+            bytes: The raw PCM data of the range.
+        """
+        frame_width = stream.frame_width
+        data = bytes(
+            buffer[
+                (start_frame - buffer_start) * frame_width : (end_frame - buffer_start)
+                * frame_width
+            ]
+        )
+
+        missing = (end_frame - start_frame) * frame_width - len(data)
+        if missing > 0:
+            data += b"\x00" * missing
+
+        return data
+
+
+def pad_chunk(chunk) -> AudioSegment:
+    """Surrounds a chunk with the PADDING_MS of silence every export gets.
+
+    Args:
+        chunk (AudioSegment): The chunk to pad.
+
+    Returns:
+        AudioSegment: The padded chunk.
+    """
+    silent_chunk = AudioSegment.silent(duration=PADDING_MS)
+    return silent_chunk + chunk + silent_chunk
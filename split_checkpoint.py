@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+# Written next to the cut list of an output folder while its chunks are exported.
+EXPORT_LOG = "exported.jsonl"
+
+
+def file_digest(path) -> str:
+    """Returns the SHA-256 of a file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        str: The digest as a hex string.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExportLog:
+    """Append-only record of the chunks of a split that finished exporting.
+
+    Together with the cut list, which holds the chunk ranges, it is the
+    checkpoint of a split: a split that was stopped continues with the
+    chunks that are not recorded here, without analyzing the source again.
+    Every record holds the size and SHA-256 of the written file, so a chunk
+    that was changed or truncated since is exported again. Records are
+    flushed as they are written and a record cut off by a crash is ignored.
+
+    Attributes:
+        log_path (str): The path to the log file.
+    """
+
+    def __init__(self, output_folder) -> None:
+        """Initializes the ExportLog of an output folder.
+
+        Args:
+            output_folder (str): The folder the chunks are written to.
+        """
+        self.log_path = f"{output_folder}/{EXPORT_LOG}"
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, result) -> None:
+        """Records a chunk that was exported.
+
+        Args:
+            result (ExportResult): The outcome of the export, with its digest.
+        """
+        record = {
+            "index": result.index,
+            "file": os.path.basename(result.path),
+            "size": result.size,
+            "sha256": result.digest,
+        }
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.log_path, "a", encoding="utf8")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def verified(self) -> set:
+        """Returns the chunks whose recorded file is still intact.
+
+        Returns:
+            set: The indexes of the chunks whose file has the recorded name,
+                size and SHA-256.
+        """
+        try:
+            with open(self.log_path, "r", encoding="utf8") as log:
+                lines = log.read().split("\n")[:-1]
+        except FileNotFoundError:
+            return set()
+
+        records = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping malformed record in {self.log_path}")
+                continue
+            records[record["index"]] = record
+
+        folder = os.path.dirname(self.log_path)
+        verified = set()
+        for index, record in records.items():
+            path = f"{folder}/{record['file']}"
+            try:
+                intact = (
+                    os.path.getsize(path) == record["size"]
+                    and file_digest(path) == record["sha256"]
+                )
+            except OSError:
+                intact = False
+
+            if intact:
+                verified.add(index)
+            else:
+                logging.warning(f"{path} does not match {self.log_path}, exporting it again")
+
+        logging.info(f"Verified {len(verified)} exported chunks from {self.log_path}")
+        return verified
+
+    def reset(self) -> None:
+        """Discards all records, when the chunk ranges change or the split is complete."""
+        self.close()
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def close(self) -> None:
+        """Closes the log file. Records are kept on disk."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
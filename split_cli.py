@@ -0,0 +1,332 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from audio_splitter import split_file
+from chunk_exporter import EXPORT_FORMATS
+from file_controller import AUDIO_EXTENSIONS
+import instrumentation
+import job_scheduler
+from adaptive_silence import SilenceAnalyzer
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
+)
+
+INPUT_SUFFIXES = tuple(f".{extension}" for extension in AUDIO_EXTENSIONS)
+
+
+def find_inputs(patterns, recursive=False) -> list:
+    """Expands directories and glob patterns into a sorted list of audio files.
+
+    Args:
+        patterns (list): Directories, files or glob patterns.
+        recursive (bool, optional): Also search the sub-folders of directories.
+
+    Returns:
+        list: The paths of the audio files, without duplicates.
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*") if recursive else os.path.join(pattern, "*")
+
+        for path in glob.glob(pattern, recursive=recursive):
+            if os.path.isfile(path) and path.lower().endswith(INPUT_SUFFIXES):
+                found.add(path)
+
+    return sorted(found)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parses the command line.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Split audio files into chunks on silence without the GUI."
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Audio files, directories or glob patterns to split."
+    )
+    parser.add_argument(
+        "-o", "--output", help="Folder to create one chunk folder per input in."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of files split at the same time.",
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="Search directories recursively."
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Decode inputs window by window to keep memory bounded.",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Pick each file's silence threshold from its noise floor.",
+    )
+    parser.add_argument(
+        "--cut-list",
+        action="store_true",
+        help="Only write the chunk ranges of each input; split again without it to export.",
+    )
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help="Only print the noise floor and the chunk count of every threshold.",
+    )
+    parser.add_argument(
+        "--format",
+        default="mp3",
+        choices=EXPORT_FORMATS,
+        help="Format to export the chunks in (default: mp3). 'copy' cuts MP3 inputs "
+        "at frame boundaries without re-encoding.",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write timing spans to this file, as JSON lines if it ends in .jsonl "
+        "and as a Chrome trace otherwise.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Split inputs even if their output folder is already complete.",
+    )
+    args = parser.parse_args(argv)
+    if args.output is None and not args.analyze:
+        parser.error("the following arguments are required: -o/--output")
+    return args
+
+
+def print_analysis(audio_file, analysis) -> None:
+    """Prints the loudness estimates of a file and the chunks each threshold gives.
+
+    Args:
+        audio_file (str): The path to the input audio file.
+        analysis (SilenceAnalysis): The analysis of the file.
+    """
+    print(
+        f"{audio_file}: noise floor {analysis.noise_floor_db:.0f} dBFS, "
+        f"content {analysis.loudness_db:.0f} dBFS, picked {analysis.threshold} dBFS"
+    )
+    for threshold, ranges in analysis.ranges.items():
+        marker = " <" if threshold == analysis.threshold else ""
+        print(f"  {threshold:4d} dBFS: {len(ranges)} chunks{marker}")
+
+
+def split_traced(origin, audio_file, output_root, **kwargs):
+    """Splits a file while recording spans. Runs inside a worker process.
+
+    Args:
+        origin (int): The origin of the main process's recorder.
+        audio_file (str): The path to the input audio file.
+        output_root (str): The folder holding one sub-folder per input file.
+        **kwargs: Passed on to split_file.
+
+    Returns:
+        tuple: The SplitResult and the recorded events.
+    """
+    recorder = instrumentation.enable(instrumentation.TraceRecorder(origin))
+    try:
+        return split_file(audio_file, output_root, **kwargs), recorder.events
+    finally:
+        instrumentation.disable()
+
+
+def print_export_costs(results) -> None:
+    """Prints the export throughput of every format used.
+
+    Args:
+        results (list): The SplitResult of every split file.
+    """
+    totals = {}
+    for result in results:
+        if result.throughput is None:
+            continue
+        total = totals.setdefault(
+            result.throughput["format"],
+            {"chunks": 0, "seconds": 0.0, "audio_seconds": 0.0, "bytes": 0},
+        )
+        for key in total:
+            total[key] += result.throughput[key]
+
+    for export_format, total in sorted(totals.items()):
+        factor = total["audio_seconds"] / total["seconds"] if total["seconds"] else 0.0
+        per_second = total["bytes"] / total["audio_seconds"] if total["audio_seconds"] else 0.0
+        print(
+            f"Export {export_format}: {total['chunks']} chunks, {factor:.1f}x realtime "
+            f"per worker, {total['bytes'] / 2**20:.1f} MB, "
+            f"{per_second / 1024:.1f} KB per audio second"
+        )
+
+
+def drain_until_interrupted(scheduler, events):
+    """Yields the job events until every job is done.
+
+    The first Ctrl+C cancels the jobs that have not started yet and waits
+    for the running ones; a second one stops waiting.
+
+    Args:
+        scheduler (JobScheduler): The scheduler the jobs were submitted to.
+        events (queue.Queue): A listener queue of the scheduler.
+
+    Yields:
+        JobEvent: The next event.
+    """
+    try:
+        yield from scheduler.drain(events)
+    except KeyboardInterrupt:
+        queued = [job for job in scheduler.jobs() if job.state == job_scheduler.QUEUED]
+        print(
+            f"Cancelling {len(queued)} queued files, waiting for "
+            f"{len(scheduler.jobs()) - len(queued)} running ones...",
+            file=sys.stderr,
+        )
+        scheduler.cancel_all()
+        yield from scheduler.drain(events)
+
+
+def analyze(inputs, jobs) -> int:
+    """Analyzes every input without exporting anything.
+
+    Args:
+        inputs (list): The paths of the audio files.
+        jobs (int): The number of files analyzed at the same time.
+
+    Returns:
+        int: The exit code, non-zero if any file failed.
+    """
+    scheduler = job_scheduler.JobScheduler(jobs)
+    events = scheduler.listen()
+    for audio_file in inputs:
+        scheduler.submit(audio_file, SilenceAnalyzer(audio_file).analyze, in_process=True)
+
+    errors = 0
+    try:
+        for event in drain_until_interrupted(scheduler, events):
+            if event.state == job_scheduler.FINISHED:
+                print_analysis(event.name, event.result)
+            elif event.state == job_scheduler.FAILED:
+                errors += 1
+    finally:
+        scheduler.shutdown()
+
+    return 1 if errors else 0
+
+
+def main(argv=None) -> int:
+    """Splits every input file and prints a throughput summary.
+
+    Every file is a job on a JobScheduler that splits it in a worker process
+    and exports its chunks in that process, so ``--jobs`` bounds the number
+    of busy cores. Files are split in order; Ctrl+C cancels the files that
+    have not started.
+
+    Args:
+        argv (list, optional): The arguments, sys.argv by default.
+
+    Returns:
+        int: The exit code, non-zero if any file or chunk failed.
+    """
+    args = parse_args(argv)
+    inputs = find_inputs(args.inputs, args.recursive)
+    if not inputs:
+        print("No wav, mp3 or flac files found.", file=sys.stderr)
+        return 1
+
+    if args.analyze:
+        return analyze(inputs, args.jobs)
+
+    print(f"Splitting {len(inputs)} files with {args.jobs} jobs...")
+    start = time.perf_counter()
+
+    recorder = instrumentation.enable() if args.trace else None
+
+    scheduler = job_scheduler.JobScheduler(args.jobs)
+    events = scheduler.listen()
+    for audio_file in inputs:
+        scheduler.submit(
+            audio_file,
+            *((split_traced, recorder.origin) if recorder else (split_file,)),
+            audio_file,
+            args.output,
+            in_process=True,
+            streaming=args.streaming,
+            workers=1,
+            export_format=args.format,
+            skip_complete=not args.force,
+            adaptive=args.adaptive,
+            cut_list=args.cut_list,
+        )
+
+    results = []
+    errors = []
+    cancelled = 0
+    try:
+        for event in drain_until_interrupted(scheduler, events):
+            if event.state == job_scheduler.FAILED:
+                errors.append(event.name)
+                continue
+            if event.state == job_scheduler.CANCELLED:
+                cancelled += 1
+                continue
+            if event.state != job_scheduler.FINISHED:
+                continue
+
+            result = event.result
+            if recorder is not None:
+                result, trace_events = result
+                recorder.merge(trace_events)
+
+            results.append(result)
+            state = "skipped" if result.skipped else f"{result.chunk_count} chunks"
+            if args.adaptive and not result.skipped:
+                state += f" at {result.silence_thresh} dBFS"
+            print(f"{event.name}: {state} in {result.seconds:.1f} s")
+    finally:
+        scheduler.shutdown()
+
+    elapsed = time.perf_counter() - start
+    processed = [result for result in results if not result.skipped]
+    skipped = len(results) - len(processed)
+    failed_chunks = sum(len(result.failures) for result in processed)
+    audio_hours = sum(result.audio_seconds for result in processed) / 3600
+
+    print(
+        f"Split {len(processed)} files ({skipped} skipped, {len(errors)} failed, "
+        f"{cancelled} cancelled, {failed_chunks} chunks failed) in {elapsed:.1f} s"
+    )
+    print(
+        f"Throughput: {len(processed) / elapsed:.2f} files/s, "
+        f"{audio_hours / elapsed:.4f} audio-hours/s"
+    )
+    print_export_costs(processed)
+
+    if recorder is not None:
+        recorder.save(args.trace)
+        for name, entry in sorted(recorder.summary().items()):
+            print(
+                f"{name}: {entry['count']} x {entry['mean_ms']:.1f} ms, "
+                f"{entry['total_ms'] / 1000:.2f} s total"
+            )
+
+    return 1 if errors or cancelled or failed_chunks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import os
+import wave
+import pytest
+from classification_journal import ClassificationJournal
+from csv_controller import CSVController, read_classifications
+
+LABELS = {
+    "0000.wav": "dog, barking",
+    "0001.wav": 'line one\nline "two"',
+    "0002.wav": "plain",
+}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """A folder of three short WAV files."""
+    for name in LABELS:
+        with wave.open(str(tmp_path / name), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(8000)
+            wav_file.writeframes(b"\0\0" * 800)
+    return str(tmp_path)
+
+
+def open_controller(folder):
+    controller = CSVController(flush_interval=3600)
+    controller.open_folder(folder)
+    return controller
+
+
+def test_replay_skips_a_partial_trailing_record(tmp_path):
+    journal = ClassificationJournal(str(tmp_path / "labels.csv.journal"))
+    journal.append("0000.wav", "dog")
+    journal.append("0001.wav", "cat")
+    journal.close()
+
+    with open(journal.journal_path, "a", encoding="utf8", newline="") as file:
+        file.write("0002.wav,bi")
+
+    assert journal.replay() == [("0000.wav", "dog"), ("0001.wav", "cat")]
+
+
+def test_replay_skips_a_record_cut_inside_a_quoted_newline(tmp_path):
+    journal = ClassificationJournal(str(tmp_path / "labels.csv.journal"))
+    journal.append("0000.wav", "dog")
+    journal.close()
+
+    # Cut right after the newline inside the label, so the file ends in one.
+    with open(journal.journal_path, "a", encoding="utf8", newline="") as file:
+        file.write('0001.wav,"line one\n')
+
+    assert journal.replay() == [("0000.wav", "dog")]
+
+
+def test_labels_with_commas_and_newlines_survive_the_journal(tmp_path):
+    journal = ClassificationJournal(str(tmp_path / "labels.csv.journal"))
+    for name, label in LABELS.items():
+        journal.append(name, label)
+    journal.close()
+
+    assert journal.replay() == list(LABELS.items())
+
+
+def test_flush_compacts_the_journal_into_the_csv(folder):
+    controller = open_controller(folder)
+    for name, label in LABELS.items():
+        controller.set_classification_by_name(name, label)
+    journal_path = controller.journal.journal_path
+    assert os.path.exists(journal_path)
+
+    controller.flush()
+
+    assert not os.path.exists(journal_path)
+    assert not any(name.endswith(".tmp") for name in os.listdir(folder))
+    assert read_classifications(folder) == LABELS
+    controller.close()
+
+
+def test_reopening_replays_edits_that_were_not_compacted(folder):
+    controller = open_controller(folder)
+    for name, label in LABELS.items():
+        controller.set_classification_by_name(name, label)
+
+    # The process dies before the flush timer fires.
+    controller._dirty.clear()
+    controller.close()
+    assert read_classifications(folder) == LABELS
+
+    reopened = open_controller(folder)
+    assert {name: reopened.get_classification_by_name(name) for name in LABELS} == LABELS
+    reopened.close()
+
+    assert not os.path.exists(reopened.journal.journal_path)
+    with open(reopened.csv_file.file_path, "r", encoding="utf8", newline="") as file:
+        assert "dog, barking" in file.read()
+
+
+def test_journal_is_truncated_only_after_the_csv_is_replaced(folder, monkeypatch):
+    controller = open_controller(folder)
+    controller.set_classification_by_name("0000.wav", "dog")
+
+    def fail(rows):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(controller, "_write_rows", fail)
+    with pytest.raises(OSError):
+        controller.flush()
+    assert controller.journal.replay() == [("0000.wav", "dog")]
+
+    monkeypatch.undo()
+    journal_kept = []
+    write_rows = controller._write_rows
+
+    def write_then_check(rows):
+        write_rows(rows)
+        journal_kept.append(os.path.exists(controller.journal.journal_path))
+
+    monkeypatch.setattr(controller, "_write_rows", write_then_check)
+    controller.flush()
+
+    assert journal_kept == [True]
+    assert not os.path.exists(controller.journal.journal_path)
+    assert read_classifications(folder)["0000.wav"] == "dog"
+    controller.close()
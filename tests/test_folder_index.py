@@ -0,0 +1,47 @@
+import struct
+import wave
+from folder_index import FolderIndex
+from split_cli import find_inputs
+
+
+def write_flac_header(path, frame_rate, channels, samples):
+    """Writes the start of a FLAC file: its marker and STREAMINFO block.
+
+    That is all probing reads, so no encoder is needed.
+    """
+    fields = (frame_rate << 44) | ((channels - 1) << 41) | (15 << 36) | samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\0" * 6 + struct.pack(">Q", fields) + b"\0" * 16
+    with open(path, "wb") as flac_file:
+        flac_file.write(b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo)
+
+
+def write_silence(path, frame_rate, frames):
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframes(b"\0\0" * frames)
+
+
+def test_flac_chunks_are_queued(tmp_path):
+    write_flac_header(tmp_path / "0000.flac", 44100, 2, 44100 * 3)
+    write_silence(tmp_path / "0001.wav", 8000, 4000)
+    (tmp_path / "notes.txt").write_text("not audio")
+
+    index = FolderIndex(str(tmp_path))
+    queue = index.scan()
+
+    assert list(queue.names) == ["0000.flac", "0001.wav"]
+    assert index.other_files == ["notes.txt"]
+    assert queue.durations.tolist() == [3.0, 0.5]
+    assert queue.frame_rates.tolist() == [44100, 8000]
+    assert queue.channels.tolist() == [2, 1]
+    assert queue.file(queue.find("0000.flac")).is_audio_file
+
+
+def test_find_inputs_includes_flac(tmp_path):
+    write_flac_header(tmp_path / "a.flac", 44100, 1, 44100)
+    write_silence(tmp_path / "b.wav", 8000, 800)
+    (tmp_path / "c.txt").write_text("")
+
+    assert find_inputs([str(tmp_path)]) == [str(tmp_path / "a.flac"), str(tmp_path / "b.wav")]
@@ -0,0 +1,81 @@
+import csv
+import wave
+import pytest
+from classification_journal import ClassificationJournal
+from csv_controller import read_classifications
+from label_sessions import cohen_kappa, delta_path, merge_sessions, plan_sessions
+
+NAMES = [f"{index:04d}.wav" for index in range(10)]
+
+
+@pytest.fixture
+def folder(tmp_path):
+    """A folder of ten short WAV files."""
+    for name in NAMES:
+        with wave.open(str(tmp_path / name), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(8000)
+            wav_file.writeframes(b"\0\0" * 800)
+    return str(tmp_path)
+
+
+def label(folder, annotator, labels):
+    journal = ClassificationJournal(delta_path(folder, annotator))
+    for name, classification in labels.items():
+        journal.append(name, classification)
+    journal.close()
+
+
+def test_plan_deals_every_file_to_exactly_one_annotator(folder):
+    plan = plan_sessions(folder, ["ann", "bob", "cy"])
+
+    assigned = [name for names in plan["assignments"].values() for name in names]
+    assert sorted(assigned) == NAMES
+    assert [len(names) for names in plan["assignments"].values()] == [4, 3, 3]
+
+
+def test_plan_overlap_gives_shared_files_to_one_more_annotator(folder):
+    plan = plan_sessions(folder, ["ann", "bob", "cy"], overlap=0.5, seed=1)
+
+    counts = {name: 0 for name in NAMES}
+    for names in plan["assignments"].values():
+        assert len(names) == len(set(names))
+        for name in names:
+            counts[name] += 1
+    assert set(counts.values()) == {1, 2}
+
+
+def test_cohen_kappa_matches_a_hand_computed_table():
+    # yes/yes 4, yes/no 2, no/yes 1, no/no 3: observed agreement 0.7, chance
+    # agreement 0.6 * 0.5 + 0.4 * 0.5 = 0.5, so kappa = (0.7 - 0.5) / 0.5.
+    first = ["yes"] * 6 + ["no"] * 4
+    second = ["yes"] * 4 + ["no"] * 2 + ["yes"] + ["no"] * 3
+
+    assert cohen_kappa(first, second) == pytest.approx(0.4)
+    assert cohen_kappa(["yes", "yes"], ["yes", "yes"]) == 1.0
+    assert cohen_kappa([], []) is None
+
+
+def test_merge_takes_the_majority_and_reports_ties(folder):
+    plan_sessions(folder, ["ann", "bob", "cy"])
+    label(folder, "ann", {"0000.wav": "dog", "0001.wav": "dog", "0002.wav": "cat"})
+    label(folder, "bob", {"0000.wav": "dog", "0001.wav": "cat"})
+    label(folder, "cy", {"0000.wav": "cat", "0002.wav": "bird", "0003.wav": "cow"})
+
+    result = merge_sessions(folder)
+
+    assert (result.rows, result.labelled, result.updated) == (10, 4, 2)
+    assert [conflict.file_name for conflict in result.conflicts] == ["0001.wav", "0002.wav"]
+
+    labels = read_classifications(folder)
+    assert labels["0000.wav"] == "dog" and labels["0003.wav"] == "cow"
+    assert labels["0001.wav"] == labels["0002.wav"] == ""
+
+    with open(result.conflicts_path, "r", encoding="utf8", newline="") as file:
+        assert list(csv.reader(file)) == [
+            ["file_name", "ann", "bob", "cy"],
+            ["0001.wav", "dog", "cat", ""],
+            ["0002.wav", "cat", "", "bird"],
+        ]
+    assert result.agreement["pairs"]["ann/bob"]["files"] == 2
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import wave
+import numpy as np
+from pydub import AudioSegment
+import digest_memo
+from digest_memo import DigestMemo
+from feature_extraction import FeatureExtractor
+from pcm_cache import PCMCache
+from split_checkpoint import file_digest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loads a WAV chunk, rewrites it shorter the way a split does and reads the
+# samples loaded before. Run in its own process: a mapped page that was cut
+# off would kill it with SIGBUS.
+REWRITE_SCRIPT = """
+import sys
+from chunk_exporter import write_wav
+from pcm_cache import PCMCache
+
+path = sys.argv[1]
+segment = PCMCache(sys.argv[2]).segment(path)
+write_wav(path, b"\\0\\0" * 10, 2, 16000, 1)
+print(segment.rms, len(segment.raw_data))
+"""
+
+
+def write_noise(path, sample_width, frames=16000, seed=0):
+    samples = np.random.default_rng(seed).integers(0, 256, frames * sample_width, dtype=np.uint8)
+    with wave.open(str(path), "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(sample_width)
+        file.setframerate(16000)
+        file.writeframes(samples.tobytes())
+
+
+def test_rewriting_a_loaded_wav_keeps_its_samples(tmp_path):
+    path = tmp_path / "0000.wav"
+    write_noise(path, 2, frames=16000 * 4)
+    expected = AudioSegment.from_wav(str(path))
+
+    process = subprocess.run(
+        [sys.executable, "-c", REWRITE_SCRIPT, str(path), str(tmp_path / "cache")],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.split() == [str(expected.rms), str(len(expected.raw_data))]
+
+
+def test_converted_samples_are_decoded_once(tmp_path):
+    path = tmp_path / "clip.wav"
+    write_noise(path, 3)
+    cache = PCMCache(str(tmp_path / "cache"))
+
+    first = cache.segment(str(path))
+    second = cache.segment(str(path))
+
+    expected = AudioSegment.from_file(str(path))
+    assert bytes(first.raw_data) == bytes(second.raw_data) == expected.raw_data
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 1
+
+
+def test_cache_and_features_hash_a_clip_once(tmp_path, monkeypatch):
+    path = tmp_path / "clip.wav"
+    write_noise(path, 3)
+    hashed = []
+
+    def counted_digest(file_path):
+        hashed.append(file_path)
+        return file_digest(file_path)
+
+    monkeypatch.setattr(digest_memo, "file_digest", counted_digest)
+
+    PCMCache(str(tmp_path / "cache")).segment(str(path))
+    hashes = FeatureExtractor(str(tmp_path)).content_hashes(["clip.wav"])
+
+    assert hashes == {"clip.wav": file_digest(str(path))}
+    assert len(hashed) == 1
+
+    # Another process reads the digest from the log.
+    assert DigestMemo(str(tmp_path)).digest("clip.wav") == hashes["clip.wav"]
+    assert len(hashed) == 1
+
+    write_noise(path, 3, seed=1)
+    os.utime(path, ns=(0, 0))
+    assert DigestMemo(str(tmp_path)).digest("clip.wav") == file_digest(str(path))
+    assert len(hashed) == 2
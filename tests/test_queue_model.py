@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from queue_model import FenwickTree, QueueModel
+
+LABELS = ["", "dog", "cat", "bird"]
+
+
+def make_model(count, rng):
+    names = [f"{index:05d}.wav" for index in range(count)]
+    return QueueModel("folder", names, rng.random(count), [8000] * count, [1] * count)
+
+
+def queue_labels(model):
+    """The label at every queue position, as a plain list."""
+    return [model.label(item) for item in model.order.tolist()]
+
+
+def check_against_lists(model, rng):
+    labels = queue_labels(model)
+    positions = list(range(-1, len(labels)))
+    for label in [None, *LABELS]:
+        matches = [
+            position for position, other in enumerate(labels) if label is None or other == label
+        ]
+        assert model.count(label) == len(matches)
+        for position in rng.choice(positions, 20):
+            position = int(position)
+            after = [match for match in matches if match > position]
+            assert model.next_position(position, label) == (after[0] if after else None)
+            if position >= 0:
+                before = [match for match in matches if match < position]
+                assert model.previous_position(position, label) == (before[-1] if before else None)
+                assert model.rank(position, label) == sum(match <= position for match in matches)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fenwick_tree_matches_prefix_sums(seed):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 3, int(rng.integers(1, 200)))
+    tree = FenwickTree(counts)
+
+    for _ in range(200):
+        position = int(rng.integers(len(counts)))
+        delta = int(rng.integers(-counts[position], 3))
+        counts[position] += delta
+        tree.add(position, delta)
+
+        assert tree.total == counts.sum()
+        end = int(rng.integers(len(counts) + 1))
+        assert tree.prefix(end) == counts[:end].sum()
+        if tree.total:
+            # Select: the position where the running count reaches the rank.
+            rank = int(rng.integers(1, tree.total + 1))
+            assert tree.find(rank) == int(np.searchsorted(np.cumsum(counts), rank))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_navigation_matches_plain_lists_after_edits_and_reordering(seed):
+    rng = np.random.default_rng(seed)
+    model = make_model(int(rng.integers(1, 150)), rng)
+    check_against_lists(model, rng)
+
+    for step in range(30):
+        if step % 10 == 9:
+            model.order_by(None if step == 29 else model.durations)
+        for item in rng.integers(len(model), size=int(rng.integers(1, 10))):
+            model.set_label(int(item), LABELS[int(rng.integers(len(LABELS)))])
+        check_against_lists(model, rng)
+
+    assert queue_labels(model) == [model.label(item) for item in range(len(model))]
+
+
+def test_select_keeps_the_chosen_items_in_name_order():
+    rng = np.random.default_rng(0)
+    model = make_model(50, rng)
+    items = rng.choice(50, 20, replace=False)
+
+    selected = model.select(items)
+
+    assert selected.names.tolist() == sorted(model.names[items].tolist())
+    assert selected.durations.tolist() == model.durations[np.sort(items)].tolist()
+    assert selected.count("") == 20 and selected.find(model.names[items[0]]) is not None
@@ -0,0 +1,196 @@
+import filecmp
+import json
+import os
+import wave
+import numpy as np
+import pytest
+import audio_splitter
+import silence_splitter
+from audio_splitter import COMPLETE_MARKER, split_file
+from chunk_exporter import STREAM_COPY
+from cut_list import CUT_LIST, read_cut_list
+from silence_splitter import KEEP_SILENCE, PADDING_MS
+from split_checkpoint import EXPORT_LOG, ExportLog
+
+FRAME_RATE = 8000
+TONES = 12
+
+
+class Interrupted(Exception):
+    """Raised from the result callback to stop a split part way."""
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """A WAV file of TONES short tones, each followed by a second of silence."""
+    tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(FRAME_RATE * 7 // 10) / FRAME_RATE)
+    silence = np.zeros(FRAME_RATE)
+    samples = np.concatenate([silence] + [np.concatenate([tone, silence])] * TONES)
+
+    path = tmp_path / "recording.wav"
+    with wave.open(str(path), "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(FRAME_RATE)
+        file.writeframes((samples * 32767).astype("<i2").tobytes())
+    return str(path)
+
+
+def split(recording, output_root, stop_after=None, exported=None, **options):
+    """Splits the recording to WAV chunks, optionally stopping after some results.
+
+    Args:
+        recording (str): The path to the recording.
+        output_root (str): The folder holding the output folder.
+        stop_after (int, optional): Raise Interrupted at this many exported chunks.
+        exported (list, optional): Receives the index of every exported chunk.
+        **options: The other keyword arguments for split_file.
+
+    Returns:
+        SplitResult: The outcome of the split.
+    """
+    results = []
+
+    def on_result(result):
+        results.append(result.index)
+        if exported is not None:
+            exported.append(result.index)
+        if stop_after is not None and len(results) == stop_after:
+            raise Interrupted()
+
+    return split_file(
+        recording, output_root, export_format="wav", workers=1, on_result=on_result, **options
+    )
+
+
+def logged_indexes(folder):
+    with open(f"{folder}/{EXPORT_LOG}", "r", encoding="utf8") as log:
+        return {json.loads(line)["index"] for line in log}
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_resume_exports_only_missing_and_corrupt_chunks(recording, tmp_path, streaming):
+    reference = split(recording, str(tmp_path / "reference"), streaming=streaming)
+    assert reference.chunk_count == TONES
+
+    output_root = str(tmp_path / "output")
+    folder = f"{output_root}/recording"
+    with pytest.raises(Interrupted):
+        split(recording, output_root, stop_after=4, streaming=streaming)
+
+    assert not os.path.exists(f"{folder}/{COMPLETE_MARKER}")
+    assert os.path.exists(f"{folder}/{CUT_LIST}")
+    logged = logged_indexes(folder)
+    assert 1 in logged and len(logged) < TONES
+
+    with open(f"{folder}/0001.wav", "r+b") as chunk:
+        chunk.seek(100)
+        chunk.write(b"\x7f" * 16)
+
+    exported = []
+    result = split(recording, output_root, exported=exported, streaming=streaming)
+
+    assert sorted(exported) == sorted(set(range(TONES)) - logged | {1})
+    assert result.chunk_count == TONES and not result.failures
+    assert os.path.exists(f"{folder}/{COMPLETE_MARKER}")
+    assert not os.path.exists(f"{folder}/{CUT_LIST}")
+    assert not os.path.exists(f"{folder}/{EXPORT_LOG}")
+
+    names = sorted(name for name in os.listdir(folder) if name.endswith(".wav"))
+    assert len(names) == TONES
+    _, mismatch, errors = filecmp.cmpfiles(
+        reference.output_folder, folder, names, shallow=False
+    )
+    assert not mismatch and not errors
+
+
+def test_resume_reuses_the_cut_list(recording, tmp_path, monkeypatch):
+    output_root = str(tmp_path / "output")
+    with pytest.raises(Interrupted):
+        split(recording, output_root, stop_after=3)
+
+    def analyze(*args, **kwargs):
+        raise AssertionError("the recording was analyzed again")
+
+    monkeypatch.setattr(audio_splitter, "detect_nonsilent", analyze)
+    monkeypatch.setattr(audio_splitter, "_analyze", analyze)
+    result = split(recording, output_root)
+    assert result.chunk_count == TONES and not result.failures
+
+
+def test_streaming_resume_continues_after_the_recorded_ranges(recording, tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_splitter, "CHECKPOINT_SECONDS", 0)
+    reference = split(recording, str(tmp_path / "reference"), streaming=True)
+
+    output_root = str(tmp_path / "output")
+    folder = f"{output_root}/recording"
+    with pytest.raises(Interrupted):
+        split(recording, output_root, stop_after=5, streaming=True)
+
+    cuts = read_cut_list(folder)
+    resumed = cuts["resume"]["chunks"]
+    assert cuts["partial"] and 1 < resumed < TONES
+    silence_ms = cuts["resume"]["silence_ms"]
+    assert silence_ms == cuts["chunks"][resumed - 1][1] - KEEP_SILENCE
+    logged = logged_indexes(folder)
+    os.remove(f"{folder}/0001.wav")
+
+    tested = []
+    silent_window_starts = silence_splitter.silent_window_starts
+
+    def record_starts(samples, sample_width, channels, frame_rate, starts, *args, **kwargs):
+        tested.extend(starts)
+        return silent_window_starts(samples, sample_width, channels, frame_rate, starts, *args, **kwargs)
+
+    monkeypatch.setattr(silence_splitter, "silent_window_starts", record_starts)
+    exported = []
+    result = split(recording, output_root, exported=exported, streaming=True)
+
+    assert min(tested) == silence_ms + 1
+    assert sorted(exported) == sorted(set(range(TONES)) - logged | {1})
+    assert result.chunk_count == TONES and not result.failures
+
+    names = sorted(name for name in os.listdir(folder) if name.endswith(".wav"))
+    _, mismatch, errors = filecmp.cmpfiles(reference.output_folder, folder, names, shallow=False)
+    assert len(names) == TONES and not mismatch and not errors
+
+
+def test_resume_keeps_the_format_of_the_cut_list(recording, tmp_path):
+    output_root = str(tmp_path / "output")
+    with pytest.raises(Interrupted):
+        split(recording, output_root, stop_after=3)
+
+    # Chunk names must not change, so the chunks stay WAV files.
+    result = split_file(recording, output_root, export_format="flac", workers=1)
+
+    assert not result.failures
+    names = os.listdir(result.output_folder)
+    assert sum(name.endswith(".wav") for name in names) == TONES
+    assert not any(name.endswith(".flac") for name in names)
+    with open(f"{result.output_folder}/{COMPLETE_MARKER}", "r", encoding="utf8") as marker:
+        assert json.load(marker)["format"] == "wav"
+
+
+def test_verified_skips_changed_and_cut_off_records(recording, tmp_path):
+    output_root = str(tmp_path / "output")
+    with pytest.raises(Interrupted):
+        split(recording, output_root, stop_after=3)
+
+    folder = f"{output_root}/recording"
+    with open(f"{folder}/{EXPORT_LOG}", "a", encoding="utf8") as log:
+        log.write('{"index": 7, "file": "0007.wa')
+    with open(f"{folder}/0002.wav", "ab") as chunk:
+        chunk.write(b"\0")
+
+    assert ExportLog(folder).verified() == {0, 1}
+
+
+@pytest.mark.parametrize("export_format, padding_ms", [("wav", PADDING_MS), (STREAM_COPY, 0)])
+def test_cut_list_records_the_padding_of_its_format(recording, tmp_path, export_format, padding_ms):
+    folder = str(tmp_path / "output")
+    os.makedirs(folder)
+    audio_splitter._write_checkpoint(
+        recording, folder, export_format, 1000, FRAME_RATE, 1, -48, [[0, 1000]]
+    )
+
+    assert read_cut_list(folder)["padding_ms"] == padding_ms